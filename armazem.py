@@ -0,0 +1,362 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-----------------+
+ |  A R M A Z E M  |
+ +-----------------+
+
+Armazenamento compacto dos resultados de regionalizações em lote
+
+import matriz, armazem
+m = matriz.Nereus(2015).extrair_mipita()
+a = armazem.ArmazemCompacto(list(m.qls.index), precisao='float32')
+a.preencher(m, bloco=64)              # regionalizar_lote em blocos, sem guardar float64
+a.visao('312', 'L')                   # 68 x 68 float32, sem cópia
+a.valor('312', 'multiplicadores')     # float64 (cópia), desquantizado se int16
+
+Precisões e limites de erro contra o caminho float64 (por elemento x):
+
+float64: sem perda (8 bytes por elemento)
+float32: |x - x'| <= 2^-24 |x| ~ 6e-8 |x| (arredondamento ao mais próximo;
+         4 bytes); os multiplicadores herdam o mesmo erro relativo
+int16:   quantização linear por área e artefato, x' = q * escala com
+         escala = max|x| / 32767, logo |x - x'| <= escala / 2 = max|x| / 65534
+         (2 bytes); NaN (colunas fora do modelo nos multiplicadores) vira
+         o sentinela -32768 e volta como NaN
+
+Os arrays de cada artefato são alocados de uma vez (areas x linhas x colunas,
+contíguos), e visao() devolve a fatia da área como view.
+
+Em disco (ArmazemDisco), um diretório com L.npy, Lf.npy (anos x UTPs x 68 x 68)
+e multiplicadores.npy (anos x UTPs x 28 x 69) abertos por memory-map, mais
+indice.json com anos, códigos das UTPs (de carregar_utp) e rótulos:
+
+armazem.construir('/dados/armazem/', [matriz.Nereus(a) for a in range(2010, 2019)])
+d = armazem.ArmazemDisco('/dados/armazem/')    # só abre os arquivos
+d.L(2015, '312')                               # view 68 x 68 do mmap
+d.multiplicadores(2015, '312', frame=True)     # DataFrame sobre a view
+
+Vários processos que abrem o mesmo armazém compartilham o page cache do
+sistema operacional; cada consulta é só um lookup em dict e um fatiamento.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import json
+import os
+
+import numpy as np
+
+import matriz
+from dados import ModuloAdiado
+
+pd = ModuloAdiado('pandas')
+
+
+# artefatos guardados e suas dimensões por área
+FORMAS = {
+    'A': (68, 68),
+    'L': (68, 68),
+    'Af': (68, 68),
+    'Lf': (68, 68),
+    'multiplicadores': (28, 69),
+}
+PRECISOES = ['float64', 'float32', 'int16']
+
+_NAN_INT16 = -32768
+_MAX_INT16 = 32767
+
+
+def quantizar(x):
+    """float -> (int16, escala) por matriz da pilha x (areas x linhas x colunas)
+
+    retorna
+    q: int16 com o mesmo shape, escala: float64 areas
+    """
+    x = np.asarray(x, dtype=np.float64)
+    nan = np.isnan(x)
+    maximo = np.nanmax(np.abs(np.where(nan, 0.0, x)), axis=(-2, -1))
+    escala = np.where(maximo > 0, maximo / _MAX_INT16, 1.0)
+    q = np.rint(np.where(nan, 0.0, x) / escala[:, None, None]).astype(np.int16)
+    q[nan] = _NAN_INT16
+    return q, escala
+
+
+def desquantizar(q, escala):
+    """int16 (com sentinela de NaN) -> float64"""
+    x = q.astype(np.float64) * np.asarray(escala)[..., None, None]
+    x[q == _NAN_INT16] = np.nan
+    return x
+
+
+class ArmazemCompacto:
+    """Resultados de muitas áreas em arrays pré-alocados de precisão reduzida.
+
+    areas: list => rótulos das áreas (p.ex. códigos das UTPs), na ordem do armazém
+    precisao: 'float64', 'float32' ou 'int16' (ver limites de erro no módulo)
+    artefatos: list => subconjunto de FORMAS
+    """
+    def __init__(self, areas, precisao='float32', artefatos=None):
+        if precisao not in PRECISOES:
+            raise Exception('[!!] precisao deve ser uma de ' + ", ".join(PRECISOES))
+        self.areas = [str(a) for a in areas]
+        self.indice = {a: k for k, a in enumerate(self.areas)}
+        self.precisao = precisao
+        self.artefatos = list(artefatos or FORMAS)
+        k = len(self.areas)
+        self.dados = {nome: np.zeros((k,) + FORMAS[nome], dtype=precisao) for nome in self.artefatos}
+        self.escalas = {}
+        if precisao == 'int16':
+            self.escalas = {nome: np.ones(k) for nome in self.artefatos}
+        self.preenchido = np.zeros(k, dtype=bool)
+
+
+    def __repr__(self):
+        r = "Armazém compacto de regionalizações\n"
+        r += "-----------------------------------\n"
+        r += "áreas: " + str(int(self.preenchido.sum())) + "/" + str(len(self.areas))
+        r += " | " + self.precisao + " | " + str(round(self.nbytes() / 2**20, 1)) + " MB"
+        return r
+
+
+    def nbytes(self):
+        """Memória ocupada pelos arrays do armazém"""
+        return sum(a.nbytes for a in self.dados.values()) + sum(e.nbytes for e in self.escalas.values())
+
+
+    def posicao(self, area):
+        """Posição da área nos arrays (int ou rótulo)"""
+        if isinstance(area, (int, np.integer)):
+            return int(area)
+        return self.indice[str(area)]
+
+
+    def guardar(self, lote, areas=None):
+        """Copia os resultados de um Lote para as posições das suas áreas
+
+        areas: list => rótulos no armazém de cada item do lote
+        (default: UTPs do item, unidas por espaço, como em Lote.recortes)
+        """
+        rotulos = areas if areas is not None else lote.recortes()
+        pos = np.array([self.posicao(a) for a in rotulos])
+        for nome in self.artefatos:
+            pilha = getattr(lote, nome)
+            if self.precisao == 'int16':
+                q, escala = quantizar(pilha)
+                self.dados[nome][pos] = q
+                self.escalas[nome][pos] = escala
+            else:
+                self.dados[nome][pos] = pilha  # conversão para float32 na cópia
+        self.preenchido[pos] = True
+
+
+    def preencher(self, base, bloco=64, exceto=False):
+        """Regionaliza as áreas do armazém em blocos e guarda cada bloco
+
+        Só um bloco de resultados float64 existe por vez na memória.
+        """
+        for i in range(0, len(self.areas), bloco):
+            rotulos = self.areas[i:i+bloco]
+            lote = base.regionalizar_lote([r.split(" ") for r in rotulos], exceto)
+            self.guardar(lote, rotulos)
+        return self
+
+
+    def visao(self, area, artefato):
+        """Matriz armazenada da área, como view (sem cópia) no dtype do armazém;
+        em int16 são os valores quantizados (ver escala e valor)"""
+        return self.dados[artefato][self.posicao(area)]
+
+
+    def escala(self, area, artefato):
+        """Escala de quantização da área (1.0 fora do modo int16)"""
+        if self.precisao != 'int16':
+            return 1.0
+        return float(self.escalas[artefato][self.posicao(area)])
+
+
+    def valor(self, area, artefato):
+        """Matriz da área em float64 (cópia), desquantizada se preciso"""
+        k = self.posicao(area)
+        if self.precisao == 'int16':
+            return desquantizar(self.dados[artefato][k], self.escalas[artefato][k])
+        return self.dados[artefato][k].astype(np.float64)
+
+
+    def limite_erro(self, area, artefato):
+        """Maior erro absoluto possível de um elemento da área contra float64"""
+        k = self.posicao(area)
+        if self.precisao == 'float64':
+            return 0.0
+        if self.precisao == 'float32':
+            return float(np.nanmax(np.abs(self.dados[artefato][k]))) * 2.0**-24
+        return float(self.escalas[artefato][k]) / 2
+
+
+# artefatos do armazém em disco
+ARTEFATOS_DISCO = ['L', 'Lf', 'multiplicadores']
+
+
+class ArmazemDisco:
+    """Leitor (e gravador) do armazém de L, Lf e multiplicadores em disco.
+
+    destino: str => diretório criado por ArmazemDisco.criar / construir
+    modo: 'r' (somente leitura, default) ou 'r+' (para gravar)
+    """
+    def __init__(self, destino, modo='r'):
+        self.destino = destino
+        with open(os.path.join(destino, 'indice.json')) as f:
+            self.cabecalho = json.load(f)
+        self.anos = self.cabecalho['anos']
+        self.utps = self.cabecalho['utps']
+        self.codigos = self.cabecalho['codigos']
+        self._ano = {a: i for i, a in enumerate(self.anos)}
+        self._utp = {u: j for j, u in enumerate(self.utps)}
+        self.arrays = {
+            nome: np.load(os.path.join(destino, nome + '.npy'), mmap_mode=modo)
+            for nome in ARTEFATOS_DISCO
+        }
+        self.preenchido = np.load(os.path.join(destino, 'preenchido.npy'), mmap_mode=modo)
+
+
+    def __repr__(self):
+        r = "Armazém em disco de regionalizações\n"
+        r += "-----------------------------------\n"
+        r += self.destino + " | " + self.cabecalho['dtype']
+        r += "\nanos: " + " ".join(self.anos) + " | UTPs: " + str(len(self.utps))
+        r += " | preenchidos: " + str(int(np.sum(self.preenchido)))
+        return r
+
+
+    @classmethod
+    def criar(cls, destino, anos, utps=None, path="", dtype='float32'):
+        """Cria os arquivos vazios do armazém
+
+        anos: list de anos
+        utps: list de códigos (default: índice de carregar_utp(path))
+        dtype: 'float32' ou 'float64' (ver limites de erro no módulo)
+        """
+        if utps is None:
+            utps = list(matriz.carregar_referencia('utp', path=path).index)
+        anos = [str(a) for a in anos]
+        utps = [str(u) for u in utps]
+        os.makedirs(destino, exist_ok=True)
+        formas = {nome: (len(anos), len(utps)) + FORMAS[nome] for nome in ARTEFATOS_DISCO}
+        for nome, forma in formas.items():
+            arr = np.lib.format.open_memmap(os.path.join(destino, nome + '.npy'),
+                mode='w+', dtype=dtype, shape=forma)
+            arr[...] = np.nan  # ainda não calculado
+            arr.flush()
+            del arr
+        np.save(os.path.join(destino, 'preenchido.npy'), np.zeros((len(anos), len(utps)), dtype=bool))
+        codigos = matriz.carregar_atividades68(path)[0]
+        cabecalho = {
+            'formato': 'armazem-mmap/1',
+            'versao': __version__,
+            'dtype': dtype,
+            'anos': anos,
+            'utps': utps,
+            'codigos': codigos,
+            'multiplicadores': {'index': matriz.MULTIPLICADORES, 'columns': codigos + ['famílias']},
+            'formas': {nome: list(forma) for nome, forma in formas.items()},
+        }
+        with open(os.path.join(destino, 'indice.json'), 'w') as f:
+            json.dump(cabecalho, f, ensure_ascii=False)
+        return cls(destino, modo='r+')
+
+
+    def posicao(self, ano, utp):
+        """(ano, utp) -> índices (i, j) nos arrays"""
+        try:
+            return self._ano[str(ano)], self._utp[str(utp)]
+        except KeyError:
+            raise Exception('[!!] ' + str(ano) + '/' + str(utp) + ' não está no armazém ' + self.destino)
+
+
+    def gravar(self, ano, lote):
+        """Grava um Lote cujos itens são UTPs individuais do armazém"""
+        i = self._ano[str(ano)]
+        pos = []
+        for area in lote.areas:
+            if len(area) != 1:
+                raise Exception('[!!] O armazém guarda UTPs individuais, não agregações')
+            pos.append(self._utp[area[0]])
+        for nome in ARTEFATOS_DISCO:
+            self.arrays[nome][i, pos] = getattr(lote, nome)
+        self.preenchido[i, pos] = True
+
+
+    def flush(self):
+        for arr in list(self.arrays.values()) + [self.preenchido]:
+            if hasattr(arr, 'flush'):
+                arr.flush()
+
+
+    def _preenchida(self, ano, utp):
+        """posicao() de uma UTP já calculada no ano"""
+        i, j = self.posicao(ano, utp)
+        if not self.preenchido[i, j]:
+            raise Exception('[!!] ' + str(ano) + '/' + str(utp) + ' ainda não foi calculado')
+        return i, j
+
+
+    def _obter(self, nome, ano, utp):
+        i, j = self._preenchida(ano, utp)
+        return self.arrays[nome][i, j]
+
+
+    def L(self, ano, utp, frame=False):
+        """Matriz L da UTP no ano, view do mmap (DataFrame sobre a view se frame)"""
+        L = self._obter('L', ano, utp)
+        return pd.DataFrame(L, index=self.codigos, columns=self.codigos, copy=False) if frame else L
+
+
+    def Lf(self, ano, utp, frame=False):
+        """Matriz Lf da UTP no ano (famílias no lugar de 9700)"""
+        Lf = self._obter('Lf', ano, utp)
+        if frame:
+            fechados = self.codigos[0:67] + ['famílias']
+            return pd.DataFrame(Lf, index=fechados, columns=fechados, copy=False)
+        return Lf
+
+
+    def multiplicadores(self, ano, utp, frame=False):
+        """Multiplicadores 28 x 69 da UTP no ano"""
+        multi = self._obter('multiplicadores', ano, utp)
+        if frame:
+            rotulos = self.cabecalho['multiplicadores']
+            return pd.DataFrame(multi, index=rotulos['index'], columns=rotulos['columns'], copy=False)
+        return multi
+
+
+    def serie(self, utp, artefato='multiplicadores'):
+        """Artefato da UTP em todos os anos: view anos x linhas x colunas"""
+        if artefato not in ARTEFATOS_DISCO:
+            raise Exception('[!!] Artefato ' + str(artefato) + ' não está no armazém')
+        posicoes = [self._preenchida(ano, utp) for ano in self.anos]
+        return self.arrays[artefato][:, posicoes[0][1]]
+
+
+def construir(destino, fontes, utps=None, dtype='float32', bloco=64):
+    """Cria o armazém em disco e calcula todas as UTPs de todos os anos
+
+    fontes: Nereus ou Mipita, ou list deles (um por ano)
+    bloco: int => UTPs por regionalizar_lote
+
+    retorna
+    ArmazemDisco aberto para leitura
+    """
+    if type(fontes) is not list:
+        fontes = [fontes]
+    bases = [f.extrair_mipita() if isinstance(f, matriz.Nereus) else f for f in fontes]
+    if utps is None:
+        utps = list(bases[0].utp.index)
+    armazem = ArmazemDisco.criar(destino, [b.ano for b in bases], utps, bases[0].path, dtype)
+    for base in bases:
+        disponiveis = [u for u in armazem.utps if u in base.qls.index]
+        for i in range(0, len(disponiveis), bloco):
+            armazem.gravar(base.ano, base.regionalizar_lote(disponiveis[i:i+bloco]))
+        print('[>>] Armazém ' + destino + ' | ' + base.ano + ' | ' + str(len(disponiveis)) + ' UTPs')
+    armazem.flush()
+    return ArmazemDisco(destino)
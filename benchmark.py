@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +---------------------+
+ |  B E N C H M A R K  |
+ +---------------------+
+
+Tempos das etapas da mip sobre dados sintéticos (ver sintetico.py), sem rede
+
+python benchmark.py                                  # 20, 100 e 500 UTPs
+python benchmark.py --utps 50 200 --repeticoes 7 --saida bench.json
+
+Para cada número de UTPs gera os arquivos num diretório temporário e mede
+(mediana e mínimo de N repetições, em ms): Nereus, mipita_nereus,
+matriz_leontief, multiplicadores, indice_HR, extrair_mipita, regionalizar
+(uma UTP sobre uma Mipita já extraída, sem a memória de regionalizações) e
+regionalizar_lote (todas as UTPs).
+O resultado é um JSON com o ambiente (python, numpy, pandas, scipy) e uma
+lista de medições {utps, etapa, mediana_ms, min_ms, repeticoes}.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import matriz
+import sintetico
+
+
+def cronometrar(funcao, repeticoes):
+    """(mediana, mínimo) em ms de repeticoes chamadas de funcao()"""
+    tempos = []
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - t) * 1000)
+    tempos.sort()
+    return tempos[len(tempos) // 2], tempos[0]
+
+
+def etapas(path, ano):
+    """Etapas medidas: list de (nome, função sem argumentos)"""
+    n = matriz.Nereus(ano, path=path)
+    m = n.extrair_mipita()
+    r = n.extrair_mipita()  # só para regionalizar, que sobrescreve os atributos
+    areas = list(m.qls.index)
+
+    return [
+        ('Nereus', lambda: matriz.Nereus(ano, path=path)),
+        ('mipita_nereus', n.mipita_nereus),
+        ('matriz_leontief', lambda: matriz.matriz_leontief(n.A)),
+        ('multiplicadores', lambda: matriz.multiplicadores(
+            n.nucleo, n.empregos, matriz.LeontiefSolver(n.A), matriz.LeontiefSolver(n.Af))),
+        ('indice_HR', lambda: matriz.indice_HR(n.L)),
+        ('extrair_mipita', n.extrair_mipita),
+        ('regionalizar', lambda: r.regionalizar(areas[0])),
+        ('regionalizar_lote', lambda: m.regionalizar_lote(areas)),
+    ]
+
+
+def rodar(utps=(20, 100, 500), repeticoes=5, ano=2015):
+    """Executa o benchmark
+
+    retorna
+    dict pronto para json.dump
+    """
+    import pandas
+    try:
+        import scipy
+        versao_scipy = scipy.__version__
+    except ImportError:
+        versao_scipy = None
+    resultado = {
+        'versao': __version__,
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pandas.__version__,
+            'scipy': versao_scipy,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeticoes': repeticoes,
+        'medicoes': [],
+    }
+    memo = matriz.MEMO.ativo
+    matriz.configurar_memo(ativo=False)  # regionalizar mede o cálculo, não a memória
+    try:
+        for k in utps:
+            path = tempfile.mkdtemp(prefix='mip_bench_') + os.sep
+            try:
+                sintetico.gerar(path, anos=[ano], n_utps=k)
+                # silencia as mensagens dos carregadores
+                with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                    for nome, funcao in etapas(path, ano):
+                        mediana, minimo = cronometrar(funcao, repeticoes)
+                        resultado['medicoes'].append({
+                            'utps': k, 'etapa': nome, 'mediana_ms': round(mediana, 3),
+                            'min_ms': round(minimo, 3), 'repeticoes': repeticoes,
+                        })
+                        print('[>>] %5d UTPs | %-18s %10.2f ms' % (k, nome, mediana), file=sys.stderr)
+            finally:
+                matriz.invalidar_referencias(path=path)
+                shutil.rmtree(path, ignore_errors=True)
+    finally:
+        matriz.configurar_memo(ativo=memo)
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark da mip com dados sintéticos')
+    parser.add_argument('--utps', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--ano', type=int, default=2015)
+    parser.add_argument('--saida', help='arquivo JSON (default: stdout)')
+    args = parser.parse_args()
+    resultado = rodar(args.utps, args.repeticoes, args.ano)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(resultado, f, indent=1)
+    else:
+        json.dump(resultado, sys.stdout, indent=1)
+        print()
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-------------+
+ |  C A R G A  |
+ +-------------+
+
+Teste de carga do serviço HTTP (ver servico.py), só com recursos locais
+
+python carga.py                                   # sobe o serviço sobre dados sintéticos
+python carga.py --clientes 16 --requisicoes 5000 --utps 100 --saida carga.json
+python carga.py --url http://127.0.0.1:8765 --ano 2015 --utp 312 313
+
+Sem --url, gera os dados com sintetico.gerar num diretório temporário e sobe
+um Servico numa porta livre do próprio processo. Cada cliente é uma thread
+com uma conexão keep-alive (http.client) que sorteia consultas entre as
+rotas (multiplicadores, hr, encadeamentos, impactos) e as UTPs; com --lote N
+as consultas vão em grupos de N pelo POST /lote.
+O resultado é um JSON com vazão (requisições/s) e percentis de latência
+(p50, p90, p99 e máximo, em ms), no total e por rota.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+import matriz
+import servico
+import sintetico
+
+ROTAS = ['multiplicadores', 'hr', 'encadeamentos', 'impactos']
+
+
+def percentis(tempos):
+    """dict com n, p50, p90, p99 e max (ms) de uma list de tempos em segundos"""
+    if not tempos:
+        return {'n': 0}
+    ms = np.asarray(tempos) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {'n': len(ms), 'p50_ms': round(p50, 3), 'p90_ms': round(p90, 3),
+        'p99_ms': round(p99, 3), 'max_ms': round(ms.max(), 3)}
+
+
+def consultas(ano, utps, setores, n, seed=0):
+    """n consultas sorteadas entre as rotas, UTPs e setores"""
+    sorteio = random.Random(seed)
+    lista = []
+    for _ in range(n):
+        c = {'rota': sorteio.choice(ROTAS), 'ano': ano, 'utp': sorteio.choice(utps)}
+        if c['rota'] == 'multiplicadores' and sorteio.random() < 0.5:
+            c['setor'] = sorteio.choice(setores)
+        elif c['rota'] == 'encadeamentos':
+            c['setor'] = sorteio.choice(setores)
+        elif c['rota'] == 'impactos':
+            c['choques'] = {sorteio.choice(setores): 1000.0}
+        lista.append(c)
+    return lista
+
+
+def _cliente(url, fila, lote, medidas, trava):
+    """Thread cliente: consome a fila de consultas numa conexão keep-alive"""
+    u = urlsplit(url)
+    conexao = http.client.HTTPConnection(u.hostname, u.port, timeout=60)
+    locais = []
+    while True:
+        with trava:
+            grupo = [fila.pop() for _ in range(min(max(lote, 1), len(fila)))]
+        if not grupo:
+            break
+        if lote:
+            metodo, caminho, corpo, rota = 'POST', '/lote', {'consultas': grupo}, 'lote'
+        elif grupo[0]['rota'] == 'impactos':
+            metodo, caminho, corpo, rota = 'POST', '/impactos', grupo[0], 'impactos'
+        else:
+            c = dict(grupo[0])
+            rota = c.pop('rota')
+            metodo, caminho, corpo = 'GET', '/' + rota + '?' + urlencode(c), None
+        t = time.perf_counter()
+        try:
+            dados = json.dumps(corpo).encode('utf8') if corpo is not None else None
+            conexao.request(metodo, caminho, body=dados, headers={'Content-Type': 'application/json'})
+            resposta = conexao.getresponse()
+            resposta.read()
+            ok = resposta.status == 200
+        except (OSError, http.client.HTTPException):
+            conexao.close()
+            conexao = http.client.HTTPConnection(u.hostname, u.port, timeout=60)
+            ok = False
+        locais.append((rota, time.perf_counter() - t, ok, len(grupo)))
+    conexao.close()
+    with trava:
+        medidas.extend(locais)
+
+
+def carga(url, lista, clientes=8, lote=0):
+    """Dispara as consultas com clientes threads e mede as latências
+
+    retorna
+    dict com vazão, erros e percentis no total e por rota
+    """
+    fila = list(reversed(lista))
+    medidas = []
+    trava = threading.Lock()
+    threads = [threading.Thread(target=_cliente, args=(url, fila, lote, medidas, trava))
+        for _ in range(clientes)]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    duracao = time.perf_counter() - t
+    requisicoes = len(medidas)
+    por_rota = {}
+    for rota, tempo, ok, n in medidas:
+        por_rota.setdefault(rota, []).append(tempo)
+    return {
+        'clientes': clientes,
+        'lote': lote,
+        'requisicoes': requisicoes,
+        'consultas': sum(m[3] for m in medidas),
+        'erros': sum(1 for m in medidas if not m[2]),
+        'duracao_s': round(duracao, 3),
+        'vazao_rps': round(requisicoes / duracao, 1),
+        'vazao_consultas_s': round(sum(m[3] for m in medidas) / duracao, 1),
+        'latencia': percentis([m[1] for m in medidas]),
+        'rotas': {rota: percentis(tempos) for rota, tempos in sorted(por_rota.items())},
+    }
+
+
+def rodar(url=None, clientes=8, requisicoes=2000, lote=0, utps=20, ano=2015, lista_utps=None, aquecer=False):
+    """Executa o teste de carga, subindo o serviço local se url for None
+
+    retorna
+    dict pronto para json.dump
+    """
+    path = httpd = s = None
+    resultado = {'versao': __version__, 'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpus': os.cpu_count()}
+    try:
+        if url is None:
+            path = tempfile.mkdtemp(prefix='mip_carga_') + os.sep
+            sintetico.gerar(path, anos=[ano], n_utps=utps)
+            with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                s = servico.Servico([ano], path=path)
+                s.base(ano)
+            httpd = servico.servidor(s, porta=0)
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            url = 'http://127.0.0.1:' + str(httpd.server_address[1])
+            lista_utps = list(s.base(ano).qls.index)
+            setores = s.base(ano).codigos
+        else:
+            with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                setores = matriz.carregar_atividades68()[0]
+        if not lista_utps:
+            raise Exception('[!!] Informe as UTPs (--utp) ao usar --url')
+        resultado['url'] = url
+        lista = consultas(str(ano), [str(u) for u in lista_utps], setores, requisicoes * max(lote, 1))
+        if aquecer:
+            # todas as UTPs na memória do serviço antes da medição
+            carga(url, [{'rota': 'hr', 'ano': str(ano), 'utp': str(u)} for u in lista_utps],
+                clientes=1, lote=len(lista_utps))
+        resultado.update(carga(url, lista, clientes, lote))
+        print('[>>] %d requisições | %.1f req/s | p50 %.2f ms | p99 %.2f ms | erros %d' % (
+            resultado['requisicoes'], resultado['vazao_rps'], resultado['latencia']['p50_ms'],
+            resultado['latencia']['p99_ms'], resultado['erros']), file=sys.stderr)
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+        if s is not None:
+            s.fechar()
+        if path is not None:
+            matriz.invalidar_referencias(path=path)
+            shutil.rmtree(path, ignore_errors=True)
+    return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Teste de carga do serviço HTTP da mip')
+    parser.add_argument('--url', help='serviço já em execução (default: sobe um local)')
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    parser.add_argument('--lote', type=int, default=0, help='consultas por POST /lote (0: uma por requisição)')
+    parser.add_argument('--utps', type=int, default=20, help='UTPs dos dados sintéticos')
+    parser.add_argument('--utp', nargs='+', help='UTPs consultadas (com --url)')
+    parser.add_argument('--ano', type=int, default=2015)
+    parser.add_argument('--aquecer', action='store_true', help='calcula todas as UTPs antes de medir')
+    parser.add_argument('--saida', help='arquivo JSON (default: stdout)')
+    args = parser.parse_args()
+    resultado = rodar(args.url, args.clientes, args.requisicoes, args.lote, args.utps,
+        args.ano, args.utp, args.aquecer)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(resultado, f, indent=1)
+    else:
+        json.dump(resultado, sys.stdout, indent=1)
+        print()
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +----------------------------+
+ |  C H E C A R  I M P O R T  |
+ +----------------------------+
+
+Verifica o custo de `import matriz` contra um orçamento fixo
+
+python checar_import.py            # 7 medições, sai com código 1 se estourar
+python checar_import.py 15         # número de medições
+
+Cada medição roda em um interpretador novo. Desconta-se o import de numpy
+(dependência obrigatória) e compara-se a mediana do restante com ORCAMENTO_MS.
+Também falha se pandas, requests ou scipy forem importados por `import matriz`:
+eles só devem ser carregados no primeiro uso (ler csv, baixar do S3, fatorar LU).
+
+Os tempos dependem da máquina, do sistema de arquivos e de haver .pyc em
+cache (sem ele, compilar matriz e dados domina a medição); por isso o script
+só compara com o orçamento, que deve ser ajustado ao ambiente de CI. O que é
+estável é a ordem de grandeza: adiar pandas, requests e scipy tira centenas
+de ms do import.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import json
+import os
+import subprocess
+import sys
+
+
+# custo máximo de matriz + dados, descontado o numpy
+ORCAMENTO_MS = 60
+
+# não podem ser carregados por `import matriz`
+ADIADOS = ['pandas', 'requests', 'scipy']
+
+_MEDIR = """
+import json, sys, time
+t0 = time.perf_counter()
+import numpy
+t1 = time.perf_counter()
+import matriz
+t2 = time.perf_counter()
+print(json.dumps({
+    'numpy': (t1 - t0) * 1000,
+    'matriz': (t2 - t1) * 1000,
+    'carregados': [m for m in %r if m in sys.modules],
+}))
+""" % (ADIADOS,)
+
+
+def medir(vezes=7):
+    """Mede `import matriz` em interpretadores novos
+
+    retorna
+    dict com medianas em ms ('numpy', 'matriz', 'total') e módulos adiados
+    que foram carregados mesmo assim
+    """
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    ambiente = dict(os.environ)
+    ambiente['PYTHONPATH'] = pasta + os.pathsep + ambiente.get('PYTHONPATH', '')
+    medidas = []
+    for _ in range(vezes):
+        saida = subprocess.run(
+            [sys.executable, '-c', _MEDIR], cwd=pasta, env=ambiente,
+            capture_output=True, text=True, check=True)
+        medidas.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    mediana = lambda v: sorted(v)[len(v) // 2]
+    return {
+        'numpy': mediana([m['numpy'] for m in medidas]),
+        'matriz': mediana([m['matriz'] for m in medidas]),
+        'total': mediana([m['numpy'] + m['matriz'] for m in medidas]),
+        'carregados': sorted({c for m in medidas for c in m['carregados']}),
+    }
+
+
+def checar(vezes=7):
+    """True se `import matriz` está dentro do orçamento e sem imports pesados"""
+    r = medir(vezes)
+    print("[>>] import numpy: %.1f ms | matriz + dados: %.1f ms | total: %.1f ms"
+        % (r['numpy'], r['matriz'], r['total']))
+    ok = True
+    if r['matriz'] > ORCAMENTO_MS:
+        print("[!!] import matriz acima do orçamento: %.1f ms > %d ms" % (r['matriz'], ORCAMENTO_MS))
+        ok = False
+    if r['carregados']:
+        print("[!!] import matriz carregou módulos que deveriam ser adiados: " + ", ".join(r['carregados']))
+        ok = False
+    if ok:
+        print("[ok] dentro do orçamento de %d ms" % ORCAMENTO_MS)
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if checar(int(sys.argv[1]) if len(sys.argv) > 1 else 7) else 1)
@@ -12,120 +12,621 @@ SAC | ITA
 
 Default: bucket S3 mantido por Mauro Zac
 ou especificar path para acessar dados localmente
+
+Os arquivos baixados do S3 ficam num cache local endereçado pelo conteúdo
+(sha256), com descarte LRU por tamanho. Configuração via configurar_cache()
+ou pelas variáveis de ambiente MIP_CACHE (diretório), MIP_CACHE_LIMITE (MB)
+e MIP_OFFLINE=1 (nunca acessa a rede; falha se o arquivo não estiver no cache).
+Os downloads podem ser simultâneos (threads de painel, processos de paralelo);
+as gravações no cache e no indice.json são serializadas por uma trava do
+processo e, onde há fcntl, por uma trava no arquivo .trava do diretório.
+
+Os carregadores aceitam progresso=callback(etapa, bytes, decorrido), chamado
+a cada bloco baixado e ao fim de cada tabela (ver Progresso).
 """
 
 __version__ = "v.1.5 | 2023."
 
 
+import contextlib
+import hashlib
+import importlib
+import io
 import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:  # trava de arquivo entre processos (POSIX)
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ModuloAdiado:
+    """Módulo importado apenas no primeiro acesso a um de seus atributos
+
+    pd = ModuloAdiado('pandas')   # nada é importado aqui
+    pd.read_csv(...)              # importa pandas neste ponto
+    """
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+
+    def __getattr__(self, atributo):
+        if atributo.startswith('__'):
+            raise AttributeError(atributo)
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+
+    def __repr__(self):
+        estado = "importado" if self._modulo is not None else "adiado"
+        return "<módulo " + self._nome + " (" + estado + ")>"
+
+
+# ganchos de instrumentação: recebem um dict por etapa de qualquer Progresso
+# do processo (ver registrar_gancho e perfil.py)
+_ganchos = []
+
+# medição de picos de memória por etapa: só com tracemalloc ligado por
+# reservar_tracemalloc; resets conta os tracemalloc.reset_peak() feitos
+_picos = {'dono': None, 'resets': 0}
+_trava_picos = threading.Lock()
+
+
+def registrar_gancho(gancho):
+    """Passa a chamar gancho(evento) ao fim de cada etapa de qualquer Progresso
+
+    evento: dict com escopo (fase que emitiu a etapa: 'Nereus', 'Mipita',
+    'regionalizar'... ver Progresso.fase), etapa, bytes (lidos na etapa),
+    parede e cpu (segundos desde a etapa anterior do mesmo Progresso), pico
+    (bytes alocados acima do início da etapa, ou None, ver reservar_tracemalloc)
+    e thread
+    """
+    _ganchos.append(gancho)
+
+
+def remover_gancho(gancho):
+    if gancho in _ganchos:
+        _ganchos.remove(gancho)
+
+
+def reservar_tracemalloc(dono):
+    """Liga o tracemalloc para medir picos por etapa, se ninguém o usa
+
+    Só com tracemalloc ligado por aqui os Progresso chamam reset_peak() a
+    cada etapa; uma sessão de tracemalloc do usuário nunca é alterada (os
+    eventos saem com pico None).
+
+    retorna
+    True se dono passou a controlar o tracemalloc
+    """
+    with _trava_picos:
+        if _picos['dono'] is not None or tracemalloc.is_tracing():
+            return False
+        tracemalloc.start()
+        _picos['dono'] = dono
+        return True
+
+
+def liberar_tracemalloc(dono):
+    """Desliga o tracemalloc ligado por reservar_tracemalloc(dono)"""
+    with _trava_picos:
+        if _picos['dono'] is dono:
+            _picos['dono'] = None
+            tracemalloc.stop()
+
+
+class Progresso:
+    """Relógio de etapas repassadas a um callback
+
+    callback(etapa, bytes, decorrido)
+        etapa: str => etapa concluída (em downloads, a cada bloco recebido)
+        bytes: int => total de bytes lidos até aqui (rede, cache ou disco)
+        decorrido: float => segundos desde a criação do Progresso
+
+    O mesmo Progresso é repassado às funções chamadas (Nereus -> carregadores
+    -> baixar), que acumulam bytes e tempo num único relógio. Os ganchos
+    registrados (registrar_gancho) recebem cada etapa com o escopo (fase
+    mais interna aberta com fase()), tempo de parede, cpu e pico de memória
+    medidos desde a etapa anterior.
+
+    O pico usa tracemalloc.reset_peak(), que é global no processo: ele só é
+    chamado quando o tracemalloc foi ligado por reservar_tracemalloc (p.ex.
+    por perfil.Perfil). Se outro Progresso (outra thread) zerou o pico
+    durante a etapa, o pico dela sai None em vez de um valor errado.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.inicio = time.perf_counter()
+        self.bytes = 0
+        self._escopos = []
+        if _ganchos:
+            self._marcar()
+
+
+    @classmethod
+    def de(cls, progresso):
+        """Progresso a partir de um callback, de outro Progresso (reusado) ou None"""
+        return progresso if isinstance(progresso, cls) else cls(progresso)
+
+
+    @contextlib.contextmanager
+    def fase(self, escopo):
+        """Rotula com escopo as etapas relatadas dentro do bloco with"""
+        self._escopos.append(escopo)
+        try:
+            yield self
+        finally:
+            self._escopos.pop()
+
+
+    def _marcar(self):
+        self._parede = time.perf_counter()
+        self._cpu = time.process_time()
+        self._memoria = None
+        with _trava_picos:
+            if _picos['dono'] is not None and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+                _picos['resets'] += 1
+                self._reset = _picos['resets']
+                self._memoria = tracemalloc.get_traced_memory()[0]
+
+
+    def __call__(self, etapa, bytes=0):
+        self.bytes += bytes
+        if _ganchos:
+            if not hasattr(self, '_parede'):  # gancho registrado depois da criação
+                self._marcar()
+            pico = None
+            with _trava_picos:
+                if self._memoria is not None and tracemalloc.is_tracing() and self._reset == _picos['resets']:
+                    pico = tracemalloc.get_traced_memory()[1] - self._memoria
+            evento = {
+                'escopo': self._escopos[-1] if self._escopos else '',
+                'etapa': etapa,
+                'bytes': bytes,
+                'parede': time.perf_counter() - self._parede,
+                'cpu': time.process_time() - self._cpu,
+                'pico': pico,
+                'thread': threading.current_thread().name,
+            }
+            for gancho in list(_ganchos):
+                gancho(evento)
+        if self.callback is not None:
+            self.callback(etapa, self.bytes, time.perf_counter() - self.inicio)
+        if _ganchos:
+            self._marcar()  # o tempo dos callbacks não entra na etapa seguinte
+
+
+# pandas e requests custam centenas de ms no import e só são necessários
+# ao ler csv ou baixar do S3
+requests = ModuloAdiado('requests')
+pd = ModuloAdiado('pandas')
+
+
+URL = "https://econodata.s3.amazonaws.com/"
+
+CACHE = {
+    'ativo': True,
+    'diretorio': os.environ.get('MIP_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'mip')),
+    'limite': int(os.environ.get('MIP_CACHE_LIMITE', 512)) * 2**20,  # bytes
+    'offline': os.environ.get('MIP_OFFLINE', '') not in ('', '0'),
+}
+
+
+def configurar_cache(diretorio=None, limite=None, offline=None, ativo=None):
+    """Ajusta o cache local dos arquivos do S3
+
+    diretorio: str => onde ficam indice.json e objetos/
+    limite: int => tamanho máximo em MB (descarta os menos usados recentemente)
+    offline: bool => se True nunca acessa a rede
+    ativo: bool => se False baixa sempre, sem gravar no cache
+    """
+    if diretorio is not None: CACHE['diretorio'] = diretorio
+    if limite is not None: CACHE['limite'] = int(limite * 2**20)
+    if offline is not None: CACHE['offline'] = offline
+    if ativo is not None: CACHE['ativo'] = ativo
+    return dict(CACHE)
+
+
+_trava_sessao = threading.Lock()
+_trava_cache = threading.RLock()
+_trava_arquivo = []  # arquivo .trava aberto enquanto a seção crítica está ativa
+
+
+@contextlib.contextmanager
+def _travado():
+    """Seção crítica do cache: entre threads e, com fcntl, entre processos"""
+    with _trava_cache:
+        if _trava_arquivo or fcntl is None:  # reentrante na mesma thread
+            yield
+            return
+        os.makedirs(CACHE['diretorio'], exist_ok=True)
+        with open(os.path.join(CACHE['diretorio'], '.trava'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            _trava_arquivo.append(f)
+            try:
+                yield
+            finally:
+                _trava_arquivo.pop()
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _indice():
+    try:
+        with open(os.path.join(CACHE['diretorio'], 'indice.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar(caminho, dados, modo='wb'):
+    """Grava atomicamente (arquivo temporário único + os.replace)"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(fd, modo) as f:
+            f.write(dados)
+        os.replace(tmp, caminho)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _objeto(chave):
+    return os.path.join(CACHE['diretorio'], 'objetos', chave)
+
+
+def _do_cache(url):
+    """Conteúdo de url no cache, validado pelo sha256, ou None"""
+    chave = _indice().get(url)
+    if not chave:
+        return None
+    try:
+        with open(_objeto(chave), 'rb') as f:
+            dados = f.read()
+    except OSError:
+        _esquecer(url, chave)
+        return None
+    if hashlib.sha256(dados).hexdigest() != chave:
+        print('[!!] Cache corrompido, descartado: ' + url)
+        with _travado():
+            if os.path.exists(_objeto(chave)):
+                os.remove(_objeto(chave))
+            _esquecer(url, chave)
+        return None
+    try:
+        os.utime(_objeto(chave))  # marca uso recente para o LRU
+    except OSError:
+        pass  # descartado por outra thread depois da leitura
+    return dados
+
+
+def _esquecer(url, chave=None):
+    """Remove url do índice (só se ainda apontar para chave, quando indicada)"""
+    with _travado():
+        indice = _indice()
+        if chave is not None and indice.get(url) != chave:
+            return
+        indice.pop(url, None)
+        _gravar(os.path.join(CACHE['diretorio'], 'indice.json'), json.dumps(indice), 'w')
+
+
+def _para_cache(url, dados):
+    chave = hashlib.sha256(dados).hexdigest()
+    with _travado():
+        os.makedirs(os.path.join(CACHE['diretorio'], 'objetos'), exist_ok=True)
+        _gravar(_objeto(chave), dados)
+        indice = _indice()
+        indice[url] = chave
+        _gravar(os.path.join(CACHE['diretorio'], 'indice.json'), json.dumps(indice), 'w')
+        _descartar(manter=chave)
+
+
+def _descartar(manter=None):
+    """Remove os objetos fora do índice e os usados há mais tempo até caber
+    no limite (chamada dentro de _travado)"""
+    pasta = os.path.join(CACHE['diretorio'], 'objetos')
+    referenciados = set(_indice().values())
+    objetos = []
+    removidos = set()
+    for nome in os.listdir(pasta):
+        if nome.endswith('.tmp'):
+            continue
+        if nome not in referenciados and nome != manter:  # órfão
+            os.remove(os.path.join(pasta, nome))
+            continue
+        st = os.stat(os.path.join(pasta, nome))
+        objetos.append((st.st_mtime, st.st_size, nome))
+    total = sum(o[1] for o in objetos)
+    for uso, tamanho, nome in sorted(objetos):
+        if total <= CACHE['limite']:
+            break
+        if nome == manter:
+            continue
+        os.remove(os.path.join(pasta, nome))
+        removidos.add(nome)
+        total -= tamanho
+    if removidos:
+        indice = {u: c for u, c in _indice().items() if c not in removidos}
+        _gravar(os.path.join(CACHE['diretorio'], 'indice.json'), json.dumps(indice), 'w')
+
+
+def estado_cache():
+    """Resumo do cache: diretório, arquivos, bytes ocupados e limite"""
+    pasta = os.path.join(CACHE['diretorio'], 'objetos')
+    tamanhos = []
+    if os.path.isdir(pasta):
+        tamanhos = [os.path.getsize(os.path.join(pasta, n)) for n in os.listdir(pasta)]
+    return {
+        'diretorio': CACHE['diretorio'],
+        'arquivos': len(_indice()),
+        'bytes': sum(tamanhos),
+        'limite': CACHE['limite'],
+        'offline': CACHE['offline'],
+    }
+
+
+def limpar_cache():
+    """Remove todos os arquivos do cache local"""
+    with _travado():
+        pasta = os.path.join(CACHE['diretorio'], 'objetos')
+        if os.path.isdir(pasta):
+            for nome in os.listdir(pasta):
+                os.remove(os.path.join(pasta, nome))
+        indice = os.path.join(CACHE['diretorio'], 'indice.json')
+        if os.path.exists(indice):
+            os.remove(indice)
 
-import requests
-import pandas as pd
 
+_sessao = None
 
-def carregar_mip_nereus(ano=2015, path=""):
+
+def sessao_http():
+    """requests.Session do processo, com pool de conexões para downloads concorrentes"""
+    global _sessao
+    with _trava_sessao:
+        if _sessao is None:
+            _sessao = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            _sessao.mount('https://', adaptador)
+            _sessao.mount('http://', adaptador)
+    return _sessao
+
+
+def baixar(res, progresso=None):
+    """Conteúdo (bytes) de res no bucket S3, passando pelo cache local
+
+    progresso: callback ou Progresso => etapa 'cc '+res no acerto do cache,
+    's3 '+res a cada bloco de 1 MB recebido da rede
+
+    retorna
+    (dados, origem) com origem 'cc' (cache) ou 's3' (rede)
+    """
+    progresso = Progresso.de(progresso)
+    url = URL + res
+    if CACHE['ativo']:
+        dados = _do_cache(url)
+        if dados is not None:
+            progresso('cc ' + res, len(dados))
+            return dados, 'cc'
+    if CACHE['offline']:
+        raise Exception('[!!] Modo offline: ' + res + ' não está no cache ' + CACHE['diretorio'])
+    resposta = sessao_http().get(url, stream=True)
+    resposta.raise_for_status()
+    partes = []
+    for parte in resposta.iter_content(2**20):
+        partes.append(parte)
+        progresso('s3 ' + res, len(parte))
+    dados = b"".join(partes)
+    if CACHE['ativo']:
+        try:
+            _para_cache(url, dados)
+        except OSError as e:
+            print('[!!] Não foi possível gravar no cache: ' + str(e))
+    return dados, 's3'
+
+
+def carregar_mip_nereus(ano=2015, path="", progresso=None):
     """Carrega as matrizes insumo produtos de 2010 a 2018.
     fonte dos dados: matriz SxS NEREUS-USP formatada em econodata
     https://econodata.s3.amazonaws.com/Nereus/mip68br2010.csv
     retorna dataFrame do ano especificado
     """
-    url = "https://econodata.s3.amazonaws.com/"
     res = "Nereus/mip68br"
-    if path: 
-    	url = path
     ano = str(ano)
     anos = ['2010', '2011', '2012', '2013', '2014', '2015', '2016', '2017', '2018']
     if ano not in anos:
         raise Exception('[!!] Matriz para '+ano+' não está disponível')
-    mip = pd.read_csv(url+res+ano+".csv", index_col=0)
+    progresso = Progresso.de(progresso)
     if path:
+        mip = pd.read_csv(path+res+ano+".csv", index_col=0)
+        progresso('~~ ' + res+ano+".csv", os.path.getsize(path+res+ano+".csv"))
         print('[~~] Carregada MIP SxS Brasil | Nereus USP | ' + ano)
     else:
-        print('[s3] Carregada MIP SxS Brasil | Nereus USP | ' + ano)
+        dados, origem = baixar(res+ano+".csv", progresso)
+        mip = pd.read_csv(io.BytesIO(dados), index_col=0)
+        print('['+origem+'] Carregada MIP SxS Brasil | Nereus USP | ' + ano)
+    progresso('mip nereus')
     return mip
 
 
-def carregar_qls(ano=2018, path=""):
+def carregar_qls(ano=2018, path="", progresso=None):
     """Carrega dataframe dos quocientes locaciomais do ano.
     Precisa estar consistente com o método de regionalização.
     """
-    url = "https://econodata.s3.amazonaws.com/"
     res = "Regional/ql"+str(ano)+".csv"
+    progresso = Progresso.de(progresso)
     if path:
         print('[~~] Tabela de Quocientes Locacionais')
         qls = pd.read_csv(path+res, dtype={'utps':str})
         qls.set_index('utps', inplace=True)
+        progresso('~~ ' + res, os.path.getsize(path+res))
     else:
-        print('[s3] Tabela de Quocientes Locacionais')
-        qls = pd.read_csv(url+res, dtype={'utps':str})
+        dados, origem = baixar(res, progresso)
+        print('['+origem+'] Tabela de Quocientes Locacionais')
+        qls = pd.read_csv(io.BytesIO(dados), dtype={'utps':str})
         qls.set_index('utps', inplace=True)
-
+    progresso('qls')
     return qls
 
 
-def carregar_pop(ano=2018, path=""):
+def carregar_pop(ano=2018, path="", progresso=None):
     """Carrega tabela de dados com proporções da poplução no ano e 
     valores adicionados.
     Precisa estar consistente com o método de regionalização.
     """
-    url = "https://econodata.s3.amazonaws.com/"
     res = "Regional/pop"+str(ano)+".csv"
+    progresso = Progresso.de(progresso)
     if path:
         print('[~~] Tabela de População e VA')
         pop = pd.read_csv(path+res, dtype={'utps':str})
         pop.set_index('utps', inplace=True)
+        progresso('~~ ' + res, os.path.getsize(path+res))
     else:
-        print('[s3] Tabela de População e VA')
-        pop = pd.read_csv(url+res, dtype={'utps':str})
+        dados, origem = baixar(res, progresso)
+        print('['+origem+'] Tabela de População e VA')
+        pop = pd.read_csv(io.BytesIO(dados), dtype={'utps':str})
         pop.set_index('utps', inplace=True)
+    progresso('pop')
     return pop
 
 
-def carregar_utp(path=""):
+def carregar_utp(path="", progresso=None):
     """Carrega tabela de dados com identificação das UTPs
     """
-    url = "https://econodata.s3.amazonaws.com/"
     res = "Regional/utps.csv"
+    progresso = Progresso.de(progresso)
     if path:
         print('[~~] Tabela de UTPs')
         utp = pd.read_csv(path+res, dtype={'utps':str})
         utp.set_index('utps', inplace=True)
+        progresso('~~ ' + res, os.path.getsize(path+res))
     else:
-        print('[s3] Tabela de UTPs')
-        utp = pd.read_csv(url+res, dtype={'utps':str})
+        dados, origem = baixar(res, progresso)
+        print('['+origem+'] Tabela de UTPs')
+        utp = pd.read_csv(io.BytesIO(dados), dtype={'utps':str})
         utp.set_index('utps', inplace=True)
+    progresso('utp')
     return utp
 
 
-def carregar_atividades68(path=""):
-    url = "https://econodata.s3.amazonaws.com/"
+def carregar_atividades68(path="", progresso=None):
     res = "Chaves/atividadesMip68.json"
+    progresso = Progresso.de(progresso)
     if path:
         print('[~~] Códigos e descrição das atividades para MIP 68')
         with open(path+res) as f: 
             atividades = json.loads(f.read())
+        progresso('~~ ' + res, os.path.getsize(path+res))
     else:
-        print('[s3] Códigos e atividades para MIP 68')
-        atividades = json.loads(requests.get(url+res).text)
+        dados, origem = baixar(res, progresso)
+        print('['+origem+'] Códigos e atividades para MIP 68')
+        atividades = json.loads(dados)
     cods68 = atividades["codigos_atividades_68"]
     labels68 = atividades["labels_atividades_68"]
     mapa = {}
     for i in range(len(cods68)):
         mapa[cods68[i]] = labels68[i]
+    progresso('atividades')
     return cods68, labels68, mapa
 
 
-def carregar_compatibiliza_atividades_a_3(path=""):
+def carregar_compatibiliza_atividades_a_3(path="", progresso=None):
     """Carrega referencia para compatibilizar 68 atividades nos 3 grandes setores
     """
-    url = "https://econodata.s3.amazonaws.com/"
     res = "Chaves/compatibiliza68a03.json"
+    progresso = Progresso.de(progresso)
     if path:
         print('[~~] Compatibilização 68 atividades em 3 setores')
         with open(path+res) as f:
             compa = json.loads(f.read())
+        progresso('~~ ' + res, os.path.getsize(path+res))
+        progresso('map3')
         return compa
-    compa = json.loads(requests.get(url+res).text)
-    print('[S3] Compatibilização 68 atividades em 3 setores')
+    dados, origem = baixar(res, progresso)
+    compa = json.loads(dados)
+    print('['+origem+'] Compatibilização 68 atividades em 3 setores')
+    progresso('map3')
     return compa
 
+
+
+# tabelas de referência compartilhadas no processo, por (tabela, ano, path)
+_referencias = {}
+_travas = {}
+_trava = threading.Lock()
+
+_CARREGADORES = {
+    'qls': lambda ano, path, progresso: carregar_qls(ano, path, progresso),
+    'pop': lambda ano, path, progresso: carregar_pop(ano, path, progresso),
+    'utp': lambda ano, path, progresso: carregar_utp(path, progresso),
+    'map3': lambda ano, path, progresso: carregar_compatibiliza_atividades_a_3(path, progresso),
+}
+
+
+def carregar_referencia(tabela, ano=2018, path="", progresso=None):
+    """Tabela de referência (qls, pop, utp ou map3) compartilhada no processo.
+
+    A primeira chamada para (tabela, ano, path) carrega; as demais, de qualquer
+    thread, recebem o mesmo objeto, que deve ser tratado como somente leitura.
+    utp e map3 não dependem do ano. progresso só é chamado se houver carga.
+    """
+    if tabela in ('utp', 'map3'):
+        ano = None
+    chave = (tabela, None if ano is None else str(ano), path)
+    with _trava:
+        if chave in _referencias:
+            return _referencias[chave]
+        trava = _travas.setdefault(chave, threading.Lock())
+    with trava:  # só uma thread carrega cada tabela
+        if chave not in _referencias:
+            _referencias[chave] = _CARREGADORES[tabela](ano, path, progresso)
+        return _referencias[chave]
+
+
+def registrar_referencia(tabela, ano, path, valor):
+    """Define a tabela compartilhada para (tabela, ano, path), p.ex. ao abrir
+    um Nereus gravado, sem passar pelos carregadores"""
+    if tabela in ('utp', 'map3'):
+        ano = None
+    with _trava:
+        _referencias[(tabela, None if ano is None else str(ano), path)] = valor
+
+
+def carregar_referencias(ano=2018, path="", progresso=None):
+    """qls, pop, utp e map3 do ano num dict, compartilhados (ver carregar_referencia)"""
+    progresso = Progresso.de(progresso)
+    return {tabela: carregar_referencia(tabela, ano, path, progresso) for tabela in _CARREGADORES}
+
+
+def invalidar_referencias(ano=None, path=None):
+    """Descarta tabelas compartilhadas (todas, ou só as do ano e/ou path;
+    utp e map3, que não dependem do ano, só saem com ano=None)"""
+    with _trava:
+        for chave in list(_referencias):
+            tabela, a, p = chave
+            if ano is not None and a != str(ano):
+                continue
+            if path is not None and p != path:
+                continue
+            del _referencias[chave]
+
+
+def estado_referencias():
+    """Memória ocupada por cada tabela compartilhada, em bytes"""
+    estado = {}
+    with _trava:
+        itens = list(_referencias.items())
+    for chave, tabela in itens:
+        if hasattr(tabela, 'memory_usage'):
+            estado[chave] = int(tabela.memory_usage(deep=True).sum())
+        else:
+            estado[chave] = len(json.dumps(tabela).encode())
+    return estado
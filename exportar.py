@@ -0,0 +1,326 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-------------------+
+ |  E X P O R T A R  |
+ +-------------------+
+
+Exportação rápida das regionalizações, além do excel de Mipita.salvar
+
+import matriz, exportar
+n = matriz.Nereus(2015)
+m = n.extrair_mipita()
+m.regionalizar('312')
+exportar.exportar(m, 'utp312', formato='npz')     # ou 'csv', 'parquet'
+
+# muitas regiões num único dataset particionado, gravado em segundo plano
+exportar.exportar_lote(m, list(m.qls.index), 'todas', formato='parquet')
+
+with exportar.Exportador('todas', formato='csv') as ex:
+    for lote in lotes:            # Lote de regionalizar_lote ou paralelo
+        ex.adicionar(lote)        # enfileira; o próximo lote já pode ser calculado
+
+Artefatos: mipreg, A, L, Af, Lf, multiplicadores e HR (HRtras, HRfrente, chave).
+
+Layout do dataset (csv e parquet): <destino>/<artefato>/ano=<ano>/parte-00000.<ext>,
+uma tabela longa por parte com as colunas recorte, linha e as colunas do
+artefato. Em npz: <destino>/ano=<ano>/parte-00000.npz com as pilhas
+(regiões x linhas x colunas) e os rótulos. manifesto.json lista as partes.
+Parquet exige pyarrow ou fastparquet.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import importlib.util
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+import matriz
+from dados import ModuloAdiado
+
+pd = ModuloAdiado('pandas')
+
+
+ARTEFATOS = ['mipreg', 'A', 'L', 'Af', 'Lf', 'multiplicadores', 'HR']
+FORMATOS = ['parquet', 'csv', 'npz']
+_EXTENSOES = {'parquet': '.parquet', 'csv': '.csv', 'npz': '.npz'}
+
+
+def tem_parquet():
+    """True se pyarrow ou fastparquet estiver instalado"""
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def _checar_formato(formato):
+    if formato not in FORMATOS:
+        raise Exception('[!!] Formato desconhecido: ' + str(formato) + ' (use ' + ", ".join(FORMATOS) + ')')
+    if formato == 'parquet' and not tem_parquet():
+        raise Exception('[!!] Parquet requer pyarrow ou fastparquet; use csv ou npz')
+
+
+def _rotulos(codigos):
+    """linhas e colunas de cada artefato"""
+    fechados = codigos[0:67] + ['famílias']
+    return {
+        'mipreg': (codigos + matriz.INSUMOS, codigos + matriz.PRODUTOS),
+        'A': (codigos, codigos),
+        'L': (codigos, codigos),
+        'Af': (fechados, fechados),
+        'Lf': (fechados, fechados),
+        'multiplicadores': (matriz.MULTIPLICADORES, codigos + ['famílias']),
+        'HR': (codigos, ['HRtras', 'HRfrente', 'chave']),
+    }
+
+
+def pilhas(fonte):
+    """Artefatos de um Lote ou de uma Mipita regionalizada como pilhas
+
+    retorna
+    (recortes, {artefato: array regiões x linhas x colunas}, rótulos)
+    """
+    if isinstance(fonte, matriz.Lote):
+        recortes = fonte.recortes()
+        arrays = {
+            'mipreg': fonte.mipreg, 'A': fonte.A, 'L': fonte.L, 'Af': fonte.Af,
+            'Lf': fonte.Lf, 'multiplicadores': fonte.multiplicadores,
+            'HR': np.stack([fonte.HRtras, fonte.HRfrente, fonte.chave], axis=-1),
+        }
+        arrays = {nome: np.asarray(valor, dtype=np.float64) for nome, valor in arrays.items()}
+        codigos = fonte.setores
+    else:
+        if not hasattr(fonte, 'mipreg'):
+            raise Exception('[!!] Não há matriz regionalizada para exportar')
+        recortes = [fonte.recorte]
+        chave = [ch for j, ch in fonte.chave]
+        arrays = {
+            'mipreg': fonte.mipreg, 'A': fonte.A, 'L': fonte.L, 'Af': fonte.Af,
+            'Lf': fonte.Lf, 'multiplicadores': fonte.multiplicadores,
+            'HR': np.column_stack([fonte.HRtras, fonte.HRfrente, chave]),
+        }
+        arrays = {nome: np.asarray(valor, dtype=np.float64)[None] for nome, valor in arrays.items()}
+        codigos = fonte.codigos
+    return recortes, arrays, _rotulos(codigos)
+
+
+def _tabela(recortes, pilha, linhas, colunas):
+    """Pilha regiões x linhas x colunas como tabela longa (recorte, linha, colunas...)"""
+    k, r, c = pilha.shape
+    tabela = pd.DataFrame(pilha.reshape(k * r, c), columns=colunas)
+    tabela.insert(0, 'linha', np.tile(np.asarray(linhas, dtype=object), k))
+    tabela.insert(0, 'recorte', np.repeat(np.asarray(recortes, dtype=object), r))
+    return tabela
+
+
+def _gravar_tabela(tabela, arquivo, formato, index=False):
+    temporario = arquivo + '.tmp'
+    if formato == 'parquet':
+        tabela.to_parquet(temporario, index=index)
+    else:
+        tabela.to_csv(temporario, index=index)
+    os.replace(temporario, arquivo)  # leitores nunca veem arquivo pela metade
+
+
+def _gravar_npz(arquivo, recortes, arrays, rotulos, ano):
+    conteudo = {'recortes': np.asarray(recortes), 'ano': np.asarray(ano)}
+    for nome, pilha in arrays.items():
+        conteudo[nome] = pilha
+        conteudo['linhas_' + nome] = np.asarray(rotulos[nome][0])
+        conteudo['colunas_' + nome] = np.asarray(rotulos[nome][1])
+    temporario = arquivo + '.tmp'
+    with open(temporario, 'wb') as f:
+        np.savez(f, **conteudo)  # sem compressão: a gravação não vira gargalo
+    os.replace(temporario, arquivo)
+
+
+def exportar(m, destino=None, formato='npz'):
+    """Grava os artefatos de uma Mipita regionalizada
+
+    destino: str => arquivo .npz, ou pasta com um csv/parquet por artefato
+    (default: m.recorte)
+    formato: 'npz', 'csv' ou 'parquet'
+
+    retorna
+    caminho gravado
+    """
+    _checar_formato(formato)
+    recortes, arrays, rotulos = pilhas(m)
+    destino = destino or m.recorte
+    if formato == 'npz':
+        if not destino.endswith('.npz'):
+            destino += '.npz'
+        _gravar_npz(destino, recortes, arrays, rotulos, m.ano)
+        return destino
+    os.makedirs(destino, exist_ok=True)
+    for nome in ARTEFATOS:
+        linhas, colunas = rotulos[nome]
+        tabela = pd.DataFrame(arrays[nome][0], index=linhas, columns=colunas)
+        _gravar_tabela(tabela, os.path.join(destino, nome + _EXTENSOES[formato]), formato, index=True)
+    return destino
+
+
+class Exportador:
+    """Grava regionalizações num dataset particionado, em segundo plano.
+
+    destino: str => pasta do dataset (criada se preciso; partes já existentes
+    são mantidas e as novas continuam a numeração)
+    formato: 'npz', 'csv' ou 'parquet'
+    fila: int => lotes aguardando gravação antes de adicionar() bloquear
+
+    adicionar(fonte) só enfileira o Lote (ou Mipita regionalizada): a conversão
+    e a escrita acontecem numa thread própria, em paralelo com o cálculo dos
+    próximos lotes. Erros de gravação reaparecem em adicionar() ou fechar().
+    """
+    def __init__(self, destino, formato='npz', fila=4):
+        _checar_formato(formato)
+        self.destino = destino
+        self.formato = formato
+        os.makedirs(destino, exist_ok=True)
+        self.manifesto = self._ler_manifesto()
+        self._fila = queue.Queue(maxsize=fila)
+        self._erro = None
+        self._thread = threading.Thread(target=self._gravar, daemon=True)
+        self._thread.start()
+
+
+    def __repr__(self):
+        r = "Exportador de regionalizações\n"
+        r += "-----------------------------\n"
+        r += self.destino + " | " + self.formato
+        r += "\npartes: " + str(len(self.manifesto['partes']))
+        return r
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+    def _ler_manifesto(self):
+        arquivo = os.path.join(self.destino, 'manifesto.json')
+        if os.path.exists(arquivo):
+            with open(arquivo) as f:
+                manifesto = json.load(f)
+            if manifesto['formato'] != self.formato:
+                raise Exception('[!!] Dataset em ' + self.destino + ' está em ' + manifesto['formato'])
+            return manifesto
+        return {'formato': self.formato, 'artefatos': ARTEFATOS, 'partes': []}
+
+
+    def _gravar_manifesto(self):
+        arquivo = os.path.join(self.destino, 'manifesto.json')
+        with open(arquivo + '.tmp', 'w') as f:
+            json.dump(self.manifesto, f, ensure_ascii=False, indent=1)
+        os.replace(arquivo + '.tmp', arquivo)
+
+
+    def adicionar(self, fonte):
+        """Enfileira um Lote ou uma Mipita regionalizada para gravação"""
+        if self._erro is not None:
+            raise self._erro
+        if self._thread is None:
+            raise Exception('[!!] Exportador já fechado')
+        self._fila.put(fonte)
+
+
+    def _gravar(self):
+        while True:
+            fonte = self._fila.get()
+            if fonte is None:
+                return
+            if self._erro is None:
+                try:
+                    self._gravar_parte(fonte)
+                except Exception as e:
+                    self._erro = e
+
+
+    def _gravar_parte(self, fonte):
+        recortes, arrays, rotulos = pilhas(fonte)
+        ano = str(fonte.base.ano if isinstance(fonte, matriz.Lote) else fonte.ano)
+        parte = 'parte-%05d' % len(self.manifesto['partes'])
+        arquivos = []
+        if self.formato == 'npz':
+            pasta = os.path.join(self.destino, 'ano=' + ano)
+            os.makedirs(pasta, exist_ok=True)
+            arquivo = os.path.join(pasta, parte + '.npz')
+            _gravar_npz(arquivo, recortes, arrays, rotulos, ano)
+            arquivos.append(arquivo)
+        else:
+            for nome in ARTEFATOS:
+                pasta = os.path.join(self.destino, nome, 'ano=' + ano)
+                os.makedirs(pasta, exist_ok=True)
+                arquivo = os.path.join(pasta, parte + _EXTENSOES[self.formato])
+                _gravar_tabela(_tabela(recortes, arrays[nome], *rotulos[nome]), arquivo, self.formato)
+                arquivos.append(arquivo)
+        self.manifesto['partes'].append({
+            'ano': ano, 'recortes': recortes,
+            'arquivos': [os.path.relpath(a, self.destino) for a in arquivos],
+        })
+        self._gravar_manifesto()  # a cada parte: o dataset fica legível mesmo se interrompido
+
+
+    def fechar(self):
+        """Espera a gravação do que está na fila e encerra a thread"""
+        if self._thread is not None:
+            self._fila.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._erro is not None:
+            raise self._erro
+        print('[>>] Dataset ' + self.destino + ' | ' + self.formato + ' | '
+            + str(sum(len(p['recortes']) for p in self.manifesto['partes'])) + ' regiões')
+
+
+def exportar_lote(base, areas, destino, formato='npz', bloco=64, exceto=False):
+    """Regionaliza areas em blocos e grava tudo num único dataset
+
+    base: Mipita => como em Mipita.regionalizar_lote
+    bloco: int => áreas por parte; a gravação de um bloco corre enquanto o
+    próximo é calculado
+
+    retorna
+    manifesto do dataset
+    """
+    with Exportador(destino, formato) as ex:
+        for i in range(0, len(areas), bloco):
+            ex.adicionar(base.regionalizar_lote(areas[i:i+bloco], exceto))
+    return ex.manifesto
+
+
+def ler(destino, artefato, ano=None):
+    """Lê um artefato do dataset gravado por Exportador
+
+    csv/parquet: tabela longa (recorte, linha, colunas...)
+    npz: (recortes, pilha regiões x linhas x colunas, linhas, colunas)
+    """
+    with open(os.path.join(destino, 'manifesto.json')) as f:
+        manifesto = json.load(f)
+    partes = [p for p in manifesto['partes'] if ano is None or p['ano'] == str(ano)]
+    if not partes:
+        raise Exception('[!!] Nenhuma parte' + ('' if ano is None else ' de ' + str(ano)) + ' em ' + destino)
+    if manifesto['formato'] == 'npz':
+        recortes, pilha, linhas, colunas = [], [], None, None
+        for p in partes:
+            with np.load(os.path.join(destino, p['arquivos'][0])) as z:
+                if artefato not in z.files:
+                    raise Exception('[!!] Artefato ' + artefato + ' não encontrado em ' + destino)
+                recortes += z['recortes'].tolist()
+                pilha.append(z[artefato])
+                linhas, colunas = z['linhas_' + artefato].tolist(), z['colunas_' + artefato].tolist()
+        return recortes, np.concatenate(pilha), linhas, colunas
+    arquivos = [a for p in partes for a in p['arquivos'] if a.split(os.sep)[0] == artefato]
+    if not arquivos:
+        raise Exception('[!!] Artefato ' + artefato + ' não encontrado em ' + destino)
+    if manifesto['formato'] == 'parquet':
+        tabelas = [pd.read_parquet(os.path.join(destino, a)) for a in arquivos]
+    else:
+        tabelas = [pd.read_csv(os.path.join(destino, a), dtype={'recorte': str, 'linha': str}) for a in arquivos]
+    return pd.concat(tabelas, ignore_index=True)
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-----------------------------+
+ |  I N T E R R E G I O N A L  |
+ +-----------------------------+
+
+Modelo inter-regional esparso: k regiões x 68 setores, com fluxos entre elas
+
+import matriz, interregional
+n = matriz.Nereus(2015)
+m = n.extrair_mipita()
+ir = interregional.Interregional(m, ['312', '313', ['401', '402']])
+ir.solve(f)                          # produção regional para demandas k x 68
+ir.transbordamento()                 # regiões x regiões x 68 setores
+ir.multiplicadores()                 # próprio, transbordamento e total por (região, setor)
+
+Cada região é regionalizada como em Mipita.regionalizar (blocos A, B e C e
+equalização); por padrão o resto do Brasil entra como uma região a mais,
+para fechar o comércio. Da equalização vêm, por produto i:
+
+vendeu_r[i]: excedente da região r vendido ao resto do país
+comprou_s[i]: parte do uso de i em s que vem de fora da região
+
+e o comércio segue a hipótese de Chenery-Moses (um pool nacional por produto):
+
+p_s[i] = 1 - comprou_s[i] / uso local_s[i]     (autoabastecimento)
+t_r[i] = vendeu_r[i] / soma_r vendeu_r[i]        (participação no pool)
+
+A_rr = diag(p_r) A_r         A_rs = diag(t_r) diag(1 - p_s) A_s
+
+A e os coeficientes diretos C (valor adicionado, salários e emprego) são
+por unidade de produção local, X_r = total de insumos - comprou_r, a mesma
+base de x; assim C_r X_r reproduz o valor adicionado da tabela regional.
+
+Em vez de montar os k^2 blocos A_rs (densos), o pool q entra como variável
+auxiliar, o que mantém a matriz com ~2k blocos não nulos:
+
+x_r - diag(p_r) A_r x_r - diag(t_r) q = diag(p_r) f_r
+q - soma_s diag(1 - p_s) A_s x_s      = soma_s diag(1 - p_s) f_s
+
+O sistema 68(k+1) x 68(k+1) fica em scipy.sparse e é fatorado uma vez com
+splu; multiplicadores e transbordamentos saem de solves transpostos com k
+colunas, sem a inversa densa 68k x 68k. Requer scipy.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import numpy as np
+
+try:  # scipy é opcional no projeto, mas obrigatório aqui
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import splu
+except ImportError:
+    sp = splu = None
+
+import matriz
+from dados import ModuloAdiado
+
+pd = ModuloAdiado('pandas')
+
+
+class Interregional:
+    """Modelo inter-regional esparso de Chenery-Moses sobre uma Mipita.
+
+    base: Mipita => dados de base (qls, pop, mipita nacional, empregos)
+    areas: list => regiões, como em Mipita.regionalizar_lote
+    resto: bool => se True acrescenta o resto do Brasil como última região
+    """
+    def __init__(self, base, areas, resto=True):
+        if sp is None:
+            raise Exception('[!!] O modelo inter-regional requer scipy (scipy.sparse)')
+        self.base = base
+        self.setores = base.codigos
+        grupos = base.grupos_lote(areas)
+        mip, Q, propT, empregos = base.arrays_lote()
+        G = base.agregacao_lote(grupos)
+        self.recortes = [" ".join(g) for g in grupos]
+        if (G.sum(axis=0) > 1 + 1e-9).any():
+            raise Exception('[!!] Uma UTP aparece mais de uma vez entre as regiões')
+        if resto:
+            G = np.vstack([G, 1 - G.sum(axis=0, keepdims=True)])
+            self.recortes.append('resto do Brasil')
+        self.qL = G.dot(Q)
+        self.propT = G.dot(propT)
+        self.k = k = len(self.recortes)
+        self.mipreg, self.comprou, self.vendeu = matriz.regionalizar_mipita(mip, self.qL, self.propT)
+        self.empregos = self.qL * empregos
+
+        # coeficientes técnicos regionais: insumos domésticos / produção local
+        Z = self.mipreg[:, 0:68, 0:68]
+        self.X = X = self.mipreg[:, 76, 0:68] - self.comprou
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.A = np.where(X[:, None, :] > 0, Z / X[:, None, :], 0.0)
+            uso = self.mipreg[:, 0:68, 75] - self.vendeu
+            self.p = np.clip(np.where(uso > 0, 1 - self.comprou / uso, 1.0), 0.0, 1.0)
+            pool = self.vendeu.sum(axis=0)
+            self.t = np.where(pool > 0, self.vendeu / pool, 0.0)
+            # coeficientes diretos na mesma base de A e x (produção local),
+            # para que C x reproduza o valor adicionado, salários e empregos
+            va = self.mipreg[:, [72, 73, 74], 0:68].sum(axis=1)
+            sal = self.mipreg[:, 72, 0:68]
+            self.C = np.stack([
+                np.where(X > 0, v / X, 0.0) for v in (X, va, sal, self.empregos)
+            ], axis=1)  # k x 4 x 68
+
+        self.M = self._montar()
+        self._lu = splu(self.M.tocsc())
+        # demanda final das regiões -> lado direito do sistema aumentado
+        self.B = sp.vstack([
+            sp.diags(self.p.ravel()),
+            sp.hstack([sp.diags(1 - self.p[s]) for s in range(k)]),
+        ]).tocsr()
+
+
+    def __repr__(self):
+        r = "Modelo inter-regional - Mipita\n"
+        r += "------------------------------\n"
+        r += self.base.ano + " | regiões: " + str(self.k)
+        r += "\nsistema: " + " x ".join(str(d) for d in self.M.shape)
+        r += " | não nulos: " + str(self.M.nnz)
+        r += " (" + str(round(100 * self.densidade(), 3)) + "%)"
+        return r
+
+
+    def _montar(self):
+        """Matriz esparsa do sistema aumentado [x_1 .. x_k, q]"""
+        k, n = self.k, 68
+        locais = [sp.identity(n) - sp.csr_matrix(self.p[r][:, None] * self.A[r]) for r in range(k)]
+        importados = [sp.csr_matrix((1 - self.p[s])[:, None] * self.A[s]) for s in range(k)]
+        blocos = [[None] * (k + 1) for _ in range(k + 1)]
+        for r in range(k):
+            blocos[r][r] = locais[r]
+            blocos[r][k] = -sp.diags(self.t[r])
+            blocos[k][r] = -importados[r]
+        blocos[k][k] = sp.identity(n)
+        return sp.bmat(blocos, format='csc')
+
+
+    def densidade(self):
+        """Fração de elementos não nulos da matriz do sistema"""
+        return self.M.nnz / float(self.M.shape[0] * self.M.shape[1])
+
+
+    def solve(self, f):
+        """Produção de cada região para a demanda final f
+
+        f: array k x 68 (uma demanda por região) ou k x 68 x m (m cenários)
+
+        retorna
+        array k x 68 (ou k x 68 x m)
+        """
+        f = np.asarray(f, dtype=np.float64)
+        cenarios = f.shape[2:]
+        b = self.B @ f.reshape(self.k * 68, -1)
+        x = self._lu.solve(b)[0:self.k * 68]
+        return x.reshape((self.k, 68) + cenarios)
+
+
+    def transbordamento(self, variavel='produto'):
+        """Efeito em cada região de 1 unidade de demanda final em cada (região, setor)
+
+        variavel: 'produto', 'adicionado', 'salários' ou 'emprego'
+
+        retorna
+        array k x k x 68: [r, s, j] = efeito na região r da demanda no setor j da região s
+        """
+        v = matriz.VARIAVEIS.index(variavel)
+        k, n = self.k, 68
+        # R pondera a produção de cada região pelo coeficiente direto da variável
+        R = sp.csr_matrix((self.C[:, v, :].ravel(), (np.repeat(np.arange(k), n), np.arange(k * n))),
+            shape=(k, k * n))
+        P = sp.vstack([R.T, sp.csr_matrix((n, k))]).toarray()   # 68(k+1) x k
+        y = self._lu.solve(P, trans='T')                        # M^-T P
+        efeito = (self.B.T @ y).T                               # k x 68k
+        return efeito.reshape(k, k, n)
+
+
+    def multiplicadores(self, variavel='produto'):
+        """Multiplicadores inter-regionais por (região, setor) de origem da demanda
+
+        retorna
+        DataFrame com próprio (na região da demanda), transbordamento (nas
+        demais) e total
+        """
+        T = self.transbordamento(variavel)
+        total = T.sum(axis=0)                                   # k x 68
+        proprio = T[np.arange(self.k), np.arange(self.k), :]    # k x 68
+        indice = pd.MultiIndex.from_product([self.recortes, self.setores], names=['recorte', 'setor'])
+        return pd.DataFrame({
+            'próprio': proprio.ravel(),
+            'transbordamento': (total - proprio).ravel(),
+            'total': total.ravel(),
+        }, index=indice)
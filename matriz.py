@@ -24,12 +24,141 @@ __author__ = "Mauro Zackiewicz"
 __email__ = "maurozac@gmail.com"
 
 
+import copy
+import hashlib
 import json
+import os
+import threading
+from collections import OrderedDict
 
 import numpy as np
-import pandas as pd
 
-from dados import *
+from dados import (
+    ModuloAdiado, Progresso, URL, CACHE, configurar_cache, estado_cache, limpar_cache,
+    sessao_http, baixar, carregar_mip_nereus, carregar_qls, carregar_pop,
+    carregar_utp, carregar_atividades68, carregar_compatibiliza_atividades_a_3,
+    carregar_referencia, registrar_referencia, carregar_referencias,
+    invalidar_referencias, estado_referencias,
+)
+
+pd = ModuloAdiado('pandas')  # importado no primeiro uso
+
+_LU = None
+
+
+def _lu_scipy():
+    """(lu_factor, lu_solve) do scipy, importados no primeiro uso; None sem scipy
+
+    scipy é opcional: sem ele cada solve refatora I-A via numpy
+    """
+    global _LU
+    if _LU is None:
+        try:
+            from scipy.linalg import lu_factor, lu_solve
+            _LU = (lu_factor, lu_solve)
+        except ImportError:
+            _LU = False
+    return _LU or None
+
+
+# rótulos do padrão mipita, abaixo e à direita do bloco SxS
+INSUMOS = ['importado do mundo', 'impostos de importação', 'importado do Brasil',
+    'impostos', 'salários', 'contribuições sociais', 'margem',
+    'outros impostos e subsídios', 'total_insumos']
+PRODUTOS = ['exportado ao mundo', 'exportado ao Brasil', 'governo', 'isfl',
+    'famílias', 'capital fixo', 'estoque', 'total_produtos']
+MULTIPLICADORES = ['eD produto', 'eDN produto', 'eDNZ produto', 'eDNZ+ produto'] + [
+    m + ' ' + v
+    for v in ['adicionado', 'salários', 'emprego']
+    for m in ['eD', 'eDN', 'eDNZ', 'eDNZ+', 'mD', 'mDN', 'mDNZ', 'mDNZ+']
+]
+EFEITOS = ['direto', 'indireto', 'induzido']
+VARIAVEIS = ['produto', 'adicionado', 'salários', 'emprego']
+
+
+class MipArray:
+    """Mipita num único bloco float64 contíguo, com rótulos fixos.
+
+    dados: array 77 x 76 (ou pilha areas x 77 x 76)
+    linhas: codigos + INSUMOS
+    colunas: codigos + PRODUTOS
+
+    Os blocos são views de dados, sem cópia:
+    sxs: 68 x 68
+    importacoes: importado do mundo, impostos de importação, importado do Brasil
+    adicionado: salários, contribuições sociais, margem, outros impostos e subsídios
+    demanda_final: 68 x 7
+    total_insumos, total_produtos
+    """
+    def __init__(self, dados=None, codigos=None):
+        if dados is None:
+            dados = np.zeros((77, 76))
+        self.dados = np.ascontiguousarray(dados, dtype=np.float64)
+        self.codigos = list(codigos)
+        self.linhas = self.codigos + INSUMOS
+        self.colunas = self.codigos + PRODUTOS
+
+
+    def __repr__(self):
+        return "MipArray " + " x ".join(str(d) for d in self.dados.shape)
+
+
+    def __array__(self, dtype=None):
+        return self.dados if dtype is None else self.dados.astype(dtype)
+
+
+    def __getitem__(self, k):
+        return MipArray(self.dados[k], self.codigos)
+
+
+    @classmethod
+    def de_frame(cls, df, codigos):
+        """MipArray a partir de um DataFrame no padrão mipita (reordena pelos rótulos)"""
+        return cls(df.loc[codigos + INSUMOS, codigos + PRODUTOS].values, codigos)
+
+
+    def to_frame(self):
+        """DataFrame 77 x 76 sobre os mesmos dados"""
+        return pd.DataFrame(self.dados, index=self.linhas, columns=self.colunas, copy=False)
+
+
+    def linha(self, rotulo):
+        return self.dados[..., self.linhas.index(rotulo), :]
+
+
+    def coluna(self, rotulo):
+        return self.dados[..., :, self.colunas.index(rotulo)]
+
+
+    @property
+    def sxs(self):
+        return self.dados[..., 0:68, 0:68]
+
+
+    @property
+    def importacoes(self):
+        return self.dados[..., 68:71, 0:68]
+
+
+    @property
+    def adicionado(self):
+        return self.dados[..., 72:76, 0:68]
+
+
+    @property
+    def demanda_final(self):
+        return self.dados[..., 0:68, 68:75]
+
+
+    @property
+    def total_insumos(self):
+        return self.dados[..., 76, 0:68]
+
+
+    @property
+    def total_produtos(self):
+        return self.dados[..., :, 75]
+
 
 
 class Mipita():
@@ -61,21 +190,31 @@ class Mipita():
     'estoque',
     'total_produtos'
 
+    progresso: callback(etapa, bytes, decorrido) => carga das tabelas de
+    referência e etapas de regionalizar (ver dados.Progresso e ETAPAS)
     """
-    def __init__(self, ano, path):
+    # etapas relatadas por regionalizar, em ordem ('memo' substitui todas)
+    ETAPAS = ['qL', 'bloco A', 'bloco B', 'bloco C', 'equalização', 'ajuste', 'coeficientes',
+        'leontief', 'multiplicadores', 'HR']
+
+    def __init__(self, ano, path, progresso=None):
         self.recorte = ''
         self.fonte = ''
         self.ano = ano
         self.path = path
         self.mipita = None
+        self.nucleo = None
         self.codigos = None
         self.atividades = None
         self.empregos = None
         self.metodo = 'Método de regionalização: UTPs'
-        self.qls = carregar_qls(ano, path)
-        self.pop = carregar_pop(ano, path)
-        self.utp = carregar_utp(path)
-        self.map3 = carregar_compatibiliza_atividades_a_3(path)
+        # tabelas compartilhadas entre instâncias do mesmo (ano, path): não alterar
+        progresso = Progresso.de(progresso)
+        with progresso.fase('Mipita'):
+            self.qls = carregar_referencia('qls', ano, path, progresso)
+            self.pop = carregar_referencia('pop', ano, path, progresso)
+            self.utp = carregar_referencia('utp', ano, path, progresso)
+            self.map3 = carregar_referencia('map3', ano, path, progresso)
 
 
     def __repr__(self):
@@ -88,131 +227,192 @@ class Mipita():
         return r
 
 
-    def regionalizar(self, area, label="", exceto=False):
+    @property
+    def L(self):
+        """Matriz de Leontief aberta, materializada no primeiro acesso"""
+        return self.solver.L
+
+
+    @property
+    def Lf(self):
+        """Matriz de Leontief fechada, materializada no primeiro acesso"""
+        return self.solver_f.L
+
+
+    def base(self):
+        """Mipita nacional como MipArray (construída a partir de self.mipita se preciso)"""
+        if self.nucleo is None:
+            self.nucleo = MipArray.de_frame(self.mipita, self.codigos)
+        return self.nucleo
+
+
+    def regionalizar(self, area, label="", exceto=False, progresso=None):
         """Regionalização de matriz de insumos-produtos brasileira
 
         area: str ou list de str => códigos das areas (consistente com método de regionalização) 
         exceto: bool => se True calcula o complementar (resto do Brasil)
+        progresso: callback(etapa, bytes, decorrido) => chamado ao fim de cada
+        etapa de Mipita.ETAPAS, ou uma vez com 'memo' se já calculada
         """
-        if type(area) is not list:
-            if type(area) is int: area = str(area)
-            area = [area]
+        progresso = Progresso.de(progresso)
+        with progresso.fase('regionalizar'):
+            if type(area) is not list:
+                if type(area) is int: area = str(area)
+                area = [area]
+
+            if not label:
+                label = "Regionalizada UTP: " + " ".join(area)
+            self.recorte = label
+
+            chave = None
+            if MEMO.ativo:
+                # tuple ordenada: a ordem não importa, mas códigos repetidos sim
+                chave = (str(self.ano), tuple(sorted(str(a) for a in area)), bool(exceto), self.assinatura())
+                resultado = MEMO.obter(chave)
+                if resultado is not None:
+                    self.__dict__.update(resultado)  # mesmos objetos, sem cópia
+                    progresso('memo')
+                    return None
+
+            self.area = area
+            self.qL = self.qls.loc[area].sum()
+            self.propT = self.pop.loc[area]['propT'].sum()
+
+            if exceto:
+                self.qL = 1 - self.qL
+                self.propT = 1 - self.propT
+                self.area = [u for u in list(self.qls.index) if u not in area]
+            progresso('qL')
+
+            # blocos A, B e C e equalização com o Brasil: ver regionalizar_mipita
+            mipreg, comprou, vendeu = regionalizar_mipita(
+                self.base(), self.qL.reindex(self.codigos).values, self.propT, progresso)
+            self.nucleo_reg = MipArray(mipreg[0], self.codigos)
+            self.mipreg = self.nucleo_reg.to_frame()  # 77x76, sem cópia
+            self.sxs = self.mipreg.iloc[0:68, 0:68]
+            self.insumos = self.mipreg.iloc[:, 0:68]
+            self.consumo = self.mipreg.iloc[0:68, 68:75]
+            self.comprou = comprou[0].tolist()
+            self.vendeu = vendeu[0].tolist()
+            self.ajuste = self.avaliar()
+            progresso('ajuste')
+            self.A = matriz_coeficientes_tecnicos(self.nucleo_reg, fechada=False)
+            self.Af = matriz_coeficientes_tecnicos(self.nucleo_reg, fechada=True)
+            progresso('coeficientes')
+            self.solver = LeontiefSolver(self.A)
+            self.solver_f = LeontiefSolver(self.Af)
+            progresso('leontief')
+            # empregos => p/ multiplicadores
+            self.empregos_regiao = self.empregos[0:68].multiply(self.qL)
+            self.multiplicadores = multiplicadores(self.nucleo_reg, self.empregos_regiao, self.solver, self.solver_f)
+            progresso('multiplicadores')
+            self.HRtras, self.HRfrente, self.chave = indice_HR(self.solver)
+            progresso('HR')
+
+            if chave is not None:
+                MEMO.guardar(chave, {nome: getattr(self, nome) for nome in _REGIONALIZADOS})
+        return None
+
 
-        if not label:
-            label = "Regionalizada UTP: " + " ".join(area)
-        self.recorte = label
+    def assinatura(self):
+        """Hash dos dados de base da regionalização (mipita, qls, propT, empregos)"""
+        tabelas = (id(self.nucleo), id(self.qls), id(self.pop))
+        if getattr(self, '_assinatura', (None,))[0:3] != tabelas:
+            h = hashlib.sha1()
+            for arr in self.arrays_lote():
+                h.update(np.ascontiguousarray(arr).tobytes())
+            self._assinatura = tabelas + (h.hexdigest(),)
+        return self._assinatura[3]
 
-        self.area = area
-        self.qL = self.qls.loc[area].sum()
-        self.propT = self.pop.loc[area]['propT'].sum()
 
+    def regionalizar_lote(self, areas, exceto=False):
+        """Regionalização de várias áreas numa única passada vetorizada
+
+        areas: list => cada item é um código (str/int) ou uma list de códigos
+        agregados numa mesma região
+        exceto: bool => se True calcula o complementar de cada item
+
+        retorna
+        Lote com mipreg, A, Af, L, Lf, multiplicadores e índices HR empilhados
+        (áreas x ...), equivalentes aos obtidos com regionalizar() área a área
+        """
+        grupos = self.grupos_lote(areas)
+        mip, Q, propT, empregos = self.arrays_lote()
+        G = self.agregacao_lote(grupos)
+        qL = G.dot(Q)          # areas x 68
+        propT = G.dot(propT)   # areas
         if exceto:
-            self.qL = 1 - self.qL
-            self.propT = 1 - self.propT
-            self.area = [u for u in list(self.qls.index) if u not in area]
-
-        # BLOCO A # Inputs da Economia, 68x68 e linha abaixo da matriz sxs
-        self.sxs = self.mipita.iloc[0:68, 0:68].multiply(self.qL, axis=1)
-        importado_inter = self.mipita.loc['importado do mundo'][0:68].multiply(self.qL)
-        importado_inter_impostos = self.mipita.loc['impostos de importação'][0:68].multiply(self.qL)
-        impostos_inter = self.mipita.loc['impostos'][0:68].multiply(self.qL)
-        salarios = self.mipita.loc['salários'][0:68].multiply(self.qL)
-        sociais = self.mipita.loc['contribuições sociais'][0:68].multiply(self.qL)
-        margem = self.mipita.loc['margem'][0:68].multiply(self.qL)
-        outros = self.mipita.loc['outros impostos e subsídios'][0:68].multiply(self.qL)
-        self.insumos = pd.concat([
-            self.sxs,
-            pd.DataFrame({'importado do mundo': importado_inter}).T,
-            pd.DataFrame({'impostos de importação': importado_inter_impostos}).T,
-            pd.DataFrame({'importado do Brasil': np.zeros(68)}, index=self.codigos).T,
-            pd.DataFrame({'impostos': impostos_inter}).T,
-            pd.DataFrame({'salários': salarios}).T,
-            pd.DataFrame({'contribuições sociais': sociais}).T,
-            pd.DataFrame({'margem': margem}).T,
-            pd.DataFrame({'outros impostos e subsídios': outros}).T,
-        ], axis=0)  # 76x68
-        insumos = pd.DataFrame({"total_insumos":self.insumos.sum(axis=0)})
-        self.insumos = pd.concat([self.insumos, insumos.T], axis=0)  # 77x68
-
-        # BLOCO B # Outpus em colunas à direita do bloco A
-        # colunas que dependem da produção local
-        exporta = self.mipita['exportado ao mundo'][0:68].multiply(self.qL)
-        capfixo = self.mipita['capital fixo'][0:68].multiply(self.qL)
-        estoque = self.mipita['estoque'][0:68].multiply(self.qL)
-        # propT: aplica a colunas que dependem do tamanho do PIB/Pop local
-        governo = self.mipita['governo'][0:68].multiply(self.propT)
-        semlucro = self.mipita['isfl'][0:68].multiply(self.propT)
-        familias = self.mipita['famílias'][0:68].multiply(self.propT)
-        self.consumo = pd.concat([
-            exporta,
-            pd.DataFrame({"exportado ao Brasil":np.zeros(68)}, index=self.codigos),
-            governo,
-            semlucro,
-            familias,
-            capfixo,
-            estoque,
-        ], axis=1) # 68x7
-        self.consumo.columns = ['exportado ao mundo', 'exportado ao Brasil',
-            'governo', 'isfl', 'famílias', 'capital fixo', 'estoque']
-
-        # BLOCO C # Importado e impostos do consumo, demais linhas zeradas
-        C = pd.DataFrame(
-            {
-                'exportado ao mundo': np.zeros(9),
-                'exportado ao Brasil': np.zeros(9),
-                'governo': np.zeros(9),
-                'isfl': np.zeros(9),
-                'famílias': np.zeros(9),
-                'capital fixo': np.zeros(9),
-                'estoque': np.zeros(9),
-            },
-            index = ['importado do mundo', 'impostos de importação', 'importado do Brasil',
-            'impostos', 'salários','contribuições sociais', 'margem',
-            'outros impostos e subsídios', 'total_insumos']
-        ) # 9x7
-        # Estima mantendo a proporção entre o consumo local e o consumo nacional
-        C.loc['importado do mundo'] = self.mipita.loc['importado do mundo'][68:75].multiply(self.propT)
-        C.loc['impostos de importação'] = self.mipita.loc['impostos de importação'][68:75].multiply(self.propT)
-        C.loc['impostos'] = self.mipita.loc['impostos'][68:75].multiply(self.propT)
-        C.loc['salários'] = self.mipita.loc['salários'][68:75].multiply(self.propT)
-        C.loc['contribuições sociais'] = self.mipita.loc['contribuições sociais'][68:75].multiply(self.propT)
-        # Juntar (B + C) + A
-        BC = pd.concat([self.consumo, C], axis=0)
-        self.mipreg = pd.concat([self.insumos, BC], axis=1)  # 77x75
-        self.mipreg['total_produtos'] = self.mipreg.sum(axis=1) # 77x76
-
-        # EQUALIZAR imp e exp para o Brasil
-        """Hipótese subjacente da modelagem para as compras e vendas ao Brasil
-        => compras e vendas são realizadas apenas pelas atividades intermediarias
-        => consumo final não compra direto de fora da região [PENSAR NISSO]
+            qL = 1 - qL
+            propT = 1 - propT
+        resultados = calcular_lote(mip, qL, propT, empregos)
+        return Lote(self, grupos, exceto, resultados)
+
+
+    def grupos_lote(self, areas):
+        """Normaliza areas do lote para list de list de códigos str"""
+        grupos = []
+        for area in areas:
+            if type(area) is not list:
+                area = [area]
+            grupos.append([str(a) for a in area])
+        return grupos
+
+
+    def agregacao_lote(self, grupos):
+        """Matriz de agregação: itens do lote x utps da tabela de qls
+
+        Um código repetido num grupo conta uma vez para cada ocorrência,
+        como em regionalizar (qls.loc[area].sum()).
         """
-        E = self.mipreg["total_produtos"][0:68] - self.mipreg.loc['total_insumos'][0:68]
-        comprou, vendeu = [], []
-        for eq in E:
-            if eq >= 0:  # demanda maior que o produto => comprou
-                comprou.append(eq)
-                vendeu.append(0.0)
-            else:        # produto maior que a demanda => vendeu
-                comprou.append(0.0)
-                vendeu.append(abs(eq))
-        self.comprou = comprou
-        self.vendeu = vendeu
-        self.mipreg.loc['importado do Brasil'] = comprou + np.zeros(76-68).tolist()
-        self.mipreg['exportado ao Brasil'] = vendeu + np.zeros(77-68).tolist()
-        # soma tudo de novo
-        self.mipreg.loc['total_insumos'][0:68] = self.mipreg.iloc[0:76,0:68].sum(axis=0)
-        self.mipreg['total_produtos'] = self.mipreg.iloc[0:77,0:75].sum(axis=1)
-        self.ajuste = self.avaliar()
-        self.A = matriz_coeficientes_tecnicos(self.mipreg, fechada=False)
-        self.Af = matriz_coeficientes_tecnicos(self.mipreg, fechada=True)
-        self.L = matriz_leontief(self.A)
-        self.Lf = matriz_leontief(self.Af)
-        # empregos => p/ multiplicadores
-        self.empregos_regiao = self.empregos[0:68].multiply(self.qL)
-        self.multiplicadores = multiplicadores(self.mipreg, self.empregos_regiao, self.L, self.Lf)
-        self.HRtras, self.HRfrente, self.chave = indice_HR(self.L)
+        pos = {u: i for i, u in enumerate(self.qls.index)}
+        G = np.zeros((len(grupos), len(pos)))
+        for k, grupo in enumerate(grupos):
+            for u in grupo:
+                G[k, pos[u]] += 1.0
+        return G
 
-        return None
+
+    def arrays_lote(self):
+        """Dados de base da regionalização como arrays alinhados aos códigos
+
+        retorna
+        mip: 77x76, qls: utps x 68, propT: utps, empregos: 68
+        """
+        mip = self.base().dados
+        qls = self.qls.reindex(columns=self.codigos).values
+        propT = self.pop['propT'].reindex(self.qls.index).values
+        empregos = self.empregos.reindex(self.codigos).values
+        return mip, qls, propT, empregos
+
+
+    def impactos(self, choques, modo='exato', tol=1e-8, max_iter=1000):
+        """Impactos de cenários de choque na demanda final da região (ver impactos())
+
+        choques: array ou DataFrame cenários x 68 setores (+ 'famílias')
+        modo: 'exato' (LU), 'serie' ou 'gmres' (aproximados, ver LeontiefIterativo)
+
+        retorna
+        array cenários x 3 efeitos x 4 variáveis x 68 setores
+        """
+        if not hasattr(self, 'mipreg'):
+            raise Exception('[!!] Não há matriz regionalizada para calcular impactos')
+        L, Lf = self.solvers(modo, tol, max_iter)
+        return impactos(self.nucleo_reg, self.empregos_regiao.reindex(self.codigos).values,
+            L, Lf, _choques(choques, self.codigos))
+
+
+    def solvers(self, modo='exato', tol=1e-8, max_iter=1000):
+        """(solver, solver_f) de A e Af: os exatos já calculados ou, com modo
+        'serie' ou 'gmres', LeontiefIterativo novos (ver solucionador)"""
+        if modo == 'exato':
+            return self.solver, self.solver_f
+        return solucionador(self.A, modo, tol, max_iter), solucionador(self.Af, modo, tol, max_iter)
+
+
+    def multiplicadores_modo(self, modo='serie', tol=1e-8, max_iter=1000):
+        """multiplicadores() com o solver escolhido, sem alterar self.multiplicadores"""
+        L, Lf = self.solvers(modo, tol, max_iter)
+        return multiplicadores(self.nucleo_reg, self.empregos_regiao, L, Lf)
 
 
     def avaliar(self):
@@ -256,6 +456,33 @@ class Mipita():
         return ajuste
 
 
+    def calibrar(self, areas=None, exceto=False):
+        """Relatório de avaliar() para muitas áreas de uma vez
+
+        areas: list => como em regionalizar_lote (default: todas as UTPs)
+        exceto: bool => se True avalia o complementar de cada item
+
+        Só a mipreg é calculada (sem A, L e multiplicadores).
+
+        retorna
+        DataFrame por recorte, ordenado do pior para o melhor ajuste (ver calibracao)
+        """
+        grupos = self.grupos_lote(areas if areas is not None else list(self.qls.index))
+        mip, Q, propT, empregos = self.arrays_lote()
+        G = self.agregacao_lote(grupos)
+        qL = G.dot(Q)
+        propT = G.dot(propT)
+        ref = self.pop[_VAB_REFERENCIA].reindex(self.qls.index).values
+        vabM = G.dot(ref)
+        if exceto:
+            qL = 1 - qL
+            propT = 1 - propT
+            vabM = ref.sum(axis=0) - vabM
+        mipreg = regionalizar_mipita(mip, qL, propT)[0]
+        recortes = [("exceto " if exceto else "") + " ".join(g) for g in grupos]
+        return calibracao(mipreg, vabM, matriz_agregacao(self.map3, self.codigos), recortes)
+
+
     def salvar(self):
         """Salva um excel com mipita regionalizada, As, Ls, e multiplicadores"""
 
@@ -284,103 +511,328 @@ class Mipita():
             print('[oo] Não há matriz regionalizada para salvar')
 
 
+    def exportar(self, destino=None, formato='npz'):
+        """Grava mipreg, A, L, Af, Lf, multiplicadores e HR em npz, csv ou parquet,
+        bem mais rápido que salvar (ver exportar.py; destino default: self.recorte)"""
+        import exportar  # exportar importa matriz
+        return exportar.exportar(self, destino, formato)
+
+
     def fornecedores(self, j=None, q=5):
         """Setores encadeados a montante, i.e, os principais fornecedores do setor j.
         """
         if not j: j = '0191'
-        j = str(j)
-        print('Principais FORNECEDORES do setor', j)
-        mapa = [[self.L.at[i,j], i, self.legenda[i]] for i in self.L[j].index]
-        mapa.sort(reverse=True)
-        mapa[0][0] -= 1
-        mapa.sort(reverse=True)
-        return pd.DataFrame(mapa[:q])
+        return _principais(self.L, self.codigos, self.legenda, str(j), q, 'fornecedores')
 
 
     def compradores(self, i=None, q=5):
-        """Setores encadeados a montante, i.e, os principais fornecedores do setor j.
+        """Setores encadeados a jusante, i.e, os principais compradores do setor i.
         """
         if not i: i = '0191'
-        i = str(i)
-        print('Principais COMPRADORES do setor', i)
-        mapa = [[self.L.at[i,j], j, self.legenda[j]] for j in self.L[i].index]
-        mapa.sort(reverse=True)
-        mapa[0][0] -= 1
-        mapa.sort(reverse=True)
-        return pd.DataFrame(mapa[:q])
+        return _principais(self.L, self.codigos, self.legenda, str(i), q, 'compradores')
+
+
+    def encadeamentos(self, setores=None, q=5, tipo='fornecedores'):
+        """Principais fornecedores ou compradores de vários setores (ver tabela_encadeamentos)"""
+        return tabela_encadeamentos(self.L, self.codigos, self.legenda, setores, q, tipo)
+
+
+
+class Lote:
+    """Resultados da regionalização de várias áreas em arrays empilhados.
+
+    qL: areas x 68, propT: areas
+    mipreg: areas x 77 x 76
+    A, Af, L, Lf: areas x 68 x 68 (L e Lf materializadas sob demanda)
+    multiplicadores: areas x 28 x 69 (colunas de L seguidas de 'famílias')
+    HRtras, HRfrente, chave: areas x 68
+    """
+    def __init__(self, base, areas, exceto=False, resultados=None):
+        self.base = base
+        self.areas = areas
+        self.exceto = exceto
+        self.linhas = base.codigos + INSUMOS
+        self.colunas = base.codigos + PRODUTOS
+        self.setores = base.codigos
+        self.setores_f = base.codigos[0:67] + ['famílias']
+        self.colunas_multi = base.codigos + ['famílias']
+        for nome, valor in (resultados or {}).items():
+            setattr(self, nome, valor)
+        if hasattr(self, 'A'):
+            self.solver = LeontiefSolver(self.A)
+            self.solver_f = LeontiefSolver(self.Af)
+
+
+    def __repr__(self):
+        r = "Lote de regionalizações - Mipita\n"
+        r += "--------------------------------\n"
+        r += self.base.ano
+        r += "\náreas: " + str(len(self.areas))
+        r += "\ndados: " + self.base.fonte
+        return r
+
+
+    def __len__(self):
+        return len(self.areas)
+
+
+    @property
+    def L(self):
+        """Pilha de matrizes L, materializada no primeiro acesso"""
+        return self.solver.L
+
+
+    @property
+    def Lf(self):
+        """Pilha de matrizes Lf, materializada no primeiro acesso"""
+        return self.solver_f.L
+
+
+    def recortes(self):
+        """Rótulo de cada área do lote: códigos das UTPs agregadas"""
+        return [("exceto " if self.exceto else "") + " ".join(area) for area in self.areas]
+
+
+    def encadeamentos(self, setores=None, q=5, tipo='fornecedores'):
+        """Principais fornecedores ou compradores em todas as áreas do lote,
+        numa tabela com a coluna recorte (ver tabela_encadeamentos)"""
+        return tabela_encadeamentos(self.L, self.setores, getattr(self.base, 'legenda', None),
+            setores, q, tipo, self.recortes())
+
+
+    def calibracao(self):
+        """avaliar() de todas as áreas do lote numa tabela (ver calibracao)"""
+        base = self.base
+        ref = base.pop[_VAB_REFERENCIA].reindex(base.qls.index).values
+        vabM = base.agregacao_lote(self.areas).dot(ref)
+        if self.exceto:
+            vabM = ref.sum(axis=0) - vabM
+        return calibracao(self.mipreg, vabM, matriz_agregacao(base.map3, self.setores), self.recortes())
+
+
+    def areas_chave(self, setor):
+        """Áreas do lote em que o setor é chave (HRtras > 1 e HRfrente > 1)"""
+        return areas_chave(self.chave, setor, self.setores, self.recortes())
+
+
+    def setores_chave(self):
+        """dict recorte -> list dos setores chave da área"""
+        setores = np.asarray(self.setores, dtype=object)
+        return {r: setores[self.chave[k]].tolist() for k, r in enumerate(self.recortes())}
+
+
+    def mapa_chave(self):
+        """DataFrame booleano áreas x setores com a máscara de setores chave"""
+        return pd.DataFrame(self.chave, index=self.recortes(), columns=self.setores)
+
+
+    def quadro_chave(self):
+        """Resumo por setor dos índices HR no lote (ver quadro_chave)"""
+        return quadro_chave(self.HRtras, self.HRfrente, self.chave, self.setores)
+
+
+    def extrair(self, k):
+        """Mipita regionalizada para o k-ésimo item do lote, com os mesmos
+        atributos (DataFrames) produzidos por regionalizar()."""
+        area = self.areas[k]
+        M = copy.copy(self.base)
+        M.recorte = "Regionalizada UTP: " + " ".join(area)
+        M.area = area
+        if self.exceto:
+            M.area = [u for u in list(M.qls.index) if u not in area]
+        M.qL = pd.Series(self.qL[k], index=self.setores)
+        M.propT = self.propT[k]
+        M.nucleo_reg = MipArray(self.mipreg[k], self.setores)
+        M.mipreg = M.nucleo_reg.to_frame()
+        M.comprou = self.comprou[k].tolist()
+        M.vendeu = self.vendeu[k].tolist()
+        M.ajuste = M.avaliar()
+        M.A = pd.DataFrame(self.A[k], index=self.setores, columns=self.setores)
+        M.Af = pd.DataFrame(self.Af[k], index=self.setores_f, columns=self.setores_f)
+        M.solver = LeontiefSolver(M.A)
+        M.solver_f = LeontiefSolver(M.Af)
+        M.empregos_regiao = pd.Series(self.empregos[k], index=self.setores)
+        M.multiplicadores = pd.DataFrame(
+            self.multiplicadores[k], index=MULTIPLICADORES, columns=self.colunas_multi)
+        M.HRtras = pd.Series(self.HRtras[k], index=self.setores)
+        M.HRfrente = pd.Series(self.HRfrente[k], index=self.setores)
+        M.chave = list(zip(self.setores, self.chave[k].tolist()))
+        return M
+
+
+
+# atributos definidos por Mipita.regionalizar, guardados em MEMO
+_REGIONALIZADOS = ['area', 'qL', 'propT', 'nucleo_reg', 'mipreg', 'sxs', 'insumos',
+    'consumo', 'comprou', 'vendeu', 'ajuste', 'A', 'Af', 'solver', 'solver_f',
+    'empregos_regiao', 'multiplicadores', 'HRtras', 'HRfrente', 'chave']
+
+
+class MemoRegional:
+    """Cache LRU de resultados de Mipita.regionalizar
+
+    chave: (ano, tuple ordenada das áreas, exceto, assinatura dos dados de base)
+    limite: int => orçamento de memória em bytes; os resultados usados há
+    mais tempo saem primeiro
+
+    Um acerto devolve os mesmos objetos guardados, sem cópia: as Mipitas
+    que repetem uma seleção compartilham mipreg, A, L, multiplicadores...
+    e devem tratá-los como somente leitura.
+    """
+    def __init__(self, limite=256 * 2**20):
+        self.limite = limite
+        self.ativo = True
+        self.itens = OrderedDict()
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._trava = threading.Lock()
+
+
+    def __repr__(self):
+        e = self.estado()
+        return "MemoRegional | {itens} itens | {bytes} de {limite} bytes | {acertos} acertos, {falhas} falhas".format(**e)
+
+
+    def obter(self, chave):
+        with self._trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                self.acertos += 1
+                return self.itens[chave][0]
+            self.falhas += 1
+            return None
+
+
+    def guardar(self, chave, resultado):
+        tamanho = sum(_tamanho(v) for v in resultado.values())
+        if tamanho > self.limite:
+            return
+        with self._trava:
+            if chave in self.itens:
+                self.bytes -= self.itens.pop(chave)[1]
+            self.itens[chave] = (resultado, tamanho)
+            self.bytes += tamanho
+            self._reduzir()
+
+
+    def _reduzir(self):
+        """Descarta os usados há mais tempo até caber no limite (com a trava)"""
+        while self.bytes > self.limite:
+            self.bytes -= self.itens.popitem(last=False)[1][1]
+
+
+    def reduzir(self):
+        with self._trava:
+            self._reduzir()
+
+
+    def limpar(self):
+        with self._trava:
+            self.itens.clear()
+            self.bytes = 0
+
+
+    def estado(self):
+        return {
+            'itens': len(self.itens),
+            'bytes': self.bytes,
+            'limite': self.limite,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+        }
+
+
+def _tamanho(obj):
+    """Estimativa dos bytes ocupados por um resultado de regionalização"""
+    if isinstance(obj, LeontiefSolver):
+        return 3 * obj.M.nbytes  # I-A, fatores LU e L, quando materializada
+    if isinstance(obj, MipArray):
+        return obj.dados.nbytes
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, 'values') and hasattr(obj.values, 'nbytes'):
+        return obj.values.nbytes
+    if isinstance(obj, (list, dict)):
+        return 16 * len(obj)
+    return 0
+
+
+MEMO = MemoRegional()
+
+
+def configurar_memo(limite=None, ativo=None):
+    """Ajusta o cache de regionalizações: limite em MB e ativo True/False"""
+    if limite is not None:
+        MEMO.limite = int(limite * 2**20)
+    if ativo is not None:
+        MEMO.ativo = ativo
+    if not MEMO.ativo:
+        MEMO.limpar()
+    else:
+        MEMO.reduzir()
+    return MEMO.estado()
 
 
 
 class Nereus:
     """Cria objeto do tipo Nereus a partir dos dados preparados pelo Nereus FEA-USP.
+
+    eager: bool => se False só carrega a mip Nereus e as atividades; os blocos,
+    mipita, A, Af, L, Lf, multiplicadores e índices HR são calculados no
+    primeiro acesso (p.ex. para só regionalizar com extrair_mipita)
+    progresso: callback(etapa, bytes, decorrido) => carga dos dados (ver
+    dados.Progresso) e, se eager, cada etapa de ETAPAS
     """
 
-    def __init__(self, ano, path=""):
+    # blocos da mip Nereus 93 x 77: (linhas, colunas); os que cobrem os 68
+    # setores nas linhas/colunas recebem os códigos como rótulos
+    _FATIAS = {
+        'sxs': ((0, 68), (0, 68)),
+        'importado_inter': ((69, 70), (0, 68)),
+        'importado_inter_impostos': ((70, 71), (0, 68)),
+        'impostos_inter': ((71, 77), (0, 68)),
+        'adicionados': ((78, 91), (0, 68)),
+        'remuneracoes': ((78, 84), (0, 68)),
+        'salarios': ((79, 80), (0, 68)),
+        'margem': ((84, 87), (0, 68)),
+        'outros_impostos': ((88, 90), (0, 68)),
+        'total_da_economia_insumos': ((91, 92), (0, 68)),
+        'demandas': ((0, 68), (69, 76)),
+        'exporta': ((0, 68), (69, 70)),
+        'governo': ((0, 68), (70, 71)),
+        'sfl': ((0, 68), (71, 72)),
+        'familias': ((0, 68), (72, 73)),
+        'capital_fixo': ((0, 68), (73, 74)),
+        'estoque': ((0, 68), (74, 75)),
+        'importado_final': ((69, 70), (69, 76)),
+        'importado_final_impostos': ((70, 71), (69, 76)),
+        'impostos_final': ((71, 77), (69, 76)),
+    }
+
+    # etapas de calcular e os atributos que cada uma produz
+    _ETAPAS = [
+        ('fatias', list(_FATIAS) + ['total_da_economia_produtos', 'empregos']),
+        ('mipita', ['nucleo', 'mipita']),
+        ('coeficientes', ['A', 'Af']),
+        ('leontief', ['solver', 'solver_f']),
+        ('multiplicadores', ['multiplicadores']),
+        ('HR', ['HRtras', 'HRfrente', 'chave']),
+    ]
+    ETAPAS = [etapa for etapa, nomes in _ETAPAS]
+
+    def __init__(self, ano, path="", eager=True, progresso=None):
         #--> objeto base
+        progresso = Progresso.de(progresso)
         self.ano = str(ano)
         self.path = path
         self.recorte = "Brasil"
         self.fonte = "NEREUS (FEA-USP)"
-        self.nereus = carregar_mip_nereus(self.ano, path)  # 93 x 77
-        self.mipita = None
-        self.codigos, self.atividades, self.legenda = carregar_atividades68(path=path)
+        with progresso.fase('Nereus'):
+            self.nereus = carregar_mip_nereus(self.ano, path, progresso)  # 93 x 77
+            self.codigos, self.atividades, self.legenda = carregar_atividades68(path, progresso)
         #<--
-        self.sxs = self.nereus.iloc[0:68,0:68]
-        self.sxs.index = self.codigos
-        self.sxs.columns = self.codigos
-
-        self.importado_inter = self.nereus.iloc[69:70,0:68]
-        self.importado_inter.columns = self.codigos
-        self.importado_inter_impostos = self.nereus.iloc[70:71,0:68]
-        self.importado_inter_impostos.columns = self.codigos
-        self.impostos_inter = self.nereus.iloc[71:77,0:68]
-        self.impostos_inter.columns = self.codigos
-
-        self.adicionados = self.nereus.iloc[78:91,0:68]
-        self.adicionados.columns = self.codigos
-        self.remuneracoes = self.nereus.iloc[78:84,0:68]
-        self.remuneracoes.columns = self.codigos
-        self.salarios = self.nereus.iloc[79:80,0:68]
-        self.salarios.columns = self.codigos
-        self.margem = self.nereus.iloc[84:87,0:68]
-        self.margem.columns = self.codigos
-        self.outros_impostos = self.nereus.iloc[88:90,0:68]
-        self.outros_impostos.columns = self.codigos
-
-        self.total_da_economia_insumos = self.nereus.iloc[91:92,0:68]
-        self.total_da_economia_insumos.columns = self.codigos
-
-        self.demandas = self.nereus.iloc[0:68,69:76]
-        self.demandas.index = self.codigos
-        self.exporta = self.nereus.iloc[0:68,69:70]
-        self.exporta.index = self.codigos
-        self.governo = self.nereus.iloc[0:68,70:71]
-        self.governo.index = self.codigos
-        self.sfl = self.nereus.iloc[0:68,71:72]
-        self.sfl.index = self.codigos
-        self.familias = self.nereus.iloc[0:68,72:73]
-        self.familias.index = self.codigos
-        self.capital_fixo = self.nereus.iloc[0:68,73:74]
-        self.capital_fixo.index = self.codigos
-        self.estoque = self.nereus.iloc[0:68,74:75]
-        self.estoque.index = self.codigos
-
-        self.importado_final = self.nereus.iloc[69:70,69:76]
-        self.importado_final_impostos = self.nereus.iloc[70:71,69:76]
-        self.impostos_final = self.nereus.iloc[71:77,69:76]
-
-        self.total_da_economia_produtos = self.nereus['demanda total']
-
-        self.empregos = self.nereus.loc['fator trabalho (ocupações)'][0:68]
-        self.empregos.index = self.codigos
-
-        self.mipita = self.mipita_nereus()
-        self.A = matriz_coeficientes_tecnicos(self.mipita, fechada=False)
-        self.Af = matriz_coeficientes_tecnicos(self.mipita, fechada=True)
-        self.L = matriz_leontief(self.A)
-        self.Lf = matriz_leontief(self.Af)
-        self.multiplicadores = multiplicadores(self.mipita, self.empregos, self.L, self.Lf)
-        self.HRtras, self.HRfrente, self.chave = indice_HR(self.L)
+        if eager:
+            self.calcular(progresso)
 
 
     def __repr__(self):
@@ -391,89 +843,249 @@ class Nereus:
         return r
 
 
+    def __getattr__(self, nome):
+        """Atributos derivados, calculados no primeiro acesso e guardados"""
+        if nome in Nereus._FATIAS:
+            (i0, i1), (j0, j1) = Nereus._FATIAS[nome]
+            valor = self.nereus.iloc[i0:i1, j0:j1]
+            if (i0, i1) == (0, 68): valor.index = self.codigos
+            if (j0, j1) == (0, 68): valor.columns = self.codigos
+        elif nome == 'total_da_economia_produtos':
+            valor = self.nereus['demanda total']
+        elif nome == 'empregos':
+            valor = self.nereus.loc['fator trabalho (ocupações)'][0:68]
+            valor.index = self.codigos
+        elif nome == 'nucleo':
+            valor = self.mipita_nereus()
+        elif nome == 'mipita':
+            valor = self.nucleo.to_frame()
+        elif nome == 'A':
+            valor = matriz_coeficientes_tecnicos(self.nucleo, fechada=False)
+        elif nome == 'Af':
+            valor = matriz_coeficientes_tecnicos(self.nucleo, fechada=True)
+        elif nome == 'solver':
+            valor = LeontiefSolver(self.A)
+        elif nome == 'solver_f':
+            valor = LeontiefSolver(self.Af)
+        elif nome == 'multiplicadores':
+            valor = multiplicadores(self.nucleo, self.empregos, self.solver, self.solver_f)
+        elif nome in ('HRtras', 'HRfrente', 'chave'):
+            self.HRtras, self.HRfrente, self.chave = indice_HR(self.solver)
+            return self.__dict__[nome]
+        else:
+            raise AttributeError("'Nereus' object has no attribute '" + nome + "'")
+        self.__dict__[nome] = valor
+        return valor
+
+
+    def calcular(self, progresso=None):
+        """Calcula de uma vez todos os atributos derivados (modo eager)
+
+        progresso: callback(etapa, bytes, decorrido) => chamado ao fim de cada etapa
+        """
+        progresso = Progresso.de(progresso)
+        with progresso.fase('Nereus'):
+            for etapa, nomes in Nereus._ETAPAS:
+                for nome in nomes:
+                    getattr(self, nome)
+                progresso(etapa)
+
+
+    @property
+    def L(self):
+        """Matriz de Leontief aberta, materializada no primeiro acesso"""
+        return self.solver.L
+
+
+    @property
+    def Lf(self):
+        """Matriz de Leontief fechada, materializada no primeiro acesso"""
+        return self.solver_f.L
+
+
+    def save(self, path):
+        """Grava o objeto construído num diretório: arrays .npy + cabecalho.json
+
+        Inclui a mip Nereus, mipita, A, Af, L, Lf, multiplicadores, índices HR
+        e as tabelas de referência (qls, pop, utp, map3) do ano; Nereus.load
+        abre os arrays por memory-map, sem recalcular nada.
+        """
+        os.makedirs(path, exist_ok=True)
+        ref = carregar_referencias(self.ano, self.path)
+        arrays = {
+            'nereus': self.nereus.values,
+            'mipita': self.nucleo.dados,
+            'A': self.A.values,
+            'Af': self.Af.values,
+            'L': self.L.values,
+            'Lf': self.Lf.values,
+            'multiplicadores': self.multiplicadores.values,
+            'HRtras': self.HRtras.values,
+            'HRfrente': self.HRfrente.values,
+        }
+        tabelas = {}
+        for nome in ('qls', 'pop', 'utp'):
+            tabela = ref[nome]
+            if tabela.shape == tabela.select_dtypes('number').shape:
+                arrays[nome] = tabela.values
+                tabelas[nome] = {'index': list(tabela.index), 'columns': list(tabela.columns)}
+            else:  # colunas de texto vão no próprio cabeçalho
+                tabelas[nome] = json.loads(tabela.to_json(orient='split'))
+            # tipos por coluna: .values de colunas int e float juntas vira float
+            tabelas[nome]['dtypes'] = [str(d) for d in tabela.dtypes]
+        for nome, arr in arrays.items():
+            np.save(os.path.join(path, nome + '.npy'), np.ascontiguousarray(arr))
+        cabecalho = {
+            'formato': 'nereus-npy/1',
+            'versao': __version__,
+            'ano': self.ano,
+            'path': self.path,
+            'recorte': self.recorte,
+            'fonte': self.fonte,
+            'codigos': self.codigos,
+            'atividades': self.atividades,
+            'legenda': self.legenda,
+            'nereus': {'index': list(self.nereus.index), 'columns': list(self.nereus.columns)},
+            'multiplicadores': {'columns': list(self.multiplicadores.columns)},
+            'tabelas': tabelas,
+            'map3': ref['map3'],
+        }
+        with open(os.path.join(path, 'cabecalho.json'), 'w') as f:
+            json.dump(cabecalho, f, ensure_ascii=False)
+        print('[~~] Nereus ' + self.ano + ' gravado em ' + path)
+
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Abre um Nereus gravado com save(); com mmap os arrays ficam mapeados
+        do disco (somente leitura) e compartilham o page cache entre processos.
+
+        As tabelas de referência gravadas passam a valer para extrair_mipita().
+        """
+        with open(os.path.join(path, 'cabecalho.json')) as f:
+            cab = json.load(f)
+        if cab.get('formato') != 'nereus-npy/1':
+            raise Exception('[!!] ' + path + ' não é um Nereus gravado com save()')
+        def abrir(nome):
+            return np.load(os.path.join(path, nome + '.npy'), mmap_mode='r' if mmap else None)
+
+        N = cls.__new__(cls)
+        N.ano = cab['ano']
+        N.path = cab['path']
+        N.recorte = cab['recorte']
+        N.fonte = cab['fonte']
+        N.codigos = cab['codigos']
+        N.atividades = cab['atividades']
+        N.legenda = cab['legenda']
+        N.nereus = pd.DataFrame(abrir('nereus'), copy=False, **cab['nereus'])
+        N.nucleo = MipArray(abrir('mipita'), N.codigos)
+        N.mipita = N.nucleo.to_frame()
+        setores_f = N.codigos[0:67] + ['famílias']
+        N.A = pd.DataFrame(abrir('A'), index=N.codigos, columns=N.codigos, copy=False)
+        N.Af = pd.DataFrame(abrir('Af'), index=setores_f, columns=setores_f, copy=False)
+        N.solver = LeontiefSolver(N.A)
+        N.solver_f = LeontiefSolver(N.Af)
+        N.solver._L = pd.DataFrame(abrir('L'), index=N.codigos, columns=N.codigos, copy=False)
+        N.solver_f._L = pd.DataFrame(abrir('Lf'), index=setores_f, columns=setores_f, copy=False)
+        N.multiplicadores = pd.DataFrame(abrir('multiplicadores'), index=MULTIPLICADORES,
+            copy=False, **cab['multiplicadores'])
+        N.HRtras = pd.Series(abrir('HRtras'), index=N.codigos)
+        N.HRfrente = pd.Series(abrir('HRfrente'), index=N.codigos)
+        N.chave = [(j, bool(N.HRtras[j] > 1 and N.HRfrente[j] > 1)) for j in N.codigos]
+
+        for nome, rotulos in cab['tabelas'].items():
+            dtypes = rotulos.pop('dtypes', None)
+            if 'data' in rotulos:
+                tabela = pd.DataFrame(**rotulos)
+            else:
+                tabela = pd.DataFrame(abrir(nome), copy=False, **rotulos)
+            if dtypes is not None and [str(d) for d in tabela.dtypes] != dtypes:
+                tabela = tabela.astype(dict(zip(tabela.columns, dtypes)))
+            tabela.index = tabela.index.astype(str)
+            tabela.index.name = 'utps'
+            registrar_referencia(nome, N.ano, N.path, tabela)
+        registrar_referencia('map3', N.ano, N.path, cab['map3'])
+        print('[~~] Nereus ' + N.ano + ' aberto de ' + path)
+        return N
+
+
     def mipita_nereus(self):
-        """MIP padrão ITA apenas com os dados essenciais, obtida a partir da mip Nereus."""
-        # A
-        # editar e adicionar blocos sob o bloco SxS
-        # passo 1 - importado do mundo e do Br
-        importado = self.importado_inter
-        importado.rename({"importado":"importado do mundo"}, axis=0, inplace=True)
-        impostos_imp = self.importado_inter_impostos
-        impostos_imp.rename({"imp import":"impostos de importação"}, axis=0, inplace=True)
-        impbr = pd.DataFrame({"importado do Brasil":np.zeros(68)}).T
-        impbr.columns = self.codigos
-        passo1 = pd.concat([self.sxs, importado, impostos_imp, impbr], axis=0)
-        # passo 2 - impostos
-        impostos = pd.DataFrame({"impostos": self.impostos_inter.sum()}).T
-        passo2 = pd.concat([passo1, impostos], axis=0)
-        # passo 3 - componentes do valor adiocionado
-        salario = pd.DataFrame({"salários": self.adicionados.loc["salários"]}).T
-        previ = pd.DataFrame({"contribuições sociais":
-            (self.adicionados.loc["remunerações"].values - salario.values)[0]
-        }, index = self.codigos).T
-        margem = pd.DataFrame(
-            {"margem": self.adicionados.loc["excedente operacional bruto e rendimento misto bruto"]}
-        ).T
-        outros = pd.DataFrame({"outros impostos e subsídios":
-            self.adicionados.loc["outros impostos sobre a produção"] + self.adicionados.loc["outros subsídios à produção"]}
-        ).T
-        passo3 = pd.concat([passo2, salario, previ, margem, outros], axis=0)
-        # soma de todos os insumos
-        insumos = pd.DataFrame({"total_insumos":passo3.sum(axis=0)})  # soma as linhas
-        passo4 = pd.concat([passo3, insumos.T], axis=0)
-        # B
-        # completar colunas à direita do bloco SxS, nesse ponto com 77 rows x 68 columns
-        # passo 5 - importado do mundo e do Br
-        demandas = self.demandas.iloc[0:68, 0:6]
-        colunas = ['exportado ao mundo', 'governo', 'isfl', 'famílias', 'capital fixo', 'estoque']
-        demandas.columns = colunas
-        importado = self.importado_final.iloc[0:1, 0:6]
-        importado.columns = colunas
-        importado.rename({"importado":"importado do mundo"}, axis=0, inplace=True)
-        impostos_imp = self.importado_final_impostos.iloc[0:1, 0:6]
-        impostos_imp.columns = colunas
-        impostos_imp.rename({"imp import":"impostos de importação"}, axis=0, inplace=True)
-        impbr = pd.DataFrame({"importado do Brasil":np.zeros(6)}).T
-        impbr.columns = colunas
-        passo5 = pd.concat([demandas, importado, impostos_imp, impbr], axis=0)
-        # passo 6 - impostos
-        impostos = pd.DataFrame({"impostos": self.impostos_final.sum()[0:6]}).T
-        impostos.columns = colunas
-        passo6 = pd.concat([passo5, impostos], axis=0)
-        # passo 7 - componentes do valor adiocionado ZERADOS
-        salario = pd.DataFrame({"salários": np.zeros(6)}).T
-        salario.columns = colunas
-        previ = pd.DataFrame({"contribuições sociais": np.zeros(6)}).T
-        previ.columns = colunas
-        margem = pd.DataFrame({"margem": np.zeros(6)}).T
-        margem.columns = colunas
-        outros = pd.DataFrame({"outros impostos e subsídios":np.zeros(6)}).T
-        outros.columns = colunas
-        insumos = pd.DataFrame({"total_insumos": np.zeros(6)}).T
-        insumos.columns = colunas
-        passo7 = pd.concat([passo6, salario, previ, margem, outros, insumos], axis=0)
-        # C
-        # adicionar coluna de exp para Brasil e juntar
-        passo7.insert(1, "exportado ao Brasil", np.zeros(77))
-        passo7.rename({"exportação de bens e serviços":"exportado ao mundo"}, axis=1, inplace=True)
-        # passo 8 - juntar
-        passo8 = pd.concat([passo4, passo7], axis=1)
+        """MIP padrão ITA apenas com os dados essenciais, obtida a partir da mip Nereus.
+
+        retorna
+        MipArray 77x76 (self.mipita é a sua conversão em DataFrame)
+        """
+        N = self.nereus.values
+        ad = list(self.nereus.index[78:91])
+        def adicionado(rotulo):
+            return N[78 + ad.index(rotulo), 0:68]
+        demandas = [68, 70, 71, 72, 73, 74]  # destino das 6 colunas de demanda Nereus
+        mip = MipArray(codigos=self.codigos)
+        M = mip.dados
+        # A # insumos sob o bloco SxS
+        M[0:68, 0:68] = N[0:68, 0:68]
+        M[68, 0:68] = N[69, 0:68]                      # importado do mundo
+        M[69, 0:68] = N[70, 0:68]                      # impostos de importação
+        M[71, 0:68] = N[71:77, 0:68].sum(axis=0)       # impostos
+        # componentes do valor adicionado
+        M[72, 0:68] = adicionado("salários")
+        M[73, 0:68] = adicionado("remunerações") - adicionado("salários")
+        M[74, 0:68] = adicionado("excedente operacional bruto e rendimento misto bruto")
+        M[75, 0:68] = adicionado("outros impostos sobre a produção") + adicionado("outros subsídios à produção")
+        M[76, 0:68] = M[0:76, 0:68].sum(axis=0)        # total_insumos
+        # B # demanda final à direita do bloco SxS, sem exportado ao Brasil
+        M[0:68, demandas] = N[0:68, 69:75]
+        M[68, demandas] = N[69, 69:75]
+        M[69, demandas] = N[70, 69:75]
+        M[71, demandas] = N[71:77, 69:75].sum(axis=0)
         # D - totais
-        produtos = pd.DataFrame({"total_produtos":passo8.sum(axis=1)})  # soma as colunas
-        passo9 = pd.concat([passo8, produtos], axis=1)
-        return passo9
+        M[:, 75] = M[:, 0:75].sum(axis=1)
+        return mip
+
+
+    def impactos(self, choques, modo='exato', tol=1e-8, max_iter=1000):
+        """Impactos de cenários de choque na demanda final (ver impactos())
+
+        choques: array ou DataFrame cenários x 68 setores (+ 'famílias')
+        modo: 'exato' (LU), 'serie' ou 'gmres' (aproximados, ver LeontiefIterativo)
+
+        retorna
+        array cenários x 3 efeitos x 4 variáveis x 68 setores
+        """
+        L, Lf = self.solvers(modo, tol, max_iter)
+        return impactos(self.nucleo, self.empregos.reindex(self.codigos).values,
+            L, Lf, _choques(choques, self.codigos))
+
+
+    def solvers(self, modo='exato', tol=1e-8, max_iter=1000):
+        """(solver, solver_f) de A e Af: os exatos já calculados ou, com modo
+        'serie' ou 'gmres', LeontiefIterativo novos (ver solucionador)"""
+        if modo == 'exato':
+            return self.solver, self.solver_f
+        return solucionador(self.A, modo, tol, max_iter), solucionador(self.Af, modo, tol, max_iter)
+
+
+    def multiplicadores_modo(self, modo='serie', tol=1e-8, max_iter=1000):
+        """multiplicadores() com o solver escolhido, sem alterar self.multiplicadores"""
+        L, Lf = self.solvers(modo, tol, max_iter)
+        return multiplicadores(self.nucleo, self.empregos, L, Lf)
 
 
-    def extrair_mipita(self):
+    def extrair_mipita(self, progresso=None):
         """Extrai dados no padrão mipita."""
-        M = Mipita(self.ano, self.path)
+        M = Mipita(self.ano, self.path, progresso)
         M.recorte = self.recorte
         M.fonte = self.fonte
         M.mipita = self.mipita
+        M.nucleo = self.nucleo
         M.codigos = self.codigos
         M.atividades = self.atividades
         M.legenda = self.legenda
         M.empregos = self.empregos[0:68]
+        if hasattr(self, '_assinatura'):
+            M._assinatura = self._assinatura
+        M.assinatura()
+        self._assinatura = M._assinatura  # reaproveitada nas próximas extrações
         return M
 
 
@@ -481,26 +1093,19 @@ class Nereus:
         """Setores encadeados a montante, i.e, os principais fornecedores do setor j.
         """
         if not j: j = '0191'
-        j = str(j)
-        print('Principais FORNECEDORES do setor', j)
-        mapa = [[self.L.at[i,j], i, self.legenda[i]] for i in self.L[j].index]
-        mapa.sort(reverse=True)
-        mapa[0][0] -= 1
-        mapa.sort(reverse=True)
-        return pd.DataFrame(mapa[:q])
+        return _principais(self.L, self.codigos, self.legenda, str(j), q, 'fornecedores')
 
 
     def compradores(self, i=None, q=5):
-        """Setores encadeados a montante, i.e, os principais fornecedores do setor j.
+        """Setores encadeados a jusante, i.e, os principais compradores do setor i.
         """
         if not i: i = '0191'
-        i = str(i)
-        print('Principais COMPRADORES do setor', i)
-        mapa = [[self.L.at[i,j], j, self.legenda[j]] for j in self.L[i].index]
-        mapa.sort(reverse=True)
-        mapa[0][0] -= 1
-        mapa.sort(reverse=True)
-        return pd.DataFrame(mapa[:q])
+        return _principais(self.L, self.codigos, self.legenda, str(i), q, 'compradores')
+
+
+    def encadeamentos(self, setores=None, q=5, tipo='fornecedores'):
+        """Principais fornecedores ou compradores de vários setores (ver tabela_encadeamentos)"""
+        return tabela_encadeamentos(self.L, self.codigos, self.legenda, setores, q, tipo)
 
 
     def resumo(self):
@@ -534,7 +1139,7 @@ class Nereus:
 def matriz_coeficientes_tecnicos(mip, fechada=False):
     """Gerador da Matriz A
 
-    mip: DataFrame (matriz insumo-produto no padrão "mipita")
+    mip: DataFrame ou MipArray (matriz insumo-produto no padrão "mipita")
     fechada: bool (se True calcula matriz A incluindo remunerações e consumo das famílias)
 
     retorna
@@ -545,6 +1150,12 @@ def matriz_coeficientes_tecnicos(mip, fechada=False):
     [cf] Blair e Miller 2009, p.34-41 @pdf 66
 
     """
+    if isinstance(mip, MipArray):
+        A, Af = matriz_coeficientes_tecnicos_lote(mip.dados[None])
+        if fechada:
+            setores = mip.codigos[0:67] + ['famílias']
+            return pd.DataFrame(Af[0], index=setores, columns=setores)
+        return pd.DataFrame(A[0], index=mip.codigos, columns=mip.codigos)
     setores = mip.iloc[0:68, 0:68]
     # o coeficiente técnico correponde à parcela vinda do setor i sobre o total de insumos
     total = mip.loc['total_insumos'][0:68]   # vetor
@@ -586,6 +1197,187 @@ def matriz_coeficientes_tecnicos(mip, fechada=False):
     return A
 
 
+class LeontiefSolver:
+    """Fatoração LU de (I - A) para resolver sistemas de Leontief sem inversas.
+
+    A: DataFrame ou array n x n (ou pilha areas x n x n)
+
+    solve(f): L.f, i.e. produção necessária para a demanda final f
+    solve_transposed(v): L'.v, i.e. o vetor linha v'.L (somas ponderadas das colunas)
+    L: matriz de Leontief materializada apenas quando acessada
+
+    Com scipy os fatores LU de uma matriz 2D são calculados uma vez e reusados;
+    pilhas (e a ausência de scipy) usam np.linalg.solve em uma chamada por
+    solve, com todas as colunas de f juntas.
+    """
+    def __init__(self, A):
+        self.index = getattr(A, 'index', None)
+        self.columns = getattr(A, 'columns', None)
+        A = np.asarray(A, dtype=np.float64)
+        self.n = A.shape[-1]
+        self.M = np.identity(self.n) - A
+        self._lu = None
+        if A.ndim == 2 and _lu_scipy() is not None:
+            self._lu = _lu_scipy()[0](self.M)
+        self._L = None
+
+
+    def __repr__(self):
+        r = "LeontiefSolver " + " x ".join(str(d) for d in self.M.shape)
+        r += " | LU scipy" if self._lu is not None else " | np.linalg.solve"
+        return r
+
+
+    def _resolver(self, b, trans):
+        b = np.asarray(b, dtype=np.float64)
+        vetor = b.ndim == self.M.ndim - 1
+        if vetor:
+            b = b[..., None]
+        if self._lu is not None:
+            x = _lu_scipy()[1](self._lu, b, trans=trans)
+        elif trans:
+            x = np.linalg.solve(np.swapaxes(self.M, -1, -2), b)
+        else:
+            x = np.linalg.solve(self.M, b)
+        return x[..., 0] if vetor else x
+
+
+    def solve(self, f):
+        """L.f para f com n linhas (vetor n ou matriz n x m; areas x n x m em pilhas)"""
+        return self._resolver(f, 0)
+
+
+    def solve_transposed(self, v):
+        """L'.v, equivalente ao vetor linha v'.L"""
+        return self._resolver(v, 1)
+
+
+    @property
+    def L(self):
+        """Matriz de Leontief (I-A)^-1, calculada no primeiro acesso"""
+        if self._L is None:
+            I = np.broadcast_to(np.identity(self.n), self.M.shape)
+            L = self.solve(I)
+            if self.index is not None and L.ndim == 2:
+                L = pd.DataFrame(L, index=self.index, columns=self.columns)
+            self._L = L
+        return self._L
+
+
+class LeontiefIterativo(LeontiefSolver):
+    """Solver aproximado de Leontief, sem fatorar nem inverter (I - A).
+
+    A: DataFrame ou array n x n (ou pilha areas x n x n)
+    metodo: 'serie' => série de potências L.f = f + A.f + A².f + ..., só com
+            produtos matriz-vetor (aceita pilhas e várias colunas de f)
+            'gmres' => Krylov (scipy.sparse.linalg.gmres), só para A 2D
+    tol: float => tolerância relativa (série: |A^k.f| / |x|; gmres: resíduo)
+    max_iter: int => limite de iterações (termos da série ou iterações gmres)
+
+    Mesma interface de LeontiefSolver (solve, solve_transposed, L), logo
+    serve em multiplicadores(), impactos(), indice_HR_lote etc.:
+
+    L = matriz.LeontiefIterativo(n.A, tol=1e-4)
+    Lf = matriz.LeontiefIterativo(n.Af, tol=1e-4)
+    matriz.multiplicadores(n.nucleo, n.empregos, L, Lf)
+    L.diagnostico   # convergência do último solve
+
+    A série converge se o raio espectral de A for < 1 (colunas de A somando
+    menos que 1, o caso das matrizes abertas); a velocidade cai conforme ele
+    se aproxima de 1, como no modelo fechado.
+    """
+    def __init__(self, A, metodo='serie', tol=1e-8, max_iter=1000):
+        if metodo not in ('serie', 'gmres'):
+            raise Exception('[!!] metodo deve ser serie ou gmres')
+        self.index = getattr(A, 'index', None)
+        self.columns = getattr(A, 'columns', None)
+        self.A = np.asarray(A, dtype=np.float64)
+        self.n = self.A.shape[-1]
+        self.M = np.identity(self.n) - self.A
+        if metodo == 'gmres' and self.A.ndim != 2:
+            raise Exception('[!!] gmres só aceita uma matriz A 2D; use metodo serie para pilhas')
+        self.metodo = metodo
+        self.tol = tol
+        self.max_iter = max_iter
+        self.diagnostico = None
+        self._lu = None
+        self._L = None
+
+
+    def __repr__(self):
+        r = "LeontiefIterativo " + " x ".join(str(d) for d in self.M.shape)
+        r += " | " + self.metodo + " tol=" + str(self.tol) + " max_iter=" + str(self.max_iter)
+        return r
+
+
+    def _resolver(self, b, trans):
+        b = np.asarray(b, dtype=np.float64)
+        vetor = b.ndim == self.M.ndim - 1
+        if vetor:
+            b = b[..., None]
+        if self.metodo == 'serie':
+            x = self._serie(b, trans)
+        else:
+            x = self._gmres(b, trans)
+        M = np.swapaxes(self.M, -1, -2) if trans else self.M
+        escala = np.abs(b).max() or 1.0
+        self.diagnostico['residuo'] = float(np.abs(M @ x - b).max() / escala)
+        if not self.diagnostico['convergiu']:
+            print('[!!] LeontiefIterativo não convergiu em ' + str(self.max_iter)
+                + ' iterações: resíduo relativo ' + str(self.diagnostico['residuo']))
+        return x[..., 0] if vetor else x
+
+
+    def _serie(self, b, trans):
+        """x = b + A.b + A².b + ... até |A^k.b| <= tol |x|"""
+        A = np.swapaxes(self.A, -1, -2) if trans else self.A
+        x = b.copy()
+        termo = b
+        historico = []
+        convergiu = False
+        for k in range(1, self.max_iter + 1):
+            termo = A @ termo
+            x += termo
+            historico.append(float(np.abs(termo).max() / (np.abs(x).max() or 1.0)))
+            if historico[-1] <= self.tol:
+                convergiu = True
+                break
+        self.diagnostico = {'metodo': 'serie', 'iteracoes': len(historico),
+            'convergiu': convergiu, 'tol': self.tol, 'historico': historico}
+        return x
+
+
+    def _gmres(self, b, trans):
+        """gmres coluna a coluna de b"""
+        from scipy.sparse.linalg import gmres
+        M = self.M.T if trans else self.M
+        x = np.empty_like(b)
+        iteracoes = []
+        convergiu = True
+        for j in range(b.shape[-1]):
+            contagem = [0]
+            def contar(r):
+                contagem[0] += 1
+            try:
+                x[:, j], info = gmres(M, b[:, j], rtol=self.tol, maxiter=self.max_iter,
+                    callback=contar, callback_type='pr_norm')
+            except TypeError:  # scipy < 1.12: tol em vez de rtol
+                x[:, j], info = gmres(M, b[:, j], tol=self.tol, maxiter=self.max_iter,
+                    callback=contar, callback_type='pr_norm')
+            iteracoes.append(contagem[0])
+            convergiu = convergiu and info == 0
+        self.diagnostico = {'metodo': 'gmres', 'iteracoes': max(iteracoes),
+            'convergiu': convergiu, 'tol': self.tol, 'historico': iteracoes}
+        return x
+
+
+def solucionador(A, modo='exato', tol=1e-8, max_iter=1000):
+    """LeontiefSolver (modo 'exato') ou LeontiefIterativo (modo 'serie' ou 'gmres')"""
+    if modo == 'exato':
+        return LeontiefSolver(A)
+    return LeontiefIterativo(A, modo, tol, max_iter)
+
+
 def matriz_leontief(A):
     """Gerador da Matriz L
 
@@ -593,10 +1385,11 @@ def matriz_leontief(A):
 
     retorna
     L: DataFrame (matriz L de Leontief)
+
+    NOTA: quando só são necessários produtos de L por vetores, prefira
+    LeontiefSolver(A), que evita materializar a inversa
     """
-    I = np.identity(len(A.index))
-    L = np.linalg.inv(I-A)
-    return pd.DataFrame(L, index=A.index, columns=A.columns)
+    return LeontiefSolver(A).L
 
 
 def multiplicadores(mip, empregos, L, Lf):
@@ -626,231 +1419,75 @@ def multiplicadores(mip, empregos, L, Lf):
     emprego
 
     => parâmetros:
-    mip: matriz-insumo produto no padrao mipita
+    mip: matriz-insumo produto no padrao mipita (DataFrame ou MipArray)
     empregos: vetor de número de empregos nos j setores
-    L: matriz Leontief aberta (68 setores)
-    Lf: matriz Leontief fechada (68 setores, famílias no lugar de 9700)
+    L: matriz Leontief aberta (68 setores), DataFrame ou LeontiefSolver
+    (LeontiefIterativo para multiplicadores aproximados)
+    Lf: matriz Leontief fechada (68 setores, famílias no lugar de 9700), idem
 
     => retorna:
-    DataFrame [28 multiplicadores x 68 setores]
+    DataFrame [28 multiplicadores x 69 colunas]: os 68 setores de L e 'famílias';
+    os efeitos abertos ficam nas colunas de L, os fechados nas de Lf
+    (ver nucleo_multiplicadores)
     """
 
-    # vetores identidade 1x68
-    i68 = pd.DataFrame({'i': [1 for _ in range(68)]}, index = L.index).T
-    i68f = pd.DataFrame({'i': [1 for _ in range(68)]}, index = Lf.index).T
+    setores = list(L.index)
+    if not isinstance(mip, MipArray):
+        mip = MipArray.de_frame(mip, setores)
+    C, Cf = coeficientes_diretos(mip, empregos.reindex(setores).values)
+    multi = nucleo_multiplicadores(C, Cf, L, Lf)
+    return pd.DataFrame(multi, index=MULTIPLICADORES, columns=setores + [list(Lf.index)[-1]])
 
-    """
-    Multiplicadores de Produto
-    --------------------------
-    """
-    # Efeitos Diretos => por definição é o próprio aumento da demanda
-    eD_produto = i68
-
-    # Efeito Direto + Indireto: dados pela matriz L
-    # eq. 6.5 (o produto escalar com um vetor unitário dá a soma das colunas)
-    eDN_produto = i68.dot(L)
-
-    # Efeito Direto + Indireto + Induzido Total: dados pela matriz Lf
-    # eq. 6.6
-    eDNZs_produto = i68f.dot(Lf)
-
-    # Efeito Direto + Indireto + Induzido Truncado: exclui famílias
-    # eq. 6.10
-    eDNZ_produto = eDNZs_produto.subtract(Lf.loc['famílias'])
-
-    # no caso PRODUTO, os multiplicadores tipo I e II são iguais aos efeitos
-
-    produto = pd.concat([
-        eD_produto,
-        eDN_produto,
-        eDNZ_produto,
-        eDNZs_produto,
-    ])
-    produto.index = [
-        'eD produto', 'eDN produto', 'eDNZ produto', 'eDNZ+ produto',
-    ]
 
-    """
-    Multiplicadores de Valor Adicionado
-    -----------------------------------
-    """
-    # vetor linha do va 1x68 [com va do setor 9700]
-    # o mesmo valor para va vale para o caso com famílias]
-    ad = ['salários', 'contribuições sociais', 'margem']
-    va = pd.DataFrame(mip[L.columns].loc[ad].sum()).T
-    vaf = va.copy()
-    vaf.columns = Lf.index
-
-    # vetor linha do input total
-    X = pd.DataFrame(mip[L.columns].loc['total_insumos']).T
-    # input total fechado para famílias
-    Xf = pd.DataFrame(mip[Lf.columns].loc['total_insumos']).T
-    Xf['famílias'] = mip['famílias'].sum()
-
-    # vetor linha va/input => efeitos diretos
-    eD_va = va.divide(X.values)
-
-    # efeitos diretos e indiretos
-    eDN_va = eD_va.dot(L)
-
-    # efeitos diretos e indiretos e induzidos totais
-    # precisa antes calcular o efeito direto para o caso fechado
-    # pq X != Xf
-    eD_vaf = vaf.divide(Xf.values)
-    eDNZs_va = eD_vaf.dot(Lf)
-    # o produto escalar é equivamente à soma nas colunas, com cada elemento
-    # ponderado pelo correspondente em eD_vaf
-    # cada linha i de Lf é multiplicada pelo i-esimo elemento do vetor
-    # eDNZs_va = Lf.multiply(eD_vaf.values, axis=0).sum()
-
-    # efeitos diretos e indiretos e induzidos truncados
-    # subtrai a linha ponderada da matriz LF para famílias
-    eDNZ_va = eDNZs_va.subtract(Lf.loc['famílias'] * eD_vaf['famílias'].values[0])
+def nucleo_multiplicadores(C, Cf, L, Lf):
+    """Núcleo vetorizado de multiplicadores(), para uma região ou uma pilha
 
-    # multiplicadores tipo I e II
-    mD_va = eD_va.divide(eD_va)
-    mDN_va = eDN_va.divide(eD_va)
-    mDNZ_va = eDNZ_va.divide(eD_vaf)
-    mDNZs_va = eDNZs_va.divide(eD_vaf)
-
-    adicionado = pd.concat([
-        eD_va,
-        eDN_va,
-        eDNZ_va,
-        eDNZs_va,
-        mD_va,
-        mDN_va,
-        mDNZ_va,
-        mDNZs_va,
-    ])
-    adicionado.index = [
-        'eD adicionado', 'eDN adicionado', 'eDNZ adicionado', 'eDNZ+ adicionado',
-        'mD adicionado', 'mDN adicionado', 'mDNZ adicionado', 'mDNZ+ adicionado',
-    ]
+    C, Cf: (areas x) 4 x n, coeficientes diretos de produto, valor adicionado,
+    salários e emprego nos modelos aberto e fechado (ver coeficientes_diretos)
+    L, Lf: arrays (areas x) n x n ou LeontiefSolver
 
-    # Lad = pd.DataFrame(
-    #         np.diag(va68.values[0]).dot(np.linalg.inv(np.diag(x68.values[0]))).dot(L),  # eq. 6.18
-    #         index=L.index, columns=L.columns
-    #     )
+    Todos os efeitos saem de dois produtos matriciais:
+    C.L => eDN (eq. 6.5; com c = 1 é a soma das colunas de L)
+    [Cf; e].Lf => eDNZ+ (eq. 6.6) e a linha 'famílias' de Lf, que ponderada
+    pelo coeficiente direto das famílias dá o truncado eDNZ (eq. 6.10)
 
+    retorna
+    array (areas x) 28 x (n+1): colunas de L seguidas de 'famílias', com NaN
+    na coluna que não pertence ao modelo (famílias nos abertos, 9700 nos fechados)
     """
-    Multiplicadores de Salários
-    ---------------------------
-    """
-    # vetor linha dos salarios 1x68 [com salários do setor 9700]
-    # o mesmo valor para os salários vale para o caso com famílias]
-    sal = pd.DataFrame(mip[L.columns].loc['salários']).T
-    salf = sal.copy()
-    salf.columns = Lf.index
-
-    # vetor linha do input total
-    X = pd.DataFrame(mip[L.columns].loc['total_insumos']).T
-    # input total fechado para famílias
-    Xf = pd.DataFrame(mip[Lf.columns].loc['total_insumos']).T
-    Xf['famílias'] = mip['famílias'].sum()
-
-    # vetor linha dos salarios/input => efeitos diretos
-    eD_sal = sal.divide(X.values)
-
-    # efeitos diretos e indiretos
-    eDN_sal = eD_sal.dot(L)
-
-    # efeitos diretos e indiretos e induzidos totais
-    # precisa antes calcular o efeito direto para o caso fechado
-    # pq X != Xf
-    eD_salf = salf.divide(Xf.values)
-    eDNZs_sal = eD_salf.dot(Lf)
-
-    # efeitos diretos e indiretos e induzidos truncados
-    # subtrai a linha ponderada da matriz LF para famílias
-    eDNZ_sal = eDNZs_sal.subtract(Lf.loc['famílias'] * eD_salf['famílias'].values[0])
-
+    n = C.shape[-1]
+    lider = C.shape[:-2]
+    e = np.zeros(lider + (1, n))
+    e[..., 0, n-1] = 1.0
+    eDN = _vezes(C, L)
+    fechado = _vezes(np.concatenate([Cf, e], axis=-2), Lf)
+    eDNZs = fechado[..., 0:4, :]
+    eDNZ = eDNZs - Cf[..., :, n-1:n] * fechado[..., 4:5, :]
     # multiplicadores tipo I e II
-    mD_sal = eD_sal.divide(eD_sal)
-    mDN_sal = eDN_sal.divide(eD_sal)
-    mDNZ_sal = eDNZ_sal.divide(eD_salf)
-    mDNZs_sal = eDNZs_sal.divide(eD_salf)
-
-    salarios = pd.concat([
-        eD_sal,
-        eDN_sal,
-        eDNZ_sal,
-        eDNZs_sal,
-        mD_sal,
-        mDN_sal,
-        mDNZ_sal,
-        mDNZs_sal,
-    ])
-    salarios.index = [
-        'eD salários', 'eDN salários', 'eDNZ salários', 'eDNZ+ salários',
-        'mD salários', 'mDN salários', 'mDNZ salários', 'mDNZ+ salários',
-    ]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        abertos = np.stack([C, eDN, C/C, eDN/C], axis=-2)                   # 4 var x 4 x n
+        fechados = np.stack([eDNZ, eDNZs, eDNZ/Cf, eDNZs/Cf], axis=-2)
+    abertos = abertos.reshape(lider + (16, n))[..., _ABERTOS, :]
+    fechados = fechados.reshape(lider + (16, n))[..., _ABERTOS, :]
 
-    # Lr = pd.DataFrame(
-    #         np.diag(sal68.values[0]).dot(np.linalg.inv(np.diag(x68.values[0]))).dot(L),  # eq. 6.18
-    #         index=L.index, columns=L.columns
-    #     )
+    multi = np.full(lider + (28, n+1), np.nan)
+    multi[..., _LINHAS_ABERTAS, 0:n] = abertos
+    multi[..., _LINHAS_FECHADAS, 0:n-1] = fechados[..., 0:n-1]
+    multi[..., _LINHAS_FECHADAS, n] = fechados[..., n-1]
+    return multi
 
-    """
-    Multiplicadores de Emprego
-    --------------------------
-    """
-    # vetor linha dos empregos 1x68 [com empregos do setor 9700]
-    # o mesmo valor para os empregos vale para o caso com famílias]
-    emp = pd.DataFrame(empregos[L.columns]).T
-    empf = emp.copy()
-    empf.columns = Lf.index
-
-    # vetor linha do input total
-    X = pd.DataFrame(mip[L.columns].loc['total_insumos']).T
-    # input total fechado para famílias
-    Xf = pd.DataFrame(mip[Lf.columns].loc['total_insumos']).T
-    Xf['famílias'] = mip['famílias'].sum()
 
-    # vetor linha dos empregos/input => efeitos diretos
-    eD_emp = emp.divide(X.values)
+# posições em MULTIPLICADORES: produto tem só eD, eDN, eDNZ, eDNZ+
+_ABERTOS = [0, 1] + list(range(4, 16))
+_LINHAS_ABERTAS = [0, 1] + [4 + 8*v + d for v in range(3) for d in (0, 1, 4, 5)]
+_LINHAS_FECHADAS = [2, 3] + [4 + 8*v + d for v in range(3) for d in (2, 3, 6, 7)]
 
-    # efeitos diretos e indiretos
-    eDN_emp = eD_emp.dot(L)
 
-    # efeitos diretos e indiretos e induzidos totais
-    # precisa antes calcular o efeito direto para o caso fechado
-    # pq X != Xf
-    eD_empf = empf.divide(Xf.values)
-    eDNZs_emp = eD_empf.dot(Lf)
-
-    # efeitos diretos e indiretos e induzidos truncados
-    eDNZ_emp = eDNZs_emp.subtract(Lf.loc['famílias'] * eD_empf['famílias'].values[0])
-
-    # multiplicadores tipo I e II
-    mD_emp = eD_emp.divide(eD_emp)
-    mDN_emp = eDN_emp.divide(eD_emp)
-    mDNZ_emp = eDNZ_emp.divide(eD_empf)
-    mDNZs_emp = eDNZs_emp.divide(eD_empf)
-
-    emprego = pd.concat([
-        eD_emp,
-        eDN_emp,
-        eDNZ_emp,
-        eDNZs_emp,
-        mD_emp,
-        mDN_emp,
-        mDNZ_emp,
-        mDNZs_emp,
-    ])
-    emprego.index = [
-        'eD emprego', 'eDN emprego', 'eDNZ emprego', 'eDNZ+ emprego',
-        'mD emprego', 'mDN emprego', 'mDNZ emprego', 'mDNZ+ emprego',
-    ]
-
-    # Lem = pd.DataFrame(
-    #         np.diag(em68.values[0]).dot(np.linalg.inv(np.diag(x68.values[0]))).dot(L),  # eq. 6.18
-    #         index=L.index, columns=L.columns
-    #     )
-
-    df_multi = pd.concat([produto, adicionado, salarios, emprego], axis=0)
-
-    return df_multi
+def _vezes(C, L):
+    """C.L para linhas C (... x m x n) e L array ou LeontiefSolver"""
+    if isinstance(L, LeontiefSolver):
+        return np.swapaxes(L.solve_transposed(np.swapaxes(C, -1, -2)), -1, -2)
+    return C @ np.asarray(L)
 
 
 def indice_HR(L):
@@ -861,12 +1498,19 @@ def indice_HR(L):
     Para frente (F): o quanto um setor é demandado pelos demais setores da economia
 
     T > 1 e F > 1 define um SETOR CHAVE
+
+    L: DataFrame ou LeontiefSolver
     """
 
-    Lj = L.sum(axis=0)  # soma dos elementos das colunas
-    Li = L.sum(axis=1)  # soma dos elementos das linhas
+    if isinstance(L, LeontiefSolver):
+        um = np.ones(L.n)
+        Lj = pd.Series(L.solve_transposed(um), index=L.columns)
+        Li = pd.Series(L.solve(um), index=L.index)
+    else:
+        Lj = L.sum(axis=0)  # soma dos elementos das colunas
+        Li = L.sum(axis=1)  # soma dos elementos das linhas
     L_ = Lj.sum()       # soma de todos os elementos de L
-    n = L.shape[0]      # setores
+    n = len(Lj)         # setores
     mLj = Lj/n          # media dos inputs
     mLi = Li/n          # media dos outputs
     mL = L_/(n*n)       # media global
@@ -884,3 +1528,357 @@ def indice_HR(L):
     return T, F, chave
 
 
+def regionalizar_mipita(mip, qL, propT, progresso=None):
+    """Regionalização vetorizada da mipita para várias áreas
+
+    mip: array ou MipArray 77x76 (mipita nacional, linhas codigos + INSUMOS, colunas codigos + PRODUTOS)
+    qL: array areas x 68 (quocientes locacionais somados por área)
+    propT: array areas (proporção da população de cada área)
+    progresso: callback ou Progresso => etapas 'bloco A', 'bloco B', 'bloco C' e 'equalização'
+
+    retorna
+    mipreg: array areas x 77 x 76
+    comprou, vendeu: arrays areas x 68 (equalização com o resto do Brasil)
+    """
+    progresso = Progresso.de(progresso)
+    mip = np.asarray(mip)
+    qL = np.atleast_2d(qL)
+    propT = np.atleast_1d(propT)
+    k = qL.shape[0]
+    mipreg = np.zeros((k, 77, 76))
+    # BLOCO A # insumos dependem da produção local
+    mipreg[:, 0:76, 0:68] = mip[None, 0:76, 0:68] * qL[:, None, :]
+    mipreg[:, 70, 0:68] = 0.0  # importado do Brasil
+    mipreg[:, 76, 0:68] = mipreg[:, 0:76, 0:68].sum(axis=1)
+    progresso('bloco A')
+    # BLOCO B # exportações, capital fixo e estoque pela produção local,
+    # governo, isfl e famílias pelo tamanho da população local
+    mipreg[:, 0:68, [68, 73, 74]] = mip[None, 0:68, [68, 73, 74]] * qL[:, :, None]
+    mipreg[:, 0:68, [70, 71, 72]] = mip[None, 0:68, [70, 71, 72]] * propT[:, None, None]
+    progresso('bloco B')
+    # BLOCO C # importado e impostos do consumo final
+    linhas = np.array([68, 69, 71, 72, 73])
+    mipreg[:, linhas[:, None], np.arange(68, 75)] = mip[None, linhas[:, None], np.arange(68, 75)] * propT[:, None, None]
+    mipreg[:, :, 75] = mipreg[:, :, 0:75].sum(axis=2)
+    progresso('bloco C')
+    # EQUALIZAR imp e exp para o Brasil
+    # Hipótese subjacente da modelagem para as compras e vendas ao Brasil
+    # => compras e vendas são realizadas apenas pelas atividades intermediarias
+    # => consumo final não compra direto de fora da região [PENSAR NISSO]
+    E = mipreg[:, 0:68, 75] - mipreg[:, 76, 0:68]
+    comprou = np.where(E >= 0, E, 0.0)
+    vendeu = np.where(E >= 0, 0.0, -E)
+    mipreg[:, 70, 0:68] = comprou
+    mipreg[:, :, 69] = 0.0
+    mipreg[:, 0:68, 69] = vendeu
+    # soma tudo de novo
+    mipreg[:, 76, 0:68] = mipreg[:, 0:76, 0:68].sum(axis=1)
+    mipreg[:, :, 75] = mipreg[:, :, 0:75].sum(axis=2)
+    progresso('equalização')
+    return mipreg, comprou, vendeu
+
+
+def calcular_lote(mip, qL, propT, empregos):
+    """Regionalização completa de várias áreas sobre arrays
+
+    mip: array 77x76 (mipita nacional)
+    qL: array areas x 68
+    propT: array areas
+    empregos: array 68 (empregos nacionais por setor)
+
+    retorna
+    dict de arrays com os atributos de Lote
+    """
+    qL = np.atleast_2d(qL)
+    mipreg, comprou, vendeu = regionalizar_mipita(mip, qL, propT)
+    A, Af = matriz_coeficientes_tecnicos_lote(mipreg)
+    solver = LeontiefSolver(A)
+    solver_f = LeontiefSolver(Af)
+    empregos = qL * empregos
+    HRtras, HRfrente, chave = indice_HR_lote(solver)
+    return {
+        'qL': qL,
+        'propT': np.atleast_1d(propT),
+        'mipreg': mipreg,
+        'comprou': comprou,
+        'vendeu': vendeu,
+        'A': A,
+        'Af': Af,
+        'empregos': empregos,
+        'multiplicadores': nucleo_multiplicadores(*coeficientes_diretos(mipreg, empregos), solver, solver_f),
+        'HRtras': HRtras,
+        'HRfrente': HRfrente,
+        'chave': chave,
+    }
+
+
+def matriz_coeficientes_tecnicos_lote(mips):
+    """Matrizes A e Af para uma pilha de mipitas (areas x 77 x 76)
+
+    Mesma construção de matriz_coeficientes_tecnicos, com 'famílias' na
+    posição do setor 9700 em Af.
+
+    retorna
+    A, Af: arrays areas x 68 x 68
+    """
+    mips = np.asarray(mips)
+    total = mips[:, 76, 0:68]
+    A = mips[:, 0:68, 0:68] / total[:, None, :]
+    input_familias = mips[:, :, 72].sum(axis=1)
+    remu = mips[:, 72, 0:68] + mips[:, 73, 0:68]
+    Af = A.copy()
+    Af[:, 67, 0:67] = remu[:, 0:67] / total[:, 0:67]
+    Af[:, 0:67, 67] = mips[:, 0:67, 72] / input_familias[:, None]
+    Af[:, 67, 67] = remu[:, 67] / input_familias
+    return A, Af
+
+
+def coeficientes_diretos(mip, empregos):
+    """Coeficientes diretos por unidade de produto: produto, valor adicionado,
+    salários e emprego
+
+    mip: array ou MipArray 77x76 (ou pilha areas x 77 x 76) no padrão mipita
+    empregos: array 68 (ou areas x 68)
+
+    retorna
+    C: (areas x) 4 x 68, divididos pelo total de insumos de cada setor
+    Cf: idem para o modelo fechado, com 'famílias' na posição do setor 9700
+    """
+    mip = np.asarray(mip)
+    X = mip[..., 76, 0:68]
+    Xf = X.copy()
+    Xf[..., 67] = mip[..., :, 72].sum(axis=-1)
+    va = mip[..., [72, 73, 74], 0:68].sum(axis=-2)
+    sal = mip[..., 72, 0:68]
+    um = np.ones(X.shape)
+    C = np.stack([um, va/X, sal/X, empregos/X], axis=-2)
+    Cf = np.stack([um, va/Xf, sal/Xf, empregos/Xf], axis=-2)
+    return C, Cf
+
+
+def impactos(mip, empregos, L, Lf, choques):
+    """Impactos de choques de demanda final, vários cenários numa só chamada
+
+    mip: array ou MipArray 77x76 (ou pilha areas x 77 x 76) no padrão mipita
+    empregos: array 68 (ou areas x 68)
+    L, Lf: LeontiefSolver (ou LeontiefIterativo) das matrizes A e Af correspondentes
+    choques: array cenários x 68 (setores) ou cenários x 69 (setores + injeção
+    direta na renda das famílias, só tem efeito no modelo fechado)
+
+    retorna
+    array (areas x) cenários x 3 x 4 x 68
+    efeitos: EFEITOS (direto, indireto, induzido)
+    variáveis: VARIAVEIS (produto, valor adicionado, salários, emprego)
+    setores: mesma ordem de L; na posição do 9700 o efeito induzido
+    refere-se às famílias, como no modelo fechado
+
+    A soma dos três efeitos para um choque unitário no setor j reproduz
+    o multiplicador eDNZ+ de j; direto + indireto reproduz eDN.
+    """
+    C, Cf = coeficientes_diretos(mip, empregos)
+    choques = np.atleast_2d(np.asarray(choques, dtype=np.float64))
+    f = choques[:, 0:68]
+    ff = f.copy()
+    if choques.shape[1] > 68:
+        ff[:, 67] += choques[:, 68]
+    lider = L.M.shape[:-2]
+    x = np.swapaxes(L.solve(np.broadcast_to(f.T, lider + f.T.shape)), -1, -2)
+    xf = np.swapaxes(Lf.solve(np.broadcast_to(ff.T, lider + ff.T.shape)), -1, -2)
+    C = C[..., None, :, :]
+    Cf = Cf[..., None, :, :]
+    x = x[..., :, None, :]
+    xf = xf[..., :, None, :]
+    f = f[:, None, :]
+    return np.stack([C*f, C*(x - f), Cf*xf - C*x], axis=-3)
+
+
+def _choques(choques, codigos):
+    """Cenários como array; DataFrames/Series são alinhados pelos códigos dos setores"""
+    if isinstance(choques, pd.Series):
+        choques = choques.to_frame().T
+    if isinstance(choques, pd.DataFrame):
+        colunas = codigos + (['famílias'] if 'famílias' in choques.columns else [])
+        choques = choques.reindex(columns=colunas, fill_value=0.0).values
+    return choques
+
+
+def indice_HR_lote(L):
+    """Índice de Hirschman-Rasmussen para uma pilha de matrizes de Leontief
+
+    L: LeontiefSolver sobre uma pilha de A, ou array (areas x) n x n de L;
+    com o solver as somas de linhas e colunas saem de dois solves, sem
+    materializar L
+
+    retorna
+    T (para trás), F (para frente) e chave = (T > 1) & (F > 1), (areas x) n
+    """
+    if isinstance(L, LeontiefSolver):
+        um = np.ones(L.M.shape[:-1])
+        n = L.n
+        Lj = L.solve_transposed(um)
+        Li = L.solve(um)
+    else:
+        L = np.asarray(L, dtype=np.float64)
+        n = L.shape[-1]
+        Lj = L.sum(axis=-2)
+        Li = L.sum(axis=-1)
+    mL = Lj.sum(axis=-1, keepdims=True)/(n*n)
+    T = (Lj/n)/mL
+    F = (Li/n)/mL
+    return T, F, (T > 1) & (F > 1)
+
+
+def encadeamentos(L, setores=None, q=5, tipo='fornecedores'):
+    """Maiores elementos de L - I por setor, sem ordenar as linhas inteiras
+
+    L: n x n ou pilha areas x n x n (array, DataFrame ou LeontiefSolver)
+    setores: None (todos), posição int ou list de posições
+    q: int => quantos encadeamentos por setor
+    tipo: 'fornecedores' => coluna j de L (quem fornece a j, a montante)
+          'compradores' => linha i de L (quem compra de i, a jusante)
+
+    retorna
+    (posicoes, valores) com shape (areas x) setores x q, em ordem decrescente;
+    sem o 1 da diagonal, o próprio setor só aparece pelo efeito indireto
+    """
+    if isinstance(L, LeontiefSolver):
+        L = L.L
+    L = np.asarray(L, dtype=np.float64)
+    n = L.shape[-1]
+    D = L - np.identity(n)
+    if tipo == 'fornecedores':
+        D = np.swapaxes(D, -1, -2)
+    elif tipo != 'compradores':
+        raise Exception('[!!] tipo deve ser fornecedores ou compradores')
+    if setores is not None:
+        D = D[..., np.atleast_1d(setores), :]
+    q = min(q, n)
+    pos = np.argpartition(-D, q - 1, axis=-1)[..., :q]
+    val = np.take_along_axis(D, pos, axis=-1)
+    ordem = np.argsort(-val, axis=-1, kind='stable')
+    return np.take_along_axis(pos, ordem, axis=-1), np.take_along_axis(val, ordem, axis=-1)
+
+
+def tabela_encadeamentos(L, codigos, legenda=None, setores=None, q=5, tipo='fornecedores', recortes=None):
+    """encadeamentos() como tabela longa
+
+    setores: None (todos), código ou list de códigos
+    legenda: dict => código -> descrição da atividade (opcional)
+    recortes: list => rótulos das áreas, quando L é uma pilha
+
+    retorna
+    DataFrame com colunas [recorte], setor, ordem, código, atividade, valor
+    """
+    if setores is None:
+        setores = list(codigos)
+    elif type(setores) is not list:
+        setores = [setores]
+    setores = [str(s) for s in setores]
+    indice = {c: k for k, c in enumerate(codigos)}
+    pos, val = encadeamentos(L, [indice[s] for s in setores], q, tipo)
+    q = pos.shape[-1]
+    areas = pos.shape[0] if pos.ndim == 3 else 1
+    codigos = np.asarray(codigos, dtype=object)
+    tabela = pd.DataFrame({
+        'setor': np.tile(np.repeat(np.asarray(setores, dtype=object), q), areas),
+        'ordem': np.tile(np.arange(1, q + 1), areas * len(setores)),
+        'código': codigos[pos.ravel()],
+    })
+    if legenda:
+        tabela['atividade'] = tabela['código'].map(legenda)
+    tabela['valor'] = val.ravel()
+    if pos.ndim == 3:
+        rotulos = recortes if recortes is not None else list(range(areas))
+        tabela.insert(0, 'recorte', np.repeat(np.asarray(rotulos, dtype=object), len(setores) * q))
+    return tabela
+
+
+def _principais(L, codigos, legenda, setor, q, tipo):
+    """fornecedores/compradores de um setor no formato de sempre: [valor, código, atividade]"""
+    pos, val = encadeamentos(L, codigos.index(setor), q, tipo)
+    cods = [codigos[k] for k in pos[0]]
+    return pd.DataFrame({0: val[0], 1: cods, 2: [legenda[c] for c in cods]})
+
+
+def areas_chave(chave, setor, codigos, recortes):
+    """Áreas em que o setor é chave
+
+    chave: array areas x n (máscara de indice_HR_lote)
+    setor: código do setor
+
+    retorna
+    list dos recortes
+    """
+    coluna = chave[:, list(codigos).index(str(setor))]
+    return [recortes[k] for k in np.flatnonzero(coluna)]
+
+
+def quadro_chave(HRtras, HRfrente, chave, codigos):
+    """Resumo por setor de uma pilha de índices HR
+
+    retorna
+    DataFrame indexado pelos códigos com: áreas em que o setor é chave
+    (contagem e fração) e médias e extremos de T e F entre as áreas
+    """
+    chave = np.asarray(chave, dtype=bool)
+    return pd.DataFrame({
+        'chave': chave.sum(axis=0),
+        'fração': chave.mean(axis=0),
+        'T médio': HRtras.mean(axis=0),
+        'T mín': HRtras.min(axis=0),
+        'T máx': HRtras.max(axis=0),
+        'F médio': HRfrente.mean(axis=0),
+        'F mín': HRfrente.min(axis=0),
+        'F máx': HRfrente.max(axis=0),
+    }, index=list(codigos))
+
+
+# colunas de pop com o VAB de referência (IBGE): total, agricultura, indústria, serviços
+_VAB_REFERENCIA = ['vabM', 'vabMagro', 'vabMind', 'vabMserv']
+
+
+def matriz_agregacao(map3, codigos):
+    """Matriz 68 x 3 que soma as atividades em agricultura, indústria e serviços"""
+    M = np.zeros((len(codigos), 3))
+    pos = {c: i for i, c in enumerate(codigos)}
+    for k, setor in enumerate(['agricultura', 'indústria', 'serviços']):
+        M[[pos[c] for c in map3[setor]], k] = 1.0
+    return M
+
+
+def calibracao(mipreg, vabM, M3, recortes):
+    """Ajuste da regionalização ao VAB do IBGE para uma pilha de áreas
+
+    mipreg: areas x 77 x 76
+    vabM: areas x 4 => VAB de referência: total, agricultura, indústria, serviços
+    M3: 68 x 3 => matriz_agregacao
+    recortes: list => rótulos das áreas
+
+    retorna
+    DataFrame com as mesmas chaves numéricas de Mipita.avaliar (desvios, 1.0 =
+    ajuste perfeito; erros em R$ 1.000; participações do IBGE em %) e
+    'desvio máx' = maior |desvio - 1|, ordenado por ele do pior ao melhor
+    """
+    mipreg = np.asarray(mipreg)
+    # salários, contribuições sociais, margem, outros impostos e subsídios
+    vab = mipreg[:, 72:76, :]
+    vabR = np.column_stack([
+        vab[:, :, 75].sum(axis=1),                 # coluna total_produtos
+        vab[:, :, 0:68].sum(axis=1).dot(M3),
+    ]) * 1000
+    vabM = np.asarray(vabM, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        desvio = vabR / vabM
+    desvio[:, 1:] = np.where(vabR[:, 1:] == 0, 1.0, desvio[:, 1:])  # casos limítrofes
+    erro = vabR - vabM
+    tabela = pd.DataFrame({
+        'PIB': desvio[:, 0], 'agricultura': desvio[:, 1],
+        'indústria': desvio[:, 2], 'serviços': desvio[:, 3],
+        'erro PIB': erro[:, 0], 'erro agricultura': erro[:, 1],
+        'erro indústria': erro[:, 2], 'erro serviços': erro[:, 3],
+        'partagro': np.round(100 * vabM[:, 1] / vabM[:, 0], 2),
+        'partind': np.round(100 * vabM[:, 2] / vabM[:, 0], 2),
+        'partserv': np.round(100 * vabM[:, 3] / vabM[:, 0], 2),
+        'desvio máx': np.abs(desvio - 1).max(axis=1),
+    }, index=pd.Index(recortes, name='recorte'))
+    return tabela.sort_values('desvio máx', ascending=False)
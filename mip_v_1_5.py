@@ -12,7 +12,6 @@ import streamlit as st
 
 # Bibliotecas Impacto
 import matriz # carrega módulo matriz
-import time
 
         
 # Dados básicos  streamlit
@@ -24,11 +23,41 @@ st.title('Projeto Impacto')
 # funções
 #=============================================================================
 
-     
-@st.cache_data
-def load_matriz_nereus(ano_analise):
-    n = matriz.Nereus(ano_analise)
+
+def barra_progresso(barra, etapas, texto):
+    """Callback de progresso (etapa, bytes, decorrido) que atualiza uma st.progress
+
+    etapas: list => etapas que contam para a fração concluída ('memo', resultado
+    já calculado, conclui todas)
+    """
+    feitas = []
+    def progresso(etapa, bytes, decorrido):
+        if etapa == 'memo':
+            feitas[:] = etapas
+        elif etapa in etapas and etapa not in feitas:
+            feitas.append(etapa)
+        legenda = "%s: %s | %.1f MB | %.1f s" % (texto, etapa, bytes / 2**20, decorrido)
+        barra.progress(len(feitas) / len(etapas), text=legenda)
+    return progresso
+
+
+# um objeto Nereus por ano, compartilhado entre sessões e reexecuções (sem
+# serializar); _progresso não entra na chave do cache
+@st.cache_resource
+def load_matriz_nereus(ano_analise, _progresso=None):
+    n = matriz.Nereus(ano_analise, progresso=_progresso)
     return n
+
+
+def regionalizar_utp(n, name_utp, progresso=None):
+    """Mipita regionalizada para a UTP de nome name_utp (None se não existir);
+    repetições vêm da memória de regionalizações do módulo matriz"""
+    m = n.extrair_mipita()
+    tab_utp = m.utp[m.utp['Nome'] == name_utp]
+    if tab_utp.empty:
+        return None
+    m.regionalizar(list(tab_utp.index), label=name_utp, progresso=progresso)
+    return m
         
 
 #=============================================================================
@@ -46,21 +75,20 @@ with st.sidebar:
 #=============================================================================
 
 
-# Create a text element and let the reader know the data is loading
-m = load_matriz_nereus(ano_analise)  # Load objeto matriz nereus para o ano de referencia
-
-
-progress_text = "Carregando matriz nereus."
-my_bar = st.progress(0, text=progress_text)
-
-for percent_complete in range(100):
-    time.sleep(0.050)
-    my_bar.progress(percent_complete + 1, text=progress_text)
-
-
-
-
-
-
+# Load objeto matriz nereus para o ano de referencia; a barra só avança
+# quando há carga de fato (no cache a função não é executada)
+barra = st.progress(0, text="Carregando matriz nereus.")
+n = load_matriz_nereus(ano_analise, barra_progresso(
+    barra, ['mip nereus', 'atividades'] + matriz.Nereus.ETAPAS, "Carregando matriz nereus"))
+barra.empty()
 
+barra = st.progress(0, text="Regionalizando " + name_utp)
+m = regionalizar_utp(n, name_utp, barra_progresso(
+    barra, matriz.Mipita.ETAPAS, "Regionalizando " + name_utp))
+barra.empty()
 
+if m is None:
+    st.warning('UTP não encontrada: ' + name_utp)
+else:
+    st.subheader(m.recorte + ' | ' + m.ano)
+    st.dataframe(m.multiplicadores)
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +---------------+
+ |  P A I N E L  |
+ +---------------+
+
+Painel de vários anos da MIP Nereus em arrays empilhados (anos x ...)
+
+import painel
+p = painel.NereusPanel(range(2010, 2019))
+p.serie('mDN emprego', '0191')      # série temporal, um slice de p.multiplicadores
+p.multiplicadores[:, 25, 0]          # o mesmo, direto no array
+
+Os anos são baixados e construídos em paralelo por um pool de threads, que
+compartilham a sessão HTTP (pool de conexões) e o cache local de dados.py.
+Só os downloads correm em paralelo: as gravações no cache e no seu índice
+são serializadas em dados.py (trava de thread e de arquivo).
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import matriz
+from dados import ModuloAdiado
+
+pd = ModuloAdiado('pandas')
+
+
+class NereusPanel:
+    """Nereus de vários anos com rótulos compartilhados.
+
+    anos: list de anos (default: 2010 a 2018)
+    path: str => como em Nereus
+    threads: int => tamanho do pool (default: um por ano)
+
+    mipita: anos x 77 x 76
+    A, L: anos x 68 x 68
+    multiplicadores: anos x 28 x 69
+    """
+    def __init__(self, anos=range(2010, 2019), path="", threads=None):
+        self.anos = [str(a) for a in anos]
+        self.path = path
+        with ThreadPoolExecutor(threads or len(self.anos)) as pool:
+            construidos = pool.map(lambda ano: matriz.Nereus(ano, path), self.anos)
+            self.nereus = dict(zip(self.anos, construidos))
+
+        primeiro = self.nereus[self.anos[0]]
+        for ano, n in self.nereus.items():
+            if n.codigos != primeiro.codigos:
+                raise Exception('[!!] Códigos das atividades de ' + ano + ' diferem de ' + self.anos[0])
+        self.codigos = primeiro.codigos
+        self.linhas = primeiro.nucleo.linhas
+        self.colunas = primeiro.nucleo.colunas
+        self.colunas_multi = list(primeiro.multiplicadores.columns)
+
+        ns = [self.nereus[ano] for ano in self.anos]
+        self.mipita = np.stack([n.nucleo.dados for n in ns])
+        self.A = np.stack([n.A.values for n in ns])
+        self.L = np.stack([n.L.values for n in ns])
+        self.multiplicadores = np.stack([n.multiplicadores.values for n in ns])
+
+
+    def __repr__(self):
+        r = "Painel de Matrizes de Insumo-Produto - Brasil\n"
+        r += "---------------------------------------------\n"
+        r += " ".join(self.anos)
+        r += "\ndados: " + self.nereus[self.anos[0]].fonte
+        return r
+
+
+    def __getitem__(self, ano):
+        return self.nereus[str(ano)]
+
+
+    def serie(self, multiplicador, setor):
+        """Série temporal de um multiplicador (ver matriz.MULTIPLICADORES) de um setor"""
+        i = matriz.MULTIPLICADORES.index(multiplicador)
+        j = self.colunas_multi.index(str(setor))
+        return pd.Series(self.multiplicadores[:, i, j], index=self.anos, name=multiplicador + ' ' + str(setor))
+
+
+    def quadro(self, multiplicador):
+        """Multiplicador de todos os setores em todos os anos: DataFrame anos x setores"""
+        i = matriz.MULTIPLICADORES.index(multiplicador)
+        return pd.DataFrame(self.multiplicadores[:, i, :], index=self.anos, columns=self.colunas_multi)
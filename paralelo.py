@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-------------------+
+ |  P A R A L E L O  |
+ +-------------------+
+
+Regionalização em paralelo, com a mipita nacional em memória compartilhada
+
+import matriz, paralelo
+fontes = [matriz.Nereus(ano) for ano in range(2010, 2019)]
+with paralelo.Regionalizador(fontes, processos=8, bloco=32) as r:
+    lotes = r.regionalizar()     # {ano: Lote} com todas as UTPs
+lotes['2015'].extrair(0)
+
+Os arrays de base de cada ano (mipita, qls, propT e empregos) são copiados
+uma única vez para multiprocessing.shared_memory; os processos recebem apenas
+os nomes dos blocos e os índices das UTPs de cada tarefa.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import matriz
+
+
+# arrays anexados à memória compartilhada em cada processo
+_compartilhado = {}
+
+
+def _anexar(descritores):
+    """Inicializador dos processos: abre os blocos compartilhados."""
+    for ano, arrays in descritores.items():
+        _compartilhado[ano] = {}
+        for nome, (bloco, shape) in arrays.items():
+            shm = shared_memory.SharedMemory(name=bloco)
+            arr = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            _compartilhado[ano][nome] = (shm, arr)
+
+
+def _tarefa(ano, grupos, exceto):
+    """Regionaliza um bloco de áreas; grupos é uma list de list de índices de utps."""
+    base = {nome: arr for nome, (shm, arr) in _compartilhado[ano].items()}
+    G = np.zeros((len(grupos), base['qls'].shape[0]))
+    for k, grupo in enumerate(grupos):
+        np.add.at(G[k], grupo, 1.0)  # índices repetidos contam cada vez
+    qL = G.dot(base['qls'])
+    propT = G.dot(base['propT'])
+    if exceto:
+        qL = 1 - qL
+        propT = 1 - propT
+    return matriz.calcular_lote(base['mip'], qL, propT, base['empregos'])
+
+
+class Regionalizador:
+    """Executor de regionalizações em processos paralelos.
+
+    fontes: Nereus ou Mipita, ou list deles (um por ano)
+    processos: int => número de processos (default: os.cpu_count())
+    bloco: int => número de áreas por tarefa
+    """
+    def __init__(self, fontes, processos=None, bloco=32):
+        if type(fontes) is not list:
+            fontes = [fontes]
+        self.processos = processos or os.cpu_count()
+        self.bloco = bloco
+        self.bases = {}
+        for fonte in fontes:
+            if isinstance(fonte, matriz.Nereus):
+                fonte = fonte.extrair_mipita()
+            self.bases[fonte.ano] = fonte
+        self._memorias = []
+        self._executor = None
+
+
+    def __repr__(self):
+        r = "Regionalizador paralelo - Mipita\n"
+        r += "--------------------------------\n"
+        r += "anos: " + " ".join(self.bases)
+        r += "\nprocessos: " + str(self.processos) + " | bloco: " + str(self.bloco)
+        return r
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+    def _iniciar(self):
+        """Copia os arrays de base para a memória compartilhada e sobe os processos."""
+        if self._executor is not None:
+            return
+        descritores = {}
+        for ano, base in self.bases.items():
+            mip, qls, propT, empregos = base.arrays_lote()
+            descritores[ano] = {}
+            for nome, arr in [('mip', mip), ('qls', qls), ('propT', propT), ('empregos', empregos)]:
+                arr = np.ascontiguousarray(arr, dtype=np.float64)
+                shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf)[...] = arr
+                self._memorias.append(shm)
+                descritores[ano][nome] = (shm.name, arr.shape)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processos, initializer=_anexar, initargs=(descritores,))
+
+
+    def regionalizar(self, areas=None, anos=None, exceto=False):
+        """Regionaliza as áreas em todos os anos
+
+        areas: list => como em Mipita.regionalizar_lote (default: todas as UTPs)
+        anos: list => subconjunto dos anos das fontes (default: todos)
+        exceto: bool => se True calcula o complementar de cada item
+
+        retorna
+        dict {ano: Lote}
+        """
+        self._iniciar()
+        anos = [str(a) for a in anos] if anos else list(self.bases)
+        tarefas = {}
+        for ano in anos:
+            base = self.bases[ano]
+            grupos = base.grupos_lote(areas if areas is not None else list(base.qls.index))
+            pos = {u: i for i, u in enumerate(base.qls.index)}
+            indices = [[pos[u] for u in grupo] for grupo in grupos]
+            futuros = [
+                self._executor.submit(_tarefa, ano, indices[i:i+self.bloco], exceto)
+                for i in range(0, len(indices), self.bloco)
+            ]
+            tarefas[ano] = (grupos, futuros)
+
+        lotes = {}
+        for ano, (grupos, futuros) in tarefas.items():
+            partes = [f.result() for f in futuros]
+            resultados = {
+                nome: np.concatenate([p[nome] for p in partes]) for nome in partes[0]
+            }
+            lotes[ano] = matriz.Lote(self.bases[ano], grupos, exceto, resultados)
+        return lotes
+
+
+    def fechar(self):
+        """Encerra os processos e libera a memória compartilhada."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for shm in self._memorias:
+            shm.close()
+            shm.unlink()
+        self._memorias = []
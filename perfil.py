@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +---------------+
+ |  P E R F I L  |
+ +---------------+
+
+Perfil de tempo, cpu e memória por etapa (opcional, desligado por padrão)
+
+import matriz, perfil
+with perfil.Perfil() as p:
+    n = matriz.Nereus(2015)
+    m = n.extrair_mipita()
+    m.regionalizar('312')
+p.resumo()                  # DataFrame por (escopo, etapa)
+p.json('perfil.json')       # eventos e resumo em JSON
+
+Enquanto o Perfil está ativo ele fica registrado como gancho de dados.Progresso
+e recebe cada etapa já relatada, sem precisar passar nada às funções. O escopo
+separa etapas de mesmo nome em fases diferentes:
+
+Nereus: carregadores (mip nereus, atividades) e fatias, mipita, coeficientes,
+        leontief, multiplicadores, HR
+Mipita: carregadores das tabelas de referência (qls, pop, utp, map3)
+regionalizar: qL, bloco A, bloco B, bloco C, equalização, ajuste,
+        coeficientes, leontief, multiplicadores, HR
+
+parede: tempo decorrido na etapa (s)
+cpu: tempo de cpu do processo na etapa (s; soma todas as threads)
+pico: maior alocação acima do início da etapa (bytes, via tracemalloc)
+
+tracemalloc deixa o código bem mais lento: use memoria=False para medir só tempos.
+O Perfil só mede picos se ele mesmo ligar o tracemalloc (dados.reservar_tracemalloc):
+com uma sessão de tracemalloc do usuário ou outro Perfil medindo, pico fica
+vazio. Etapas simultâneas em várias threads também saem sem pico.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import json
+import threading
+
+from dados import (ModuloAdiado, registrar_gancho, remover_gancho, reservar_tracemalloc,
+    liberar_tracemalloc)
+
+pd = ModuloAdiado('pandas')
+
+
+class Perfil:
+    """Coleta os eventos de etapa de todos os Progresso do processo.
+
+    memoria: bool => se True liga o tracemalloc (se ninguém o estiver usando)
+    para medir o pico de alocação de cada etapa
+    """
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.eventos = []
+        self._trava = threading.Lock()
+
+
+    def __repr__(self):
+        r = "Perfil de etapas\n"
+        r += "----------------\n"
+        r += str(len(self.eventos)) + " eventos"
+        return r
+
+
+    def __enter__(self):
+        return self.iniciar()
+
+
+    def __exit__(self, *args):
+        self.parar()
+
+
+    def __call__(self, evento):
+        with self._trava:
+            self.eventos.append(evento)
+
+
+    def iniciar(self):
+        """Registra o gancho (e liga o tracemalloc se memoria=True)"""
+        if self.memoria:
+            reservar_tracemalloc(self)
+        registrar_gancho(self)
+        return self
+
+
+    def parar(self):
+        """Remove o gancho e desliga o tracemalloc se foi ligado por este Perfil"""
+        remover_gancho(self)
+        liberar_tracemalloc(self)
+
+
+    def resumo(self):
+        """DataFrame por (escopo, etapa), na ordem do primeiro evento: vezes,
+        parede, cpu e bytes somados, pico máximo"""
+        with self._trava:
+            eventos = list(self.eventos)
+        tabela = pd.DataFrame(eventos, columns=['escopo', 'etapa', 'bytes', 'parede', 'cpu', 'pico', 'thread'])
+        resumo = tabela.groupby(['escopo', 'etapa'], sort=False).agg(
+            vezes=('etapa', 'size'), parede=('parede', 'sum'), cpu=('cpu', 'sum'),
+            pico=('pico', 'max'), bytes=('bytes', 'sum'))
+        return resumo
+
+
+    def json(self, arquivo=None):
+        """Eventos e resumo em JSON; grava em arquivo se indicado
+
+        retorna
+        str com o JSON
+        """
+        resumo = self.resumo()
+        with self._trava:
+            eventos = list(self.eventos)
+        conteudo = json.dumps({
+            'versao': __version__,
+            'eventos': eventos,
+            'resumo': [
+                dict(escopo=escopo, etapa=etapa, **{k: (None if v != v else v) for k, v in linha.items()})
+                for (escopo, etapa), linha in resumo.astype(object).iterrows()
+            ],
+        }, ensure_ascii=False, indent=1, default=float)
+        if arquivo:
+            with open(arquivo, 'w') as f:
+                f.write(conteudo)
+        return conteudo
@@ -0,0 +1,430 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +-----------------+
+ |  S E R V I C O  |
+ +-----------------+
+
+Serviço HTTP/JSON local de multiplicadores, índices HR, encadeamentos e impactos
+
+python servico.py --anos 2015 2016 --porta 8765
+python servico.py --anos 2015 --path /dados/ --armazem /dados/armazem/
+
+GET  /anos
+GET  /estado
+GET  /multiplicadores?ano=2015&utp=312[&setor=0191]
+GET  /hr?ano=2015&utp=312
+GET  /encadeamentos?ano=2015&utp=312&setor=0191[&q=5&tipo=fornecedores]
+POST /impactos {"ano": 2015, "utp": "312", "choques": {"0191": 1000, "famílias": 10}}
+POST /lote     {"consultas": [{"rota": "hr", "ano": 2015, "utp": "312"}, ...]}
+
+import servico
+s = servico.Servico(anos=[2015])
+s.consultar({'rota': 'hr', 'ano': 2015, 'utp': '312'})     # sem HTTP
+servico.servir(s, porta=8765)
+s.fechar()                                                  # encerra a calculadora
+
+Os resultados de cada (ano, UTP) ficam numa MemoRegional própria (LRU com
+orçamento em bytes). As UTPs que faltam são calculadas por uma thread
+calculadora: as consultas simultâneas que chegam dentro da janela de espera
+(ou numa mesma requisição /lote) viram um único regionalizar_lote por ano.
+Com um ArmazemDisco (ver armazem.py), multiplicadores, HR e encadeamentos
+saem direto do memory-map; impactos sempre usam a regionalização.
+O servidor é um ThreadingHTTPServer (uma thread por conexão, keep-alive).
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+import matriz
+
+ROTAS = ['multiplicadores', 'hr', 'encadeamentos', 'impactos']
+
+
+def _json(x):
+    """array -> list com NaN como None"""
+    x = np.asarray(x, dtype=np.float64)
+    return np.where(np.isnan(x), None, x).tolist()
+
+
+class Servico:
+    """Consultas por ano e UTP sobre regionalizações pré-calculadas.
+
+    anos: list de anos atendidos
+    path: str => como em Nereus
+    armazem: str ou ArmazemDisco => armazém em disco com L, Lf e multiplicadores
+    limite: float => orçamento em MB da memória de resultados (LRU)
+    janela: float => segundos que a calculadora espera para juntar consultas
+    bloco: int => máximo de UTPs por regionalizar_lote
+    """
+    def __init__(self, anos=(2015,), path="", armazem=None, limite=256, janela=0.002, bloco=64):
+        self.anos = [str(a) for a in anos]
+        self.path = path
+        if isinstance(armazem, str):
+            import armazem as _armazem
+            armazem = _armazem.ArmazemDisco(armazem)
+        self.armazem = armazem
+        self.janela = janela
+        self.bloco = bloco
+        self.memo = matriz.MemoRegional(int(limite * 2**20))
+        self.bases = {}
+        self._trava_bases = threading.Lock()
+        self._pendentes = {}
+        self._fila = []
+        self._sinal = threading.Condition()
+        self.calculos = 0
+        self._fechado = False
+        self._calculadora = threading.Thread(target=self._calcular, daemon=True)
+        self._calculadora.start()
+
+
+    def __repr__(self):
+        r = "Serviço de consultas - Mipita\n"
+        r += "-----------------------------\n"
+        r += "anos: " + " ".join(self.anos)
+        r += "\n" + repr(self.memo)
+        if self.armazem is not None:
+            r += "\narmazém: " + self.armazem.destino
+        return r
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+    def fechar(self):
+        """Encerra a thread calculadora depois de atender a fila pendente"""
+        with self._sinal:
+            self._fechado = True
+            self._sinal.notify()
+        self._calculadora.join()
+
+
+    def base(self, ano):
+        """Mipita nacional do ano, carregada na primeira consulta"""
+        ano = str(ano)
+        if ano not in self.anos:
+            raise Exception('[!!] Ano ' + ano + ' não é atendido pelo serviço')
+        with self._trava_bases:
+            if ano not in self.bases:
+                self.bases[ano] = matriz.Nereus(ano, path=self.path, eager=False).extrair_mipita()
+            return self.bases[ano]
+
+
+    def _validar(self, ano, utp):
+        base = self.base(ano)
+        if utp not in base.qls.index:
+            raise Exception('[!!] UTP ' + utp + ' não encontrada em ' + str(ano))
+        return base
+
+
+    def resultados(self, pares):
+        """Resultados de vários (ano, utp): os que faltam na memória são
+        enfileirados juntos e calculados em lote
+
+        retorna
+        list de dict com mipreg, empregos, A, Af, L, multiplicadores, T, F,
+        chave e os LeontiefSolver de A e Af (solver, solver_f)
+        """
+        pares = [(str(ano), str(utp)) for ano, utp in pares]
+        guardados = [self.memo.obter(par) for par in pares]
+        for par, r in zip(pares, guardados):
+            if r is None:
+                self._validar(*par)
+        futuros = []
+        with self._sinal:
+            if self._fechado and any(r is None for r in guardados):
+                raise Exception('[!!] Serviço encerrado')
+            for par, r in zip(pares, guardados):
+                if r is None:
+                    r = self._pendentes.get(par)
+                    if r is None:
+                        r = self._pendentes[par] = Future()
+                        self._fila.append(par)
+                futuros.append(r)
+            self._sinal.notify()
+        return [f.result() if isinstance(f, Future) else f for f in futuros]
+
+
+    def resultado(self, ano, utp):
+        return self.resultados([(ano, utp)])[0]
+
+
+    def _calcular(self):
+        """Laço da thread calculadora: junta a fila por ano e regionaliza em lote"""
+        while True:
+            with self._sinal:
+                while not self._fila and not self._fechado:
+                    self._sinal.wait()
+                if not self._fila:
+                    return
+            time.sleep(self.janela)  # deixa chegar as consultas simultâneas
+            with self._sinal:
+                fila, self._fila = self._fila, []
+            por_ano = {}
+            for ano, utp in fila:
+                por_ano.setdefault(ano, []).append(utp)
+            for ano, utps in por_ano.items():
+                for i in range(0, len(utps), self.bloco):
+                    self._calcular_bloco(ano, utps[i:i+self.bloco])
+
+
+    def _calcular_bloco(self, ano, utps):
+        try:
+            lote = self.base(ano).regionalizar_lote(utps)
+            L = lote.L
+            self.calculos += 1
+            for k, utp in enumerate(utps):
+                # cópias: uma view manteria a pilha inteira do lote na memória
+                r = {
+                    'mipreg': lote.mipreg[k].copy(), 'empregos': lote.empregos[k].copy(),
+                    'A': lote.A[k].copy(), 'Af': lote.Af[k].copy(), 'L': L[k].copy(),
+                    'multiplicadores': lote.multiplicadores[k].copy(),
+                    'T': lote.HRtras[k].copy(), 'F': lote.HRfrente[k].copy(),
+                    'chave': lote.chave[k].copy(),
+                }
+                # fatorados uma vez aqui e reusados por todas as consultas de impactos
+                r['solver'] = matriz.LeontiefSolver(r['A'])
+                r['solver_f'] = matriz.LeontiefSolver(r['Af'])
+                self.memo.guardar((ano, utp), r)
+                with self._sinal:
+                    self._pendentes.pop((ano, utp)).set_result(r)
+        except Exception as e:
+            with self._sinal:
+                for utp in utps:
+                    futuro = self._pendentes.pop((ano, utp), None)
+                    if futuro is not None:
+                        futuro.set_exception(e)
+
+
+    def _do_armazem(self, ano, utp):
+        """True se (ano, utp) pode ser lido do armazém em disco"""
+        if self.armazem is None:
+            return False
+        try:
+            return bool(self.armazem.preenchido[self.armazem.posicao(ano, utp)])
+        except Exception:
+            return False
+
+
+    def multiplicadores(self, ano, utp, setor=None):
+        """Multiplicadores 28 x 69 da UTP, ou só a coluna do setor"""
+        base = self._validar(str(ano), str(utp))
+        if self._do_armazem(ano, utp):
+            multi = self.armazem.multiplicadores(ano, utp)
+        else:
+            multi = self.resultado(ano, utp)['multiplicadores']
+        colunas = base.codigos + ['famílias']
+        if setor is not None:
+            setor = str(setor)
+            if setor not in colunas:
+                raise Exception('[!!] Setor ' + setor + ' não encontrado')
+            return dict(zip(matriz.MULTIPLICADORES, _json(multi[:, colunas.index(setor)])))
+        return {'linhas': matriz.MULTIPLICADORES, 'colunas': colunas, 'valores': _json(multi)}
+
+
+    def hr(self, ano, utp):
+        """Índices de Hirschman-Rasmussen e setores chave da UTP"""
+        base = self._validar(str(ano), str(utp))
+        if self._do_armazem(ano, utp):
+            T, F, chave = matriz.indice_HR_lote(self.armazem.L(ano, utp))
+        else:
+            r = self.resultado(ano, utp)
+            T, F, chave = r['T'], r['F'], r['chave']
+        setores = np.asarray(base.codigos, dtype=object)
+        return {'setores': base.codigos, 'tras': _json(T), 'frente': _json(F),
+            'chave': setores[np.asarray(chave, dtype=bool)].tolist()}
+
+
+    def encadeamentos(self, ano, utp, setor, q=5, tipo='fornecedores'):
+        """Principais fornecedores ou compradores do setor na UTP"""
+        base = self._validar(str(ano), str(utp))
+        setor = str(setor)
+        if setor not in base.codigos:
+            raise Exception('[!!] Setor ' + str(setor) + ' não encontrado')
+        if self._do_armazem(ano, utp):
+            L = self.armazem.L(ano, utp)
+        else:
+            L = self.resultado(ano, utp)['L']
+        pos, val = matriz.encadeamentos(L, base.codigos.index(setor), int(q), tipo)
+        legenda = base.legenda or {}
+        return [{'código': base.codigos[p], 'atividade': legenda.get(base.codigos[p]), 'valor': float(v)}
+            for p, v in zip(pos[0].tolist(), val[0].tolist())]
+
+
+    def impactos(self, ano, utp, choques, detalhe=False):
+        """Impactos de cenários de choque na demanda final da UTP (ver matriz.impactos)
+
+        choques: dict setor -> valor (pode ter 'famílias'), ou list deles
+        detalhe: bool => se True devolve também o efeito por setor
+
+        retorna
+        list por cenário com o total de cada variável e efeito
+        """
+        base = self._validar(str(ano), str(utp))
+        if isinstance(choques, dict):
+            choques = [choques]
+        colunas = base.codigos + ['famílias']
+        f = np.zeros((len(choques), 69))
+        for c, choque in enumerate(choques):
+            for setor, valor in choque.items():
+                if setor not in colunas:
+                    raise Exception('[!!] Setor ' + setor + ' não encontrado')
+                f[c, colunas.index(setor)] = float(valor)
+        r = self.resultado(ano, utp)
+        efeito = matriz.impactos(r['mipreg'], r['empregos'], r['solver'], r['solver_f'], f)
+        total = efeito.sum(axis=-1)  # cenários x 3 x 4
+        saida = []
+        for c in range(len(choques)):
+            cenario = {v: dict(zip(matriz.EFEITOS, _json(total[c, :, i])))
+                for i, v in enumerate(matriz.VARIAVEIS)}
+            if detalhe:
+                cenario['setores'] = {v: {e: _json(efeito[c, k, i]) for k, e in enumerate(matriz.EFEITOS)}
+                    for i, v in enumerate(matriz.VARIAVEIS)}
+            saida.append(cenario)
+        return saida
+
+
+    def consultar(self, consulta):
+        """Responde uma consulta dict com 'rota', 'ano', 'utp' e os parâmetros da rota"""
+        consulta = dict(consulta)
+        rota = consulta.pop('rota', None)
+        if rota not in ROTAS:
+            raise Exception('[!!] Rota desconhecida: ' + str(rota))
+        for campo in ('ano', 'utp'):
+            if campo not in consulta:
+                raise Exception('[!!] Falta o parâmetro ' + campo)
+            consulta[campo] = str(consulta[campo])
+        return getattr(self, rota)(**consulta)
+
+
+    def lote(self, consultas):
+        """Várias consultas numa requisição: as UTPs que faltam são calculadas
+        num único lote por ano; um erro só afeta a própria consulta"""
+        pares = []
+        for c in consultas:
+            try:
+                par = (str(c['ano']), str(c['utp']))
+                if c.get('rota') == 'impactos' or not self._do_armazem(*par):
+                    self._validar(*par)
+                    pares.append(par)
+            except Exception:
+                pass  # o erro aparece na própria consulta
+        try:
+            self.resultados(sorted(set(pares)))
+        except Exception:
+            pass  # um cálculo do lote falhou: cada consulta refaz o seu e relata o erro
+        respostas = []
+        for c in consultas:
+            try:
+                respostas.append({'resultado': self.consultar(c)})
+            except Exception as e:
+                respostas.append({'erro': str(e)})
+        return respostas
+
+
+    def estado(self):
+        e = self.memo.estado()
+        e.update({'anos': self.anos, 'carregados': list(self.bases), 'calculos': self.calculos,
+            'pendentes': len(self._pendentes), 'armazem': self.armazem.destino if self.armazem else None})
+        return e
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    """Traduz GET/POST para Servico.consultar / lote"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1  # cabeçalhos e corpo num único envio
+    servico = None
+
+
+    def log_message(self, *args):
+        pass
+
+
+    def _responder(self, codigo, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+    def _atender(self, rota, corpo):
+        try:
+            if rota == 'anos':
+                resultado = self.servico.anos
+            elif rota == 'estado':
+                resultado = self.servico.estado()
+            elif rota == 'lote':
+                resultado = self.servico.lote(corpo.get('consultas', []))
+            elif rota in ROTAS:
+                resultado = self.servico.consultar(dict(corpo, rota=rota))
+            else:
+                return self._responder(404, {'erro': '[!!] Rota desconhecida: /' + rota})
+            self._responder(200, resultado)
+        except Exception as e:
+            self._responder(400, {'erro': str(e)})
+
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self._atender(url.path.strip('/'), dict(parse_qsl(url.query)))
+
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        try:
+            corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+        except ValueError:
+            return self._responder(400, {'erro': '[!!] Corpo não é JSON'})
+        self._atender(url.path.strip('/'), corpo)
+
+
+def servidor(servico, host='127.0.0.1', porta=8765):
+    """ThreadingHTTPServer ligado ao serviço (porta 0 escolhe uma livre)"""
+    manipulador = type('Manipulador', (_Manipulador,), {'servico': servico})
+    httpd = ThreadingHTTPServer((host, porta), manipulador)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def servir(servico, host='127.0.0.1', porta=8765):
+    """Atende até Ctrl+C"""
+    httpd = servidor(servico, host, porta)
+    print('[>>] Serviço em http://' + host + ':' + str(httpd.server_address[1]))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serviço HTTP/JSON da mip')
+    parser.add_argument('--anos', nargs='+', default=['2015'])
+    parser.add_argument('--path', default='')
+    parser.add_argument('--armazem', help='diretório de um ArmazemDisco')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--limite', type=float, default=256, help='MB da memória de resultados')
+    args = parser.parse_args()
+    with Servico(args.anos, args.path, args.armazem, args.limite) as s:
+        servir(s, args.host, args.porta)
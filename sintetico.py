@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# coding=utf8
+"""
+ +---------------------+
+ |  S I N T E T I C O  |
+ +---------------------+
+
+Dados sintéticos no mesmo layout de arquivos do bucket, para rodar offline
+
+import sintetico, matriz
+sintetico.gerar('/tmp/mip/', anos=[2015], n_utps=500)
+n = matriz.Nereus(2015, path='/tmp/mip/')
+
+python sintetico.py /tmp/mip/ 500      # 2010 a 2018, 500 UTPs
+
+Gera Nereus/mip68brANO.csv (93 x 77), Regional/qlANO.csv, Regional/popANO.csv,
+Regional/utps.csv, Chaves/atividadesMip68.json e Chaves/compatibiliza68a03.json.
+A economia é uma tabela de Leontief consistente (X = Z.1 + f, colunas de A
+com soma < 1); valores não têm significado econômico.
+"""
+
+__version__ = "v.1.5 | 2023."
+
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def gerar(path, anos=(2015,), n_utps=20, seed=0):
+    """Grava os arquivos sintéticos em path (com / no final, como nos carregadores)
+
+    anos: list => anos das mips, qls e pops
+    n_utps: int => número de UTPs (códigos '101', '102', ...)
+    seed: int => semente; mesmos argumentos geram os mesmos arquivos
+    """
+    rng = np.random.default_rng(seed)
+    n = 68
+    cods = ['%04d' % (100 + 10 * i) for i in range(n - 1)]
+    cods[0] = '0191'
+    cods.append('9700')  # serviços domésticos: sem insumos nem compradores
+    labels = ['Atividade ' + c for c in cods]
+    for d in ['Nereus', 'Regional', 'Chaves']:
+        os.makedirs(os.path.join(path, d), exist_ok=True)
+    with open(os.path.join(path, 'Chaves/atividadesMip68.json'), 'w') as f:
+        json.dump({'codigos_atividades_68': cods, 'labels_atividades_68': labels}, f)
+    with open(os.path.join(path, 'Chaves/compatibiliza68a03.json'), 'w') as f:
+        json.dump({'agricultura': cods[0:5], 'indústria': cods[5:30], 'serviços': cods[30:]}, f)
+    utps = [str(101 + i) for i in range(n_utps)]
+    pd.DataFrame({'utps': utps, 'Nome': ['UTP ' + u for u in utps], 'UF': ['SP'] * n_utps}).to_csv(
+        os.path.join(path, 'Regional/utps.csv'), index=False)
+
+    # linhas e colunas nas posições lidas por matriz.Nereus
+    linhas = cods + ['total', 'importado', 'imp import'] + ['imp%d' % i for i in range(6)] + \
+        ['total ci', 'remunerações', 'salários', 'c1', 'c2', 'c3', 'c4',
+         'excedente operacional bruto e rendimento misto bruto', 'eob', 'rmb', 'vab0',
+         'outros impostos sobre a produção', 'outros subsídios à produção',
+         'valor adicionado bruto (PIB)', 'valor da produção', 'fator trabalho (ocupações)']
+    colunas = cods + ['total', 'exportação de bens e serviços', 'governo', 'isfl', 'famílias',
+        'formação bruta de capital fixo', 'variação de estoque', 'demanda final', 'demanda total']
+    partes = np.array([0.10, 0.15, 0.02, 0.55, 0.15, 0.03])  # exporta, governo, ..., estoque
+
+    for ano in anos:
+        # A esparsa com colunas somando 0.2 a 0.5 => X = (I - A)^-1 f
+        A = rng.uniform(0, 1, (n, n)) * (rng.uniform(0, 1, (n, n)) < 0.4)
+        A[n-1, :] = 0
+        A = A / A.sum(axis=0) * rng.uniform(0.2, 0.5, n)
+        A[:, n-1] = 0
+        f = rng.uniform(100, 1000, n)
+        X = np.linalg.solve(np.eye(n) - A, f)
+        Z = A * X
+        R = X - Z.sum(axis=0)  # resto do valor da produção após o consumo intermediário
+
+        M = np.zeros((93, 77))
+        M[0:68, 0:68] = Z
+        M[68, 0:68] = Z.sum(axis=0)
+        M[69, 0:68] = 0.10 * R                  # importado
+        M[70, 0:68] = 0.01 * R                  # impostos de importação
+        M[71:77, 0:68] = 0.01 * R               # impostos
+        M[77, 0:68] = M[0:77, 0:68].sum(axis=0) - M[68, 0:68]
+        M[79, 0:68] = 0.35 * R                  # salários
+        M[80:84, 0:68] = 0.025 * R              # contribuições
+        M[78, 0:68] = M[79:84, 0:68].sum(axis=0)
+        M[84, 0:68] = 0.35 * R                  # excedente
+        M[88, 0:68] = 0.04 * R
+        M[89, 0:68] = -0.01 * R
+        M[90, 0:68] = 0.73 * R
+        M[91, 0:68] = X
+        M[92, 0:68] = X * rng.uniform(0.005, 0.05, n)  # ocupações
+        M[0:68, 68] = Z.sum(axis=1)
+        M[0:68, 69:75] = np.outer(f, partes)
+        M[n-1, 69:75] = 0
+        M[n-1, 72] = f[n-1]                     # 9700 só vende às famílias
+        M[0:68, 75] = f
+        M[0:68, 76] = X
+        M[69, 69:75] = 0.05 * f.sum() * partes
+        M[70, 69:75] = 0.005 * f.sum() * partes
+        M[71:77, 69:75] = 0.002 * f.sum() * partes
+        pd.DataFrame(M, index=linhas, columns=colunas).to_csv(
+            os.path.join(path, 'Nereus/mip68br%d.csv' % ano))
+
+        qls = pd.DataFrame(rng.dirichlet(np.ones(n_utps), size=n).T, columns=cods)
+        qls.insert(0, 'utps', utps)
+        qls.to_csv(os.path.join(path, 'Regional/ql%d.csv' % ano), index=False)
+        p = rng.dirichlet(np.ones(n_utps))
+        va = 0.73 * R.sum() * 1000
+        pd.DataFrame({'utps': utps, 'propT': p, 'vabM': p * va, 'vabMagro': p * va * 0.05,
+            'vabMind': p * va * 0.3, 'vabMserv': p * va * 0.65}).to_csv(
+            os.path.join(path, 'Regional/pop%d.csv' % ano), index=False)
+    return path
+
+
+if __name__ == '__main__':
+    gerar(sys.argv[1], anos=range(2010, 2019), n_utps=int(sys.argv[2]) if len(sys.argv) > 2 else 20)
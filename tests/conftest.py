@@ -0,0 +1,35 @@
+# coding=utf8
+"""Dados sintéticos (ver sintetico.py) compartilhados pelos testes"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matriz  # noqa: E402
+import sintetico  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def path(tmp_path_factory):
+    p = str(tmp_path_factory.mktemp('dados')) + os.sep
+    sintetico.gerar(p, anos=[2015], n_utps=20)
+    yield p
+    matriz.invalidar_referencias(path=p)
+
+
+@pytest.fixture(scope='session')
+def nereus(path):
+    return matriz.Nereus(2015, path=path)
+
+
+@pytest.fixture
+def base(nereus):
+    return nereus.extrair_mipita()
+
+
+@pytest.fixture(scope='session')
+def utps(nereus):
+    return list(nereus.extrair_mipita().qls.index)
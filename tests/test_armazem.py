@@ -0,0 +1,55 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import armazem
+
+
+def test_quantizar_limite_de_erro():
+    x = np.random.default_rng(0).normal(size=(5, 28, 69)) * np.array([1, 1e3, 1e-3, 10, 0.5])[:, None, None]
+    x[0, 3, 4] = np.nan
+    q, escala = armazem.quantizar(x)
+    y = armazem.desquantizar(q, escala)
+    assert np.isnan(y[0, 3, 4]) and np.isnan(y).sum() == 1
+    erro = np.nanmax(np.abs(y - x), axis=(1, 2))
+    assert (erro <= np.nanmax(np.abs(x), axis=(1, 2)) / 65534 * (1 + 1e-12)).all()
+
+
+@pytest.mark.parametrize('precisao', armazem.PRECISOES)
+def test_compacto_dentro_do_limite(base, utps, precisao):
+    a = armazem.ArmazemCompacto(utps[0:6], precisao=precisao).preencher(base, bloco=4)
+    lote = base.regionalizar_lote(utps[0:6])
+    assert a.preenchido.all()
+    for k, u in enumerate(utps[0:6]):
+        for nome in armazem.FORMAS:
+            exato = getattr(lote, nome)[k]
+            valor = a.valor(u, nome)
+            limite = a.limite_erro(u, nome)
+            np.testing.assert_array_equal(np.isnan(valor), np.isnan(exato))
+            assert np.nanmax(np.abs(valor - exato)) <= limite * (1 + 1e-9) + 1e-300
+    assert a.visao(utps[0], 'L').base is not None  # view, sem cópia
+
+
+def test_disco_igual_regionalizar(tmp_path, nereus, utps):
+    d = armazem.construir(str(tmp_path / 'armazem'), nereus, bloco=7, dtype='float64')
+    assert d.preenchido.all() and d.utps == utps
+    m = nereus.extrair_mipita()
+    m.regionalizar(utps[9])
+    np.testing.assert_allclose(d.L(2015, utps[9]), m.L.values, rtol=1e-12)
+    np.testing.assert_allclose(d.Lf(2015, utps[9]), m.Lf.values, rtol=1e-12)
+    np.testing.assert_allclose(d.multiplicadores(2015, utps[9]), m.multiplicadores.values, rtol=1e-12)
+    assert d.multiplicadores(2015, utps[9], frame=True).shape == (28, 69)
+    assert isinstance(d.arrays['L'], np.memmap)
+    with pytest.raises(Exception, match=r'\[!!\]'):
+        d.L(2015, '999')
+
+
+def test_disco_serie(tmp_path, path, base, utps):
+    d = armazem.ArmazemDisco.criar(str(tmp_path / 'armazem'), [2015], utps=utps[:4], path=path)
+    d.gravar(2015, base.regionalizar_lote(utps[:2]))
+    np.testing.assert_array_equal(d.serie(utps[1], 'L')[0], d.L(2015, utps[1]))
+    for utp, erro in [('999', 'não está no armazém'), (utps[3], 'ainda não foi calculado')]:
+        with pytest.raises(Exception, match=r'\[!!\] .*' + erro):
+            d.serie(utp)
+    with pytest.raises(Exception, match=r'\[!!\]'):
+        d.serie(utps[0], 'A')
@@ -0,0 +1,20 @@
+# coding=utf8
+import pytest
+
+CHAVES = ['PIB', 'agricultura', 'indústria', 'serviços', 'erro PIB', 'erro agricultura',
+    'erro indústria', 'erro serviços', 'partagro', 'partind', 'partserv']
+
+
+@pytest.mark.parametrize('exceto', [False, True])
+def test_calibrar_igual_avaliar(nereus, utps, exceto):
+    base = nereus.extrair_mipita()
+    areas = utps[0:4] + [utps[4:7]]
+    tabela = base.calibrar(areas, exceto=exceto)
+    assert list(tabela['desvio máx']) == sorted(tabela['desvio máx'], reverse=True)
+    for area in areas:
+        m = nereus.extrair_mipita()
+        m.regionalizar(area, exceto=exceto)
+        rotulo = ('exceto ' if exceto else '') + (' '.join(area) if isinstance(area, list) else area)
+        linha = tabela.loc[rotulo]
+        for chave in CHAVES:
+            assert linha[chave] == pytest.approx(m.ajuste[chave], rel=1e-9, abs=1e-6), chave
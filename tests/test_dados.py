@@ -0,0 +1,98 @@
+# coding=utf8
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import dados
+
+
+class _Resposta:
+    def __init__(self, conteudo):
+        self.content = conteudo
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, tamanho):
+        for i in range(0, len(self.content), 7):
+            yield self.content[i:i+7]
+
+
+class _Sessao:
+    """Sessão falsa: o conteúdo de cada url é derivado do próprio nome"""
+    def get(self, url, stream=True):
+        return _Resposta(url.encode('utf8') * 50)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    anterior = dict(dados.CACHE)
+    dados.configurar_cache(diretorio=str(tmp_path), limite=64, offline=False, ativo=True)
+    monkeypatch.setattr(dados, 'sessao_http', lambda: _Sessao())
+    yield tmp_path
+    dados.CACHE.update(anterior)
+
+
+def test_baixar_concorrente(cache):
+    recursos = ['arquivo%02d.csv' % i for i in range(40)]
+    barreira = threading.Barrier(len(recursos))
+
+    def baixar(res):
+        barreira.wait()  # todas as threads gravam no cache ao mesmo tempo
+        return dados.baixar(res)
+
+    with ThreadPoolExecutor(len(recursos)) as pool:
+        resultados = list(pool.map(baixar, recursos))
+    for res, (conteudo, origem) in zip(recursos, resultados):
+        assert conteudo == (dados.URL + res).encode('utf8') * 50
+    with open(os.path.join(str(cache), 'indice.json')) as f:
+        indice = json.load(f)
+    objetos = os.listdir(os.path.join(str(cache), 'objetos'))
+    assert len(indice) == 40
+    assert sorted(indice.values()) == sorted(objetos)  # sem órfãos nem temporários
+    for res in recursos:
+        assert dados.baixar(res)[1] == 'cc'
+
+
+def test_gravar_temporarios_unicos(tmp_path):
+    caminho = str(tmp_path / 'indice.json')
+    erros = []
+
+    def gravar(i):
+        try:
+            for _ in range(50):
+                dados._gravar(caminho, json.dumps({'i': i}), 'w')
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=gravar, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros
+    assert os.listdir(str(tmp_path)) == ['indice.json']
+    with open(caminho) as f:
+        assert json.load(f)['i'] in range(8)
+
+
+def test_descarte_respeita_limite(cache):
+    dados.configurar_cache(limite=0.01)  # ~10 KB: cabe só parte dos objetos
+    for i in range(10):
+        dados.baixar('grande%02d.csv' % i)
+    estado = dados.estado_cache()
+    assert estado['bytes'] <= dados.CACHE['limite'] or estado['arquivos'] == 1
+    with open(os.path.join(str(cache), 'indice.json')) as f:
+        assert sorted(json.load(f).values()) == sorted(os.listdir(os.path.join(str(cache), 'objetos')))
+
+
+def test_referencias_compartilhadas(path, nereus):
+    a = nereus.extrair_mipita()
+    b = nereus.extrair_mipita()
+    assert a.qls is b.qls and a.pop is b.pop and a.utp is b.utp
+    with ThreadPoolExecutor(8) as pool:
+        tabelas = list(pool.map(lambda _: dados.carregar_referencia('qls', 2015, path), range(16)))
+    assert all(t is a.qls for t in tabelas)
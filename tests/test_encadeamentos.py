@@ -0,0 +1,28 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import matriz
+
+
+@pytest.mark.parametrize('tipo', ['fornecedores', 'compradores'])
+def test_top_q_igual_ordenacao_completa(nereus, tipo):
+    L = nereus.L.values
+    D = L - np.identity(68)
+    if tipo == 'fornecedores':
+        D = D.T
+    pos, val = matriz.encadeamentos(L, None, 5, tipo)
+    esperado = -np.sort(-D, axis=1)[:, 0:5]
+    np.testing.assert_allclose(val, esperado, rtol=0, atol=0)
+    np.testing.assert_array_equal(np.take_along_axis(D, pos, axis=1), val)
+
+
+def test_pilha_igual_matriz_a_matriz(base, utps):
+    lote = base.regionalizar_lote(utps[0:4])
+    pos, val = matriz.encadeamentos(lote.L, [0, 10, 67], 4, 'compradores')
+    for k in range(4):
+        p, v = matriz.encadeamentos(lote.L[k], [0, 10, 67], 4, 'compradores')
+        np.testing.assert_array_equal(pos[k], p)
+        np.testing.assert_array_equal(val[k], v)
+    solver = matriz.encadeamentos(lote.solver, [0, 10, 67], 4, 'compradores')
+    np.testing.assert_array_equal(solver[1], val)
@@ -0,0 +1,33 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import exportar
+
+
+@pytest.mark.parametrize('formato', ['npz', 'csv'])
+def test_exportar_lote_ida_e_volta(tmp_path, base, utps, formato):
+    destino = str(tmp_path / formato)
+    exportar.exportar_lote(base, utps[:5], destino, formato=formato, bloco=2)
+    lote = base.regionalizar_lote(utps[:5])
+    esperados = utps[:5]  # uma UTP por recorte
+    if formato == 'npz':
+        recortes, L, linhas, colunas = exportar.ler(destino, 'L', 2015)
+        assert list(recortes) == esperados
+        np.testing.assert_allclose(L, lote.L)
+    else:
+        tabela = exportar.ler(destino, 'L', 2015)
+        assert sorted(tabela['recorte'].unique()) == sorted(esperados)
+        k = esperados.index(utps[0])
+        valores = tabela[tabela['recorte'] == utps[0]][base.codigos].values
+        np.testing.assert_allclose(valores, lote.L[k])
+
+
+@pytest.mark.parametrize('formato', ['npz', 'csv'])
+def test_ler_selecao_vazia(tmp_path, base, utps, formato):
+    destino = str(tmp_path / formato)
+    exportar.exportar_lote(base, utps[:2], destino, formato=formato)
+    with pytest.raises(Exception, match=r'\[!!\]'):
+        exportar.ler(destino, 'L', 1999)
+    with pytest.raises(Exception, match=r'\[!!\]'):
+        exportar.ler(destino, 'inexistente', 2015)
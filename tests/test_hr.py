@@ -0,0 +1,32 @@
+# coding=utf8
+import numpy as np
+
+import matriz
+
+
+def test_hr_lote_igual_indice_hr(nereus, base, utps):
+    lote = base.regionalizar_lote(utps[0:5])
+    T, F, chave = matriz.indice_HR_lote(lote.L)           # arrays densos
+    Ts, Fs, chaves = matriz.indice_HR_lote(lote.solver)   # dois solves, sem L
+    np.testing.assert_allclose(Ts, T, rtol=1e-10)
+    np.testing.assert_allclose(Fs, F, rtol=1e-10)
+    np.testing.assert_array_equal(chaves, chave)
+    for k, u in enumerate(utps[0:5]):
+        m = nereus.extrair_mipita()
+        m.regionalizar(u)
+        np.testing.assert_allclose(m.HRtras.values, T[k], rtol=1e-10)
+        np.testing.assert_allclose(m.HRfrente.values, F[k], rtol=1e-10)
+    n = len(lote.setores)
+    L = lote.L[0]
+    mL = L.sum() / n**2
+    np.testing.assert_allclose(T[0], (L.sum(axis=0) / n) / mL, rtol=1e-12)
+    np.testing.assert_allclose(F[0], (L.sum(axis=1) / n) / mL, rtol=1e-12)
+
+
+def test_areas_chave(base, utps):
+    lote = base.regionalizar_lote(utps[0:5])
+    setor = lote.setores[int(np.argmax(lote.chave.sum(axis=0)))]
+    j = lote.setores.index(setor)
+    assert lote.areas_chave(setor) == [r for k, r in enumerate(lote.recortes()) if lote.chave[k, j]]
+    quadro = lote.quadro_chave()
+    assert quadro.shape[0] == 68
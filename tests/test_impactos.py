@@ -0,0 +1,29 @@
+# coding=utf8
+import numpy as np
+
+import matriz
+
+
+def _linha(multi, nome, variavel):
+    return multi.loc[nome + ' ' + variavel].values
+
+
+def test_choque_unitario_reproduz_multiplicadores(nereus):
+    efeito = nereus.impactos(np.identity(68))  # 68 cenários x 3 x 4 x 68
+    multi = nereus.multiplicadores
+    for i, v in enumerate(matriz.VARIAVEIS):
+        rotulo = 'produto' if v == 'produto' else v
+        dn = efeito[:, 0:2, i, :].sum(axis=(1, 2))
+        total = efeito[:, :, i, :].sum(axis=(1, 2))
+        np.testing.assert_allclose(dn, _linha(multi, 'eDN', rotulo)[0:68], rtol=1e-10)
+        np.testing.assert_allclose(total[0:67], _linha(multi, 'eDNZ+', rotulo)[0:67], rtol=1e-10)
+
+
+def test_impactos_lineares_e_regionais(base, utps):
+    base.regionalizar(utps[2])
+    rng = np.random.default_rng(0)
+    f = rng.random((3, 69))
+    efeito = base.impactos(f)
+    soma = base.impactos(f[0:1] + f[1:2])[0]
+    np.testing.assert_allclose(soma, efeito[0] + efeito[1], rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(efeito[:, 0, 0, :], f[:, 0:68], rtol=1e-14)  # direto do produto = choque
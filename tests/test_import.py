@@ -0,0 +1,28 @@
+# coding=utf8
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('modulo', ['matriz', 'painel', 'paralelo'])
+def test_import_nao_carrega_dependencias_pesadas(modulo):
+    codigo = ("import sys, " + modulo + "; "
+        "print(','.join(m for m in ('pandas', 'requests', 'scipy') if m in sys.modules))")
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == ''
+
+
+# folga sobre checar_import.ORCAMENTO_MS para o ruído de máquinas de CI compartilhadas;
+# uma regressão real (pandas ou scipy no import) custa centenas de ms
+FOLGA = 2
+
+
+def test_import_dentro_do_orcamento():
+    import checar_import
+    r = checar_import.medir(5)  # cada medição num interpretador novo
+    assert r['carregados'] == []
+    assert r['matriz'] <= FOLGA * checar_import.ORCAMENTO_MS, r
@@ -0,0 +1,58 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import matriz
+
+interregional = pytest.importorskip('interregional')
+pytest.importorskip('scipy')
+
+
+@pytest.fixture
+def ir(base, utps):
+    return interregional.Interregional(base, [utps[0], utps[1], utps[2:5]])
+
+
+def _densa(ir):
+    """Inversa densa de Chenery-Moses e o operador f -> demanda efetiva"""
+    k, n = ir.k, 68
+    Abig = np.zeros((k * n, k * n))
+    G = np.zeros((k * n, k * n))
+    for r in range(k):
+        for s in range(k):
+            bloco = slice(r * n, (r + 1) * n), slice(s * n, (s + 1) * n)
+            if r == s:
+                Abig[bloco] = ir.p[r][:, None] * ir.A[r]
+                G[bloco] = np.diag(ir.p[r])
+            Abig[bloco] += ir.t[r][:, None] * (1 - ir.p[s])[:, None] * ir.A[s]
+            G[bloco] += np.diag(ir.t[r] * (1 - ir.p[s]))
+    return np.linalg.inv(np.identity(k * n) - Abig), G
+
+
+def test_C_reproduz_valor_adicionado(ir):
+    va = ir.mipreg[:, [72, 73, 74], 0:68].sum(axis=1)
+    for v, total in [(0, ir.X), (1, va), (2, ir.mipreg[:, 72, 0:68]), (3, ir.empregos)]:
+        np.testing.assert_allclose((ir.C[:, v, :] * ir.X).sum(axis=1), total.sum(axis=1), rtol=1e-12)
+
+
+def test_solve_igual_inversa_densa(ir):
+    Linv, G = _densa(ir)
+    f = np.random.default_rng(0).random((ir.k, 68))
+    np.testing.assert_allclose(ir.solve(f).ravel(), Linv @ G @ f.ravel(), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize('variavel', matriz.VARIAVEIS)
+def test_transbordamento_igual_denso(ir, variavel):
+    Linv, G = _densa(ir)
+    v = matriz.VARIAVEIS.index(variavel)
+    efeito = (Linv @ G).reshape(ir.k, 68, ir.k * 68) * ir.C[:, v, :, None]
+    esperado = efeito.sum(axis=1).reshape(ir.k, ir.k, 68)
+    np.testing.assert_allclose(ir.transbordamento(variavel), esperado, rtol=1e-9, atol=1e-12)
+    multi = ir.multiplicadores(variavel)
+    np.testing.assert_allclose(multi['total'].values, esperado.sum(axis=0).ravel(), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('regioes', [[[0, 1], [1]], [[0, 0], [2]]])
+def test_utp_repetida(base, utps, regioes):
+    with pytest.raises(Exception, match='mais de uma vez'):
+        interregional.Interregional(base, [[utps[i] for i in r] for r in regioes])
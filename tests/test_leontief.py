@@ -0,0 +1,65 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import matriz
+
+
+def _A(n=68, seed=0, k=None):
+    rng = np.random.default_rng(seed)
+    forma = (n, n) if k is None else (k, n, n)
+    A = rng.random(forma)
+    return 0.8 * A / A.sum(axis=-2, keepdims=True)  # colunas com soma 0.8
+
+
+def test_solver_igual_inversa():
+    A = _A()
+    L = np.linalg.inv(np.identity(68) - A)
+    s = matriz.LeontiefSolver(A)
+    f = np.random.default_rng(1).random((68, 3))
+    np.testing.assert_allclose(s.L, L, rtol=1e-10)
+    np.testing.assert_allclose(s.solve(f), L @ f, rtol=1e-10)
+    np.testing.assert_allclose(s.solve_transposed(f[:, 0]), f[:, 0] @ L, rtol=1e-10)
+
+
+def test_solver_pilha():
+    A = _A(k=4)
+    L = np.linalg.inv(np.identity(68) - A)
+    s = matriz.LeontiefSolver(A)
+    um = np.ones((4, 68))
+    np.testing.assert_allclose(s.L, L, rtol=1e-10)
+    np.testing.assert_allclose(s.solve(um), np.einsum('kij,kj->ki', L, um), rtol=1e-10)
+
+
+def test_nereus_L_igual_inversa(nereus):
+    L = np.linalg.inv(np.identity(68) - nereus.A.values)
+    np.testing.assert_allclose(nereus.L.values, L, rtol=1e-10, atol=1e-14)
+
+
+@pytest.mark.parametrize('metodo', ['serie', 'gmres'])
+def test_iterativo_igual_lu(metodo):
+    if metodo == 'gmres':
+        pytest.importorskip('scipy')
+    A = _A(seed=2)
+    exato = matriz.LeontiefSolver(A)
+    aprox = matriz.LeontiefIterativo(A, metodo=metodo, tol=1e-10)
+    f = np.random.default_rng(3).random((68, 2))
+    np.testing.assert_allclose(aprox.solve(f), exato.solve(f), rtol=1e-8)
+    assert aprox.diagnostico['convergiu'] and aprox.diagnostico['metodo'] == metodo
+    np.testing.assert_allclose(aprox.solve_transposed(f[:, 0]), exato.solve_transposed(f[:, 0]), rtol=1e-8)
+
+
+def test_iterativo_pilha_e_diagnostico():
+    A = _A(k=3, seed=4)
+    aprox = matriz.LeontiefIterativo(A, tol=1e-10)
+    np.testing.assert_allclose(aprox.solve(np.ones((3, 68))), matriz.LeontiefSolver(A).solve(np.ones((3, 68))),
+        rtol=1e-8)
+    curto = matriz.LeontiefIterativo(A, tol=1e-12, max_iter=3)
+    curto.solve(np.ones((3, 68)))
+    assert not curto.diagnostico['convergiu'] and curto.diagnostico['iteracoes'] == 3
+
+
+def test_multiplicadores_aproximados(nereus):
+    exatos = nereus.multiplicadores.values
+    aprox = nereus.multiplicadores_modo('serie', tol=1e-10).values
+    np.testing.assert_allclose(aprox, exatos, rtol=1e-7)
@@ -0,0 +1,45 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+
+AREAS = [0, 5, [1, 2, 3]]
+
+
+def _areas(utps):
+    return [[utps[i] for i in a] if isinstance(a, list) else utps[a] for a in AREAS]
+
+
+@pytest.mark.parametrize('exceto', [False, True])
+def test_lote_igual_regionalizar(nereus, utps, exceto):
+    base = nereus.extrair_mipita()
+    areas = _areas(utps)
+    lote = base.regionalizar_lote(areas, exceto=exceto)
+    for k, area in enumerate(areas):
+        m = nereus.extrair_mipita()
+        m.regionalizar(area, exceto=exceto)
+        np.testing.assert_allclose(lote.mipreg[k], m.mipreg.values, rtol=1e-12, atol=1e-9)
+        np.testing.assert_allclose(lote.A[k], m.A.values, rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(lote.L[k], m.L.values, rtol=1e-10)
+        np.testing.assert_allclose(lote.multiplicadores[k], m.multiplicadores.values, rtol=1e-10)
+        np.testing.assert_allclose(lote.HRtras[k], m.HRtras.values, rtol=1e-10)
+        assert lote.chave[k].tolist() == [c for s, c in m.chave]
+
+
+def test_extrair_igual_regionalizar(nereus, utps):
+    lote = nereus.extrair_mipita().regionalizar_lote([utps[4]])
+    e = lote.extrair(0)
+    m = nereus.extrair_mipita()
+    m.regionalizar(utps[4])
+    np.testing.assert_allclose(e.multiplicadores.values, m.multiplicadores.values, rtol=1e-10)
+    assert e.ajuste['PIB'] == pytest.approx(m.ajuste['PIB'], rel=1e-12)
+
+
+def test_codigo_repetido_igual_regionalizar(nereus, utps):
+    area = [utps[3], utps[3], utps[7]]
+    lote = nereus.extrair_mipita().regionalizar_lote([area, [utps[3], utps[7]]])
+    m = nereus.extrair_mipita()
+    m.regionalizar(area)
+    np.testing.assert_allclose(lote.mipreg[0], m.mipreg.values, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(lote.multiplicadores[0], m.multiplicadores.values, rtol=1e-10)
+    assert not np.allclose(lote.mipreg[0], lote.mipreg[1])
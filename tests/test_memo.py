@@ -0,0 +1,55 @@
+# coding=utf8
+import numpy as np
+import pytest
+
+import matriz
+
+
+@pytest.fixture
+def memo():
+    estado = (matriz.MEMO.limite, matriz.MEMO.ativo)
+    matriz.MEMO.limpar()
+    matriz.configurar_memo(ativo=True)
+    yield matriz.MEMO
+    matriz.MEMO.limite, matriz.MEMO.ativo = estado
+    matriz.MEMO.limpar()
+
+
+def test_codigo_repetido_nao_colide(memo, nereus):
+    um = nereus.extrair_mipita()
+    um.regionalizar(['105'])
+    dois = nereus.extrair_mipita()
+    dois.regionalizar(['105', '105'])
+    np.testing.assert_allclose(dois.qL.values, 2 * um.qL.values)
+    assert memo.estado()['itens'] == 2
+
+
+def test_ordem_das_areas_compartilha_resultado(memo, nereus):
+    a = nereus.extrair_mipita()
+    a.regionalizar(['105', '106'])
+    acertos = memo.acertos
+    b = nereus.extrair_mipita()
+    b.regionalizar(['106', '105'])
+    assert b.multiplicadores is a.multiplicadores
+    assert memo.acertos == acertos + 1
+
+
+def test_memo_igual_ao_calculo(memo, nereus):
+    a = nereus.extrair_mipita()
+    a.regionalizar('107')
+    b = nereus.extrair_mipita()
+    b.regionalizar('107')
+    matriz.configurar_memo(ativo=False)
+    c = nereus.extrair_mipita()
+    c.regionalizar('107')
+    np.testing.assert_array_equal(b.multiplicadores.values, c.multiplicadores.values)
+
+
+def test_reduzir_limite_descarta_lru(memo, nereus):
+    m = nereus.extrair_mipita()
+    for u in ['101', '102', '103']:
+        m.regionalizar(u)
+    tamanho = memo.bytes // 3
+    matriz.configurar_memo(limite=2 * tamanho / 2**20 + 1e-6)
+    assert memo.estado()['itens'] == 2
+    assert list(memo.itens)[0][1] == ('102',)
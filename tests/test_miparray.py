@@ -0,0 +1,24 @@
+# coding=utf8
+import numpy as np
+import pandas as pd
+
+import matriz
+
+
+def test_frame_ida_e_volta(nereus):
+    nucleo = nereus.nucleo
+    df = nucleo.to_frame()
+    assert df.shape == (77, 76)
+    assert list(df.index) == nereus.codigos + matriz.INSUMOS
+    assert list(df.columns) == nereus.codigos + matriz.PRODUTOS
+    assert np.shares_memory(df.values, nucleo.dados)
+    embaralhado = df.sample(frac=1, random_state=0)[list(reversed(df.columns))]
+    np.testing.assert_array_equal(matriz.MipArray.de_frame(embaralhado, nereus.codigos).dados, nucleo.dados)
+
+
+def test_totais_da_mipita(nereus, base, utps):
+    base.regionalizar(utps[0])
+    for m in (nereus.nucleo.dados, base.nucleo_reg.dados):
+        np.testing.assert_allclose(m[76, 0:68], m[0:76, 0:68].sum(axis=0), rtol=1e-12)
+        np.testing.assert_allclose(m[:, 75], m[:, 0:75].sum(axis=1), rtol=1e-12)
+    pd.testing.assert_frame_equal(base.mipreg, base.nucleo_reg.to_frame())
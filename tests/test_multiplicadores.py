@@ -0,0 +1,18 @@
+# coding=utf8
+import numpy as np
+import pandas as pd
+
+import matriz
+
+
+def _densas(n):
+    inv = lambda A: pd.DataFrame(np.linalg.inv(np.identity(68) - A.values), index=A.index, columns=A.columns)
+    return inv(n.A), inv(n.Af)
+
+
+def test_multiplicadores_solver_igual_inversa_densa(nereus):
+    L, Lf = _densas(nereus)
+    denso = matriz.multiplicadores(nereus.nucleo, nereus.empregos, L, Lf)
+    pd.testing.assert_frame_equal(nereus.multiplicadores, denso, rtol=1e-10)
+    np.testing.assert_allclose(denso.loc['eDN produto'].values[0:68], L.values.sum(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(denso.loc['eD produto'].values[0:68], 1.0)
@@ -0,0 +1,46 @@
+# coding=utf8
+import numpy as np
+import pandas as pd
+
+import matriz
+import sintetico
+
+
+def test_save_load_ida_e_volta(tmp_path, nereus, utps):
+    destino = str(tmp_path / 'n2015')
+    nereus.save(destino)
+    n = matriz.Nereus.load(destino)
+    for nome in ['A', 'Af', 'L', 'Lf', 'multiplicadores']:
+        pd.testing.assert_frame_equal(getattr(n, nome), getattr(nereus, nome), check_exact=True)
+    assert n.chave == nereus.chave
+    a = n.extrair_mipita()
+    a.regionalizar(utps[1])
+    b = nereus.extrair_mipita()
+    b.regionalizar(utps[1])
+    np.testing.assert_allclose(a.multiplicadores.values, b.multiplicadores.values, rtol=1e-12)
+
+
+def test_save_load_preserva_tipos(tmp_path):
+    origem = str(tmp_path / 'dados') + '/'
+    sintetico.gerar(origem, anos=[2015], n_utps=5)
+    arquivo = origem + 'Regional/pop2015.csv'
+    pop = pd.read_csv(arquivo, dtype={'utps': str})
+    pop['habitantes'] = np.arange(len(pop)) * 1000 + 7  # coluna int entre as float
+    pop.to_csv(arquivo, index=False)
+    try:
+        matriz.Nereus(2015, path=origem).save(str(tmp_path / 'n2015'))
+        antes = {nome: matriz.carregar_referencia(nome, 2015, origem).dtypes for nome in ('qls', 'pop', 'utp')}
+        matriz.invalidar_referencias(path=origem)
+        matriz.Nereus.load(str(tmp_path / 'n2015'))
+        for nome, dtypes in antes.items():
+            pd.testing.assert_series_equal(matriz.carregar_referencia(nome, 2015, origem).dtypes, dtypes)
+        assert matriz.carregar_referencia('pop', 2015, origem)['habitantes'].tolist() == pop['habitantes'].tolist()
+    finally:
+        matriz.invalidar_referencias(path=origem)
+
+
+def test_preguicoso_igual_imediato(path, nereus):
+    n = matriz.Nereus(2015, path=path, eager=False)
+    assert 'L' not in n.__dict__ and 'multiplicadores' not in n.__dict__
+    pd.testing.assert_frame_equal(n.multiplicadores, nereus.multiplicadores, check_exact=True)
+    pd.testing.assert_series_equal(n.HRtras, nereus.HRtras, check_exact=True)
@@ -0,0 +1,54 @@
+# coding=utf8
+import json
+import os
+
+import numpy as np
+import pytest
+
+import dados
+import matriz
+import sintetico
+
+painel = pytest.importorskip('painel')
+
+
+class _Arquivos:
+    """Sessão falsa que serve do disco os arquivos sintéticos do bucket"""
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def get(self, url, stream=True):
+        with open(os.path.join(self.raiz, url[len(dados.URL):]), 'rb') as f:
+            conteudo = f.read()
+
+        class Resposta:
+            content = conteudo
+
+            def raise_for_status(self):
+                pass
+
+            def iter_content(self, tamanho):
+                for i in range(0, len(conteudo), tamanho):
+                    yield conteudo[i:i+tamanho]
+        return Resposta()
+
+
+def test_painel_paralelo_pelo_cache(tmp_path, monkeypatch):
+    raiz = str(tmp_path / 'bucket') + os.sep
+    anos = [2014, 2015, 2016, 2017]
+    sintetico.gerar(raiz, anos=anos, n_utps=5)
+    anterior = dict(dados.CACHE)
+    dados.configurar_cache(diretorio=str(tmp_path / 'cache'), limite=64, offline=False, ativo=True)
+    monkeypatch.setattr(dados, 'sessao_http', lambda: _Arquivos(raiz))
+    try:
+        p = painel.NereusPanel(anos, path="")
+        with open(str(tmp_path / 'cache' / 'indice.json')) as f:
+            indice = json.load(f)
+        assert sorted(indice.values()) == sorted(os.listdir(str(tmp_path / 'cache' / 'objetos')))
+        for k, ano in enumerate(anos):
+            n = matriz.Nereus(ano, path=raiz)
+            np.testing.assert_allclose(p.multiplicadores[k], n.multiplicadores.values, rtol=1e-12)
+    finally:
+        dados.CACHE.update(anterior)
+        matriz.invalidar_referencias(path="")
+        matriz.invalidar_referencias(path=raiz)
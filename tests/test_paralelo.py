@@ -0,0 +1,26 @@
+# coding=utf8
+import numpy as np
+
+import paralelo
+
+
+def test_paralelo_igual_lote(nereus, utps):
+    base = nereus.extrair_mipita()
+    areas = utps[:6] + [utps[6:9]]
+    with paralelo.Regionalizador(base, processos=2, bloco=3) as r:
+        lotes = r.regionalizar(areas)
+    lote = base.regionalizar_lote(areas)
+    paralelo_ = lotes['2015']
+    assert paralelo_.areas == lote.areas
+    for nome in ['mipreg', 'A', 'Af', 'multiplicadores', 'HRtras', 'HRfrente']:
+        np.testing.assert_allclose(getattr(paralelo_, nome), getattr(lote, nome), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(paralelo_.L, lote.L, rtol=1e-12)
+
+
+def test_paralelo_codigo_repetido(nereus, utps):
+    base = nereus.extrair_mipita()
+    areas = [[utps[2], utps[2]], utps[2]]
+    with paralelo.Regionalizador(base, processos=1) as r:
+        lote = r.regionalizar(areas)['2015']
+    np.testing.assert_allclose(lote.mipreg, base.regionalizar_lote(areas).mipreg, rtol=1e-12, atol=1e-12)
+    assert not np.allclose(lote.mipreg[0], lote.mipreg[1])
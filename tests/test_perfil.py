@@ -0,0 +1,44 @@
+# coding=utf8
+import tracemalloc
+
+import matriz
+import perfil
+
+
+def test_resumo_separa_escopos(path, nereus):
+    memo = matriz.MEMO.ativo
+    matriz.configurar_memo(ativo=False)
+    try:
+        with perfil.Perfil(memoria=False) as p:
+            matriz.Nereus(2015, path=path).extrair_mipita().regionalizar('105')
+    finally:
+        matriz.configurar_memo(ativo=memo)
+    resumo = p.resumo()
+    assert ('Nereus', 'leontief') in resumo.index
+    assert ('regionalizar', 'leontief') in resumo.index
+    assert resumo.loc[('regionalizar', 'leontief'), 'vezes'] == 1
+    etapas = list(resumo.loc['regionalizar'].index)
+    assert etapas == matriz.Mipita.ETAPAS
+
+
+def test_sessao_tracemalloc_do_usuario_preservada(base):
+    tracemalloc.start()
+    try:
+        grande = bytearray(20 * 2**20)
+        del grande
+        pico = tracemalloc.get_traced_memory()[1]
+        with perfil.Perfil() as p:
+            base.regionalizar(['106', '107'])
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[1] >= pico  # reset_peak não foi chamado
+        assert p.resumo()['pico'].isna().all()
+    finally:
+        tracemalloc.stop()
+
+
+def test_perfil_mede_picos_quando_liga_tracemalloc(base):
+    assert not tracemalloc.is_tracing()
+    with perfil.Perfil() as p:
+        base.regionalizar(['108', '109'])
+    assert not tracemalloc.is_tracing()
+    assert p.resumo().loc['regionalizar']['pico'].notna().all()
@@ -0,0 +1,34 @@
+# coding=utf8
+import matriz
+
+
+def test_etapas_de_regionalizar(nereus, utps):
+    memo = matriz.MEMO.ativo
+    matriz.configurar_memo(ativo=False)
+    try:
+        etapas = []
+        nereus.extrair_mipita().regionalizar(utps[7], progresso=lambda e, b, t: etapas.append(e))
+    finally:
+        matriz.configurar_memo(ativo=memo)
+    assert etapas == matriz.Mipita.ETAPAS
+
+
+def test_etapas_de_nereus(path):
+    etapas = []
+    decorridos = []
+
+    def progresso(etapa, bytes, decorrido):
+        etapas.append(etapa)
+        decorridos.append(decorrido)
+
+    matriz.Nereus(2015, path=path, progresso=progresso)
+    assert [e for e in etapas if not e.startswith('~~')] == ['mip nereus', 'atividades'] + matriz.Nereus.ETAPAS
+    assert decorridos == sorted(decorridos)
+
+
+def test_memo_relata_uma_etapa(nereus, utps):
+    matriz.configurar_memo(ativo=True)
+    nereus.extrair_mipita().regionalizar(utps[8])
+    etapas = []
+    nereus.extrair_mipita().regionalizar(utps[8], progresso=lambda e, b, t: etapas.append(e))
+    assert etapas == ['memo']
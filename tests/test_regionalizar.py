@@ -0,0 +1,73 @@
+# coding=utf8
+"""regionalizar contra o algoritmo original em pandas (independente de regionalizar_mipita)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _referencia(mipita, qL, propT):
+    """Blocos A, B e C e equalização como na versão 1.5, linha a linha em pandas"""
+    codigos = list(mipita.index[0:68])
+    qL = qL.reindex(codigos)
+    linhas = ['importado do mundo', 'impostos de importação', 'importado do Brasil', 'impostos',
+        'salários', 'contribuições sociais', 'margem', 'outros impostos e subsídios']
+    colunas = ['exportado ao mundo', 'exportado ao Brasil', 'governo', 'isfl', 'famílias',
+        'capital fixo', 'estoque']
+    # BLOCO A
+    insumos = mipita.iloc[0:68, 0:68].multiply(qL, axis=1)
+    for linha in linhas:
+        if linha == 'importado do Brasil':
+            insumos.loc[linha] = 0.0
+        else:
+            insumos.loc[linha] = mipita.loc[linha][0:68].multiply(qL)
+    insumos.loc['total_insumos'] = insumos.sum(axis=0)
+    # BLOCO B
+    consumo = pd.DataFrame(0.0, index=codigos, columns=colunas)
+    for col in ['exportado ao mundo', 'capital fixo', 'estoque']:
+        consumo[col] = mipita[col][0:68].multiply(qL)
+    for col in ['governo', 'isfl', 'famílias']:
+        consumo[col] = mipita[col][0:68] * propT
+    # BLOCO C
+    C = pd.DataFrame(0.0, index=linhas + ['total_insumos'], columns=colunas)
+    for linha in ['importado do mundo', 'impostos de importação', 'impostos', 'salários',
+            'contribuições sociais']:
+        C.loc[linha] = mipita.loc[linha][68:75].values * propT
+    mipreg = pd.concat([insumos, pd.concat([consumo, C], axis=0)], axis=1)
+    mipreg['total_produtos'] = mipreg.sum(axis=1)
+    # EQUALIZAR
+    E = (mipreg['total_produtos'].iloc[0:68] - mipreg.loc['total_insumos'].iloc[0:68]).values
+    comprou, vendeu = np.where(E >= 0, E, 0.0), np.where(E < 0, -E, 0.0)
+    mipreg.loc['importado do Brasil'] = np.concatenate([comprou, np.zeros(8)])
+    mipreg['exportado ao Brasil'] = np.concatenate([vendeu, np.zeros(9)])
+    mipreg.iloc[76, 0:68] = mipreg.iloc[0:76, 0:68].sum(axis=0).values
+    mipreg['total_produtos'] = mipreg.iloc[0:77, 0:75].sum(axis=1)
+    return mipreg, comprou, vendeu
+
+
+@pytest.mark.parametrize('area', [0, [1, 2, 3]])
+def test_regionalizar_igual_referencia(nereus, utps, area):
+    area = [utps[i] for i in area] if isinstance(area, list) else utps[area]
+    m = nereus.extrair_mipita()
+    m.regionalizar(area)
+    mipreg, comprou, vendeu = _referencia(m.mipita, m.qL, m.propT)
+    np.testing.assert_allclose(m.mipreg.values, mipreg.values, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(m.comprou, comprou, rtol=1e-12, atol=1e-9)
+    np.testing.assert_allclose(m.vendeu, vendeu, rtol=1e-12, atol=1e-9)
+    X = mipreg.iloc[76, 0:68].values
+    A = np.where(X > 0, mipreg.iloc[0:68, 0:68].values / np.where(X > 0, X, 1), 0.0)
+    np.testing.assert_allclose(m.A.values, A, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(m.L.values, np.linalg.inv(np.identity(68) - A), rtol=1e-10, atol=1e-12)
+
+
+def test_regionalizar_totais(nereus, utps):
+    m = nereus.extrair_mipita()
+    m.regionalizar(utps[5])
+    mipreg = m.mipreg.values
+    nacional = m.mipita.values
+    qL = m.qL.reindex(m.codigos).values
+    # insumos intermediários escalados por qL na coluna
+    np.testing.assert_allclose(mipreg[0:68, 0:68].sum(axis=0), qL * nacional[0:68, 0:68].sum(axis=0), rtol=1e-12)
+    # comprou e vendeu fecham o balanço: total de insumos = total de produtos
+    np.testing.assert_allclose(mipreg[76, 0:68], mipreg[0:68, 75], rtol=1e-12)
+    assert (np.minimum(m.comprou, m.vendeu) == 0).all()
+    np.testing.assert_allclose(mipreg[0:77, 75], mipreg[0:77, 0:75].sum(axis=1), rtol=1e-12)
@@ -0,0 +1,105 @@
+# coding=utf8
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+import matriz
+import servico
+
+
+@pytest.fixture
+def s(path):
+    with servico.Servico([2015], path=path) as s:
+        yield s
+
+
+def test_consultas_iguais_a_mipita(s, nereus, utps):
+    m = nereus.extrair_mipita()
+    m.regionalizar(utps[3])
+    multi = np.array(s.multiplicadores(2015, utps[3])['valores'], dtype=float)
+    np.testing.assert_allclose(multi, m.multiplicadores.values, rtol=1e-12)
+    hr = s.hr(2015, utps[3])
+    np.testing.assert_allclose(hr['tras'], m.HRtras.values, rtol=1e-12)
+    assert hr['chave'] == [c for c, k in m.chave if k]
+    f = np.zeros(69)
+    f[0], f[68] = 1000.0, 10.0
+    esperado = m.impactos(f[None])[0].sum(axis=-1)
+    imp = s.impactos(2015, utps[3], {m.codigos[0]: 1000.0, 'famílias': 10.0})[0]
+    for i, v in enumerate(matriz.VARIAVEIS):
+        np.testing.assert_allclose([imp[v][e] for e in matriz.EFEITOS], esperado[:, i], rtol=1e-10)
+
+
+def test_lote_isola_erros(s, utps, monkeypatch):
+    base = s.base(2015)
+    original = base.regionalizar_lote
+
+    def falha(areas, exceto=False):
+        if utps[2] in areas:
+            raise Exception('[!!] falha simulada')
+        return original(areas, exceto)
+
+    monkeypatch.setattr(base, 'regionalizar_lote', falha)
+    respostas = s.lote([
+        {'rota': 'hr', 'ano': 2015, 'utp': utps[0]},
+        {'rota': 'hr', 'ano': 2015, 'utp': utps[2]},
+        {'rota': 'nada', 'ano': 2015, 'utp': utps[0]},
+        {'rota': 'hr', 'ano': 2015, 'utp': '999'},
+        {'rota': 'multiplicadores', 'ano': 2015, 'utp': utps[1], 'setor': base.codigos[0]},
+    ])
+    assert 'resultado' in respostas[0] and 'resultado' in respostas[4]
+    assert respostas[1] == {'erro': '[!!] falha simulada'}
+    assert 'erro' in respostas[2] and 'erro' in respostas[3]
+
+
+def test_consultas_simultaneas_em_lote(s, utps):
+    threads = [threading.Thread(target=s.hr, args=(2015, u)) for u in utps]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert s.calculos < len(utps)
+    assert s.memo.estado()['itens'] == len(utps)
+
+
+def test_http(s, utps):
+    httpd = servico.servidor(s, porta=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:%d' % httpd.server_address[1]
+    try:
+        with urllib.request.urlopen(url + '/hr?ano=2015&utp=' + utps[0]) as r:
+            assert 'tras' in json.loads(r.read())
+        pedido = urllib.request.Request(url + '/lote', method='POST',
+            data=json.dumps({'consultas': [{'rota': 'hr', 'ano': 2015, 'utp': utps[0]}]}).encode())
+        with urllib.request.urlopen(pedido) as r:
+            assert 'resultado' in json.loads(r.read())[0]
+        for caminho, codigo in [('/nada', 404), ('/hr?ano=2015&utp=999', 400)]:
+            with pytest.raises(urllib.error.HTTPError) as erro:
+                urllib.request.urlopen(url + caminho)
+            assert erro.value.code == codigo
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_impactos_reusa_solvers(s, utps, monkeypatch):
+    s.impactos(2015, utps[1], {'famílias': 1.0})
+    criados = []
+    original = matriz.LeontiefSolver
+    monkeypatch.setattr(matriz, 'LeontiefSolver', lambda A: criados.append(A) or original(A))
+    for _ in range(3):
+        s.impactos(2015, utps[1], {'famílias': 1.0})
+    assert criados == []
+
+
+def test_fechar_encerra_calculadora(path, utps):
+    s = servico.Servico([2015], path=path)
+    s.hr(2015, utps[0])
+    s.fechar()
+    assert not s._calculadora.is_alive()
+    assert s.hr(2015, utps[0])['setores']  # já na memória
+    with pytest.raises(Exception, match='encerrado'):
+        s.hr(2015, utps[1])
@@ -0,0 +1,23 @@
+# coding=utf8
+import filecmp
+import os
+
+import numpy as np
+
+import sintetico
+
+
+def test_deterministico(tmp_path):
+    a, b = str(tmp_path / 'a') + os.sep, str(tmp_path / 'b') + os.sep
+    sintetico.gerar(a, n_utps=7, seed=3)
+    sintetico.gerar(b, n_utps=7, seed=3)
+    for raiz, _, nomes in os.walk(a):
+        for nome in nomes:
+            relativo = os.path.relpath(os.path.join(raiz, nome), a)
+            assert filecmp.cmp(os.path.join(a, relativo), os.path.join(b, relativo), shallow=False)
+
+
+def test_tabela_consistente(nereus):
+    A = nereus.A.values
+    assert (A >= 0).all() and (A.sum(axis=0) < 1).all()
+    assert np.isfinite(nereus.multiplicadores.values[:, 0:67]).all()